@@ -1,7 +1,27 @@
+import copy
+import os
+import time
+import uuid
 import streamlit as st
 import yaml
 # import pyperclip
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+
+from dbt_selector import (
+    BatchEvaluator, IndexCache, Manifest, ManifestError, SelectorError,
+    convert, dump_selectors, format_plan, import_selectors_yaml, make_selector,
+    parse_cli, validate_selectors,
+)
+from dbt_selector.artifacts import RunHistory
+from dbt_selector.cost import selection_cost, shard_names, shard_selection, shard_selectors
+from dbt_selector.mesh import Mesh, load_mesh
+from dbt_selector.registry import ManifestBuild, ManifestRegistry
+from dbt_selector.suggest import SUGGEST_METHODS, suggester_for
+from dbt_selector.selectors import fragment_cache
+from dbt_selector.synthesize import DEFAULT_BUDGET, resolve_nodes, synthesize
+from dbt_selector.trace import TRACE_MEMORY_ENV, Tracer, hit_rate, start_memory_tracing
+from dbt_selector.editor import MAX_EXCLUSIONS, MAX_ITEMS, METHOD, MIN_EXCLUSIONS, MIN_ITEMS, CriterionTree
+from dbt_selector.parser import DEFINITION_TYPES, is_single_spec
 
 st.set_page_config(
     page_title="dbt Selector YAML Generator",
@@ -11,152 +31,541 @@ st.set_page_config(
 )
 
 def main():
-    st.title("dbt Selector YAML Generator")
-    st.markdown("""
-    Create a structured `selector.yml` file for your dbt Cloud projects. 
-    Configure your selectors with a user-friendly interface and generate valid YAML code.
-    """)
-    
-    st.sidebar.title("Navigation")
-    
-    # Main sections in the sidebar
-    section = st.sidebar.radio(
-        "",
-        ["Selector configuration", "Docs & Examples", "About"]
-    )
-    
-    if section == "Selector configuration":
-        selector_config_section()
-    elif section == "Docs & Examples":
-        documentation_section()
+    tracer = get_tracer()
+    tracer.enabled = st.session_state.get("trace_enabled", False)
+    with tracer.run("main"):
+        st.title("dbt Selector YAML Generator")
+        st.markdown("""
+        Create a structured `selector.yml` file for your dbt Cloud projects. 
+        Configure your selectors with a user-friendly interface and generate valid YAML code.
+        """)
+        
+        st.sidebar.title("Navigation")
+        
+        # Main sections in the sidebar
+        section = st.sidebar.radio(
+            "",
+            ["Selector configuration", "Docs & Examples", "About"]
+        )
+        
+        with tracer.span("section", section=section):
+            if section == "Selector configuration":
+                selector_config_section()
+            elif section == "Docs & Examples":
+                documentation_section()
+            else:
+                about_section()
+    performance_panel(tracer)
+
+def get_tracer() -> Tracer:
+    """This session's rerun timings"""
+    if "tracer" not in st.session_state:
+        st.session_state.tracer = Tracer()
+    return st.session_state.tracer
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """Hits and misses of the caches this session uses"""
+    counts = [("Selector YAML fragments", fragment_cache().hits, fragment_cache().misses)]
+    registry = get_manifest_registry()
+    counts.append(("Shared manifests", registry.hits, registry.misses))
+    suggester = st.session_state.get("suggester")
+    if suggester is not None:
+        counts.append(("Value suggestions", suggester.hits, suggester.misses))
+        try:
+            info = suggester.manifest.graph.closure.cache_info()
+            counts.append(("Graph closures", info.hits, info.misses))
+        except SelectorError:
+            pass
+    batch = st.session_state.get("last_batch")
+    if batch is not None:
+        counts.append(("Shared sub-criteria (last batch)", batch.cache.hits, batch.cache.misses))
+    rows = []
+    for name, hits, misses in counts:
+        rate = hit_rate(hits, misses)
+        rows.append({"cache": name, "hits": hits, "misses": misses,
+                     "hit_rate": f"{rate:.0%}" if rate is not None else ""})
+    return rows
+
+@st.cache_resource
+def memory_tracing() -> bool:
+    """Whether allocations are traced, decided once for the whole server"""
+    return start_memory_tracing()
+
+def performance_panel(tracer: Tracer):
+    """Sidebar timings of recent reruns, memory high-water marks and cache hit rates"""
+    with st.sidebar.expander("Performance"):
+        st.checkbox("Record timings", key="trace_enabled",
+                    help="Time each rerun's sections; takes effect from the next rerun")
+        # Allocation tracing is process-wide, so it is a server setting rather than a session toggle
+        if memory_tracing():
+            st.caption("Memory allocations are traced for every session on this server")
+        else:
+            st.caption(f"Set {TRACE_MEMORY_ENV}=1 before starting the app to trace peak Python allocations "
+                       f"per rerun; it slows every session")
+        if not tracer.runs:
+            st.caption("No reruns recorded yet")
+            return
+        last = tracer.runs[-1]
+        memory = f"peak RSS {last.peak_rss_mb:.0f} MB" if last.peak_rss_mb is not None else ""
+        if last.traced_peak_mb is not None:
+            memory += f", peak traced {last.traced_peak_mb:.1f} MB"
+        st.caption(f"Last rerun ({last.label}): {last.duration * 1000:.1f} ms" + (f"; {memory}" if memory else ""))
+        st.dataframe(last.rows(), use_container_width=True, hide_index=True)
+        st.caption(f"{len(tracer.runs)} reruns recorded")
+        st.line_chart([{"ms": round(trace.duration * 1000, 2)} for trace in tracer.runs], height=120)
+        st.dataframe(cache_stats(), use_container_width=True, hide_index=True)
+        st.download_button("Download Chrome trace", tracer.chrome_trace(), file_name="dbt-selector-trace.json",
+                           mime="application/json", help="Open in chrome://tracing or ui.perfetto.dev")
+        st.download_button("Download JSON", tracer.as_json(), file_name="dbt-selector-timings.json",
+                           mime="application/json")
+        if st.button("Clear recorded reruns"):
+            tracer.clear()
+            st.rerun()
+
+@st.cache_resource
+def get_index_cache() -> IndexCache:
+    """On-disk index cache shared by every session in this process"""
+    return IndexCache()
+
+@st.cache_resource
+def get_manifest_registry() -> ManifestRegistry:
+    """Manifests shared by every session in this process, built on a thread pool"""
+    return ManifestRegistry(get_index_cache())
+
+def session_holder(role: str) -> str:
+    """This session's claim on a shared manifest, one per role (manifest, state)"""
+    if "session_token" not in st.session_state:
+        st.session_state.session_token = uuid.uuid4().hex
+    return f"{st.session_state.session_token}:{role}"
+
+@st.cache_resource(show_spinner="Indexing project manifests...", max_entries=2)
+def load_mesh_cached(paths: Tuple[str, ...], mtimes: Tuple[float, ...]) -> Mesh:
+    """Load several projects' manifests in worker processes and merge them, once per file versions"""
+    return load_mesh(list(paths))
+
+@st.cache_resource(show_spinner="Reading run artifacts...", max_entries=4)
+def load_history_cached(paths: Tuple[str, ...], mtimes: Tuple[float, ...]) -> RunHistory:
+    """Index run_results.json and sources.json files once per file versions"""
+    return RunHistory.from_paths(list(paths))
+
+def load_history_input(text: str) -> Optional[RunHistory]:
+    """Load the run artifacts listed one per line, reporting problems inline"""
+    paths = [line.strip() for line in text.splitlines() if line.strip()]
+    if not paths:
+        return None
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        st.error(f"File not found: {', '.join(missing)}")
+        return None
+    try:
+        history = load_history_cached(tuple(paths), tuple(os.path.getmtime(p) for p in paths))
+    except ManifestError as e:
+        st.error(str(e))
+        return None
+    st.caption(f"Loaded {len(history.runs)} run_results.json and {len(history.freshness)} sources.json")
+    return history
+
+@st.fragment(run_every=0.5)
+def manifest_build_progress(build: ManifestBuild):
+    """Progress of a manifest build in the background; reruns the app once it finishes"""
+    fraction, stage = build.progress
+    st.progress(fraction, text=f"{stage}: {os.path.basename(build.path)}")
+    if build.ready:
+        st.rerun()
+
+def load_manifest_input(path: str, role: str = "manifest") -> Optional[Manifest]:
+    """Attach to the shared build of the manifest at a user-supplied path; None while it is built"""
+    if not os.path.isfile(path):
+        st.error(f"File not found: {path}")
+        return None
+    try:
+        build = get_manifest_registry().attach(path, session_holder(role))
+        # Builds from the index cache finish before a progress bar is worth showing
+        if not build.wait(0.25):
+            # The rest of the page stays usable, without previews, until the build is done
+            manifest_build_progress(build)
+            return None
+        return build.result()
+    except ManifestError as e:
+        st.error(str(e))
+        return None
+
+def manifest_loader_section() -> Tuple[Optional[Manifest], Optional[Manifest]]:
+    """Let the user point the app at a local manifest.json, and optionally a state manifest, for previews"""
+    st.session_state.suggester = None
+    with st.expander("Preview against a manifest.json"):
+        path = st.text_input(
+            "Path to manifest.json",
+            key="manifest_path",
+            help="Usually target/manifest.json in your dbt project after `dbt parse`"
+        )
+        state_path = st.text_input(
+            "Path to state manifest.json (optional)",
+            key="state_manifest_path",
+            help="A manifest from production or an earlier run, like dbt's --state; "
+                 "needed to preview the state method"
+        )
+        mesh_paths = st.text_area(
+            "Other projects' manifest.json files (dbt Mesh, optional)",
+            key="mesh_manifest_paths",
+            help="One path per line. The projects are merged into one graph with the manifest above, "
+                 "so cross-project parents and children are followed"
+        )
+        artifact_paths = st.text_area(
+            "run_results.json / sources.json files (optional)",
+            key="artifact_paths",
+            help="One path per line, oldest first. result: reads the latest run_results.json; "
+                 "source_status:fresher compares the last two sources.json"
+        )
+        registry = get_manifest_registry()
+        if not state_path:
+            registry.release(session_holder("state"))
+        if not path:
+            registry.release(session_holder("manifest"))
+            return None, None
+        st.session_state.mesh = None
+        st.session_state.run_history = load_history_input(artifact_paths)
+        other_paths = [line.strip() for line in mesh_paths.splitlines() if line.strip()]
+        if other_paths:
+            # Merged meshes are cached on their own, see load_mesh_cached
+            registry.release(session_holder("manifest"))
+            paths = [path] + other_paths
+            missing = [p for p in paths if not os.path.isfile(p)]
+            if missing:
+                st.error(f"File not found: {', '.join(missing)}")
+                return None, None
+            try:
+                mesh = load_mesh_cached(tuple(paths), tuple(os.path.getmtime(p) for p in paths))
+            except ManifestError as e:
+                st.error(str(e))
+                return None, None
+            st.session_state.mesh = mesh
+            manifest = mesh.manifest
+            st.caption(f"Loaded {len(manifest)} nodes from {len(mesh.projects)} projects: {', '.join(mesh.projects)}")
+        else:
+            manifest = load_manifest_input(path)
+            if manifest is None:
+                return None, None
+            st.caption(f"Loaded {len(manifest)} nodes")
+        state = load_manifest_input(state_path, "state") if state_path else None
+        st.session_state.suggester = suggester_for(manifest)
+        # Built off the render thread, so the first keystroke does not wait for the indexes
+        st.session_state.suggester.start_warming()
+        return manifest, state
+
+def preview_selection(manifest: Manifest, definition: Any, key: str,
+                      state: Optional[Manifest] = None) -> Optional[Set[int]]:
+    """Show the nodes a definition selects in the loaded manifest, and return their IDs"""
+    start = time.perf_counter()
+    try:
+        # selector: references resolve against the selectors defined so far
+        with get_tracer().span("evaluate.preview", key=key):
+            planner = BatchEvaluator(manifest, st.session_state.get("selectors", []), state=state,
+                                     history=st.session_state.get("run_history")).planner
+            plan = planner.plan(definition)
+            node_ids = planner.execute(plan)
+    except SelectorError as e:
+        st.warning(f"Cannot preview: {e}")
+        return None
+    elapsed = (time.perf_counter() - start) * 1000
+    st.caption(f"Matches {len(node_ids)} of {len(manifest)} nodes ({elapsed:.1f} ms)")
+    if st.checkbox("Explain plan", key=f"{key}_explain",
+                   help="Normalized plan with estimated and actual rows and time per step"):
+        st.code(format_plan(plan, analyze=True), language="text")
+    if node_ids:
+        st.dataframe({"unique_id": manifest.unique_ids(node_ids)}, use_container_width=True)
+    return node_ids
+
+def selection_cost_section(manifest: Manifest, selector: Dict[str, Any], node_ids: Set[int], key: str):
+    """Execution cost of a selection from run_results.json timings, and a split into parallel jobs"""
+    history = st.session_state.get("run_history")
+    costs = history.execution_times(manifest) if history is not None else None
+    if costs is None or not node_ids:
+        return
+    with get_tracer().span("cost.critical_path", nodes=len(node_ids)):
+        cost = selection_cost(manifest, node_ids, costs)
+    st.caption(f"About {cost.total:.0f}s of execution ({cost.timed} of {cost.nodes} nodes have timings); "
+               f"critical path {cost.critical_path:.0f}s through {len(cost.path)} nodes")
+    if st.checkbox("Show critical path", key=f"{key}_critical_path"):
+        st.dataframe({"unique_id": [manifest.nodes[i].unique_id for i in cost.path],
+                      "execution_time": [max(costs[i], 0.0) for i in cost.path]}, use_container_width=True)
+    shards = st.number_input("Parallel jobs", min_value=2, max_value=64, value=4, key=f"{key}_shards",
+                             help="Split the selection into independent parts of similar cost, one per job")
+    with get_tracer().span("cost.shard", nodes=len(node_ids)):
+        plan = shard_selection(manifest, node_ids, costs, int(shards))
+    names = shard_names(selector["name"], plan)
+    st.dataframe([{"shard": name, **shard.as_row()} for name, shard in zip(names, plan)],
+                  use_container_width=True)
+    stages = max((shard.stage for shard in plan), default=1)
+    jobs = max((sum(1 for shard in plan if shard.stage == stage) for stage in range(1, stages + 1)), default=0)
+    if stages > 1:
+        st.info(f"No single split keeps {int(shards)} jobs balanced, so the selection runs in {stages} stages: "
+                f"start a stage's jobs once every job of the previous stage has finished")
+    if jobs < shards:
+        st.warning(f"Only {jobs} of the {int(shards)} jobs requested get work: the selection has too few parts "
+                   f"without dependencies between them")
+    if st.button("Add shards as selectors", key=f"{key}_add_shards"):
+        st.session_state.selectors.extend(shard_selectors(manifest, selector["name"], plan))
+        st.rerun()
+
+def selectors_import_section():
+    """Load the selectors of an existing selectors.yml into the session"""
+    with st.expander("Import an existing selectors.yml"):
+        uploaded = st.file_uploader("selectors.yml", type=["yml", "yaml"], key="selectors_upload")
+        mode = st.radio("Imported selectors", ["Replace current selectors", "Append to current selectors"],
+                        key="selectors_import_mode", horizontal=True)
+        if uploaded is not None and st.button("Import selectors"):
+            try:
+                imported, problems = import_selectors_yaml(uploaded.getvalue().decode("utf-8"))
+            except (SelectorError, UnicodeDecodeError) as e:
+                st.error(f"Cannot import: {e}")
+                return
+            if mode.startswith("Replace"):
+                st.session_state.selectors = imported
+                # Already validated while importing
+                st.session_state.validated_yaml = (dump_selectors(imported), problems)
+            else:
+                st.session_state.selectors.extend(imported)
+            st.success(f"Imported {len(imported)} selectors")
+            st.rerun()
+
+def selector_synthesis_section(manifest: Manifest):
+    """Find a short selector definition for a list of nodes"""
+    with st.expander("Synthesize a selector from a list of nodes"):
+        text = st.text_area(
+            "Target nodes",
+            key="synthesis_targets",
+            help="unique_ids or node names, separated by spaces, commas or new lines"
+        )
+        name = st.text_input("Selector name", "synthesized_selector", key="synthesis_name")
+        budget = st.slider("Search time (seconds)", 0.5, 10.0, DEFAULT_BUDGET, 0.5, key="synthesis_budget")
+        if st.button("Synthesize", key="synthesis_run"):
+            ids, unknown = resolve_nodes(manifest, text.replace(",", " ").split())
+            if unknown:
+                st.warning(f"Not in the manifest: {', '.join(unknown)}")
+            if not ids:
+                st.session_state.synthesis = None
+                return
+            try:
+                with get_tracer().span("synthesize", nodes=len(ids)):
+                    st.session_state.synthesis = (name, synthesize(manifest, ids, budget))
+            except SelectorError as e:
+                st.error(str(e))
+                return
+        found = st.session_state.get("synthesis")
+        if found is None:
+            return
+        name, synthesis = found
+        summary = synthesis.summary()
+        st.caption(f"{synthesis.criteria} criteria and {synthesis.exclusions} exclusions for "
+                   f"{len(synthesis.target)} nodes, found in {summary['time_ms']:.0f} ms"
+                   + (" (search time ran out)" if synthesis.timed_out else ""))
+        if not synthesis.exact:
+            st.warning(f"Selects {len(synthesis.extra)} extra nodes and misses {len(synthesis.missing)}")
+        st.code(yaml.dump(synthesis.definition, sort_keys=False, default_flow_style=False), language="yaml")
+        if st.button("Add as selector", key="synthesis_add"):
+            description = f"Synthesized from {len(synthesis.target)} nodes"
+            st.session_state.selectors.append(make_selector(name, synthesis.definition, description))
+            st.session_state.synthesis = None
+            st.rerun()
+
+def batch_evaluation_section(manifest: Manifest, state: Optional[Manifest] = None):
+    """Evaluate every selector in one pass and show node counts and timings
+
+    After the manifest changes, only selectors whose inputs changed are recomputed.
+    """
+    st.header("Evaluate all selectors")
+    if not st.button("Evaluate all selectors against the manifest"):
+        return
+    selectors = st.session_state.selectors
+    previous = st.session_state.get("last_batch")
+    history = st.session_state.get("run_history")
+    start = time.perf_counter()
+    if previous is not None and previous.selectors == selectors and previous.state is state \
+            and previous.history is history and previous.manifest is not manifest:
+        with get_tracer().span("evaluate.rerun", selectors=len(selectors)):
+            batch = previous.rerun(manifest)
+        results = list(batch.results.values())
+        summary = (f"Re-evaluated incrementally after manifest changes: "
+                   f"{len(batch.reused)} of {len(results)} selectors carried over")
     else:
-        about_section()
+        with get_tracer().span("evaluate.batch", selectors=len(selectors)):
+            batch = BatchEvaluator(manifest, copy.deepcopy(selectors), state=state, history=history)
+            results = batch.run()
+        summary = (f"shared sub-criteria cache: {batch.cache.hits} hits, "
+                   f"{batch.cache.hit_rate:.0%} hit rate")
+    st.session_state.last_batch = batch
+    elapsed = (time.perf_counter() - start) * 1000
+    st.caption(f"Evaluated {len(results)} selectors in {elapsed:.1f} ms ({summary})")
+    rows = [result.as_row() for result in results]
+    mesh = st.session_state.get("mesh")
+    if mesh is not None and mesh.manifest is manifest:
+        # Node counts per project for a merged mesh
+        for row, result in zip(rows, results):
+            row.update(mesh.split(result.node_ids or ()))
+    st.dataframe(rows, use_container_width=True)
+
+def _accept_suggestion(value_key: str):
+    """Copy the picked suggestion into the value input"""
+    picked = st.session_state[f"{value_key}_suggest"]
+    if picked is not None:
+        st.session_state[value_key] = picked
+        st.session_state[f"{value_key}_suggest"] = None
+
+def value_suggestions(method: str, value_key: str):
+    """Suggest manifest values for a partly typed criterion value, and flag values that select nothing"""
+    suggester = st.session_state.get("suggester")
+    if suggester is None or method not in SUGGEST_METHODS:
+        return
+    value = st.session_state.get(value_key, "")
+    if value and suggester.matches(method, value):
+        return
+    if value:
+        st.caption(f"No {method} in the manifest matches '{value}'")
+    if not suggester.ready(method):
+        st.caption(f"Suggestions for {method} values are still being indexed")
+        return
+    suggestions = suggester.suggest(method, value)
+    if suggestions:
+        st.selectbox("Suggestions", suggestions, index=None, placeholder=f"Pick a {method} from the manifest",
+                     key=f"{value_key}_suggest", on_change=_accept_suggestion, args=(value_key,))
 
-def create_criterion_section(key_prefix="", level=0, is_exclude=False):
-    """Create a form section for defining a selection criterion"""
-    criterion = {}
+def _seed(key: str, value: Any) -> str:
+    """Widget key, initialized from the editor model the first time the widget is shown"""
+    if key not in st.session_state:
+        st.session_state[key] = value
+    return key
+
+@st.fragment
+def criterion_editor(node_id: str, level: int = 0, is_exclude: bool = False):
+    """Edit one subtree of the criterion tree; interacting with it reruns only this subtree"""
+    with get_tracer().run("criterion_editor", level=level):
+        render_criterion(node_id, level, is_exclude)
+
+def render_criterion(node_id: str, level: int, is_exclude: bool):
+    """The widgets of one criterion, recursing into its children"""
+    tree = st.session_state.criterion_tree
+    node = tree[node_id]
+    key = f"editor_{node_id}"
     
     # Choose criterion type based on complexity
     criterion_type = st.selectbox(
         "Type",
         ["Simple Method", "Complex Structure"],
-        key=f"{key_prefix}_type_{level}"
+        key=_seed(f"{key}_type", "Simple Method" if node["kind"] == METHOD else "Complex Structure")
     )
     
     if criterion_type == "Simple Method":
-        method = st.selectbox(
+        tree.set_kind(node_id, METHOD)
+        node["method"] = st.selectbox(
             "Method",
             ["tag", "path", "package", "config", "fqn", "resource_type", "source", 
              "exposure", "metric", "state", "group", "access", "file", "saved_query", 
              "semantic_model", "source_status", "result", "test_name", "version"],
-            key=f"{key_prefix}_method_{level}"
+            key=_seed(f"{key}_method", node["method"])
         )
         
-        value = st.text_input("Value", key=f"{key_prefix}_value_{level}")
+        node["value"] = st.text_input("Value", key=_seed(f"{key}_value", node["value"]))
+        value_suggestions(node["method"], f"{key}_value")
         
         # Graph operators
         col1, col2 = st.columns(2)
         with col1:
-            children = st.checkbox("Include children", key=f"{key_prefix}_children_{level}")
-            if children:
-                children_depth = st.number_input("Children depth", 
-                                                min_value=1, value=1, 
-                                                key=f"{key_prefix}_children_depth_{level}")
+            node["children"] = st.checkbox("Include children", key=_seed(f"{key}_children", node["children"]))
+            if node["children"]:
+                node["children_depth"] = st.number_input("Children depth", min_value=1,
+                                                         key=_seed(f"{key}_children_depth", node["children_depth"]))
         
         with col2:
-            parents = st.checkbox("Include parents", key=f"{key_prefix}_parents_{level}")
-            if parents:
-                parents_depth = st.number_input("Parents depth", 
-                                               min_value=1, value=1, 
-                                               key=f"{key_prefix}_parents_depth_{level}")
+            node["parents"] = st.checkbox("Include parents", key=_seed(f"{key}_parents", node["parents"]))
+            if node["parents"]:
+                node["parents_depth"] = st.number_input("Parents depth", min_value=1,
+                                                        key=_seed(f"{key}_parents_depth", node["parents_depth"]))
         
-        childrens_parents = st.checkbox("Include children's parents (@ operator)", 
-                                       key=f"{key_prefix}_childrens_parents_{level}")
+        node["childrens_parents"] = st.checkbox("Include children's parents (@ operator)", 
+                                                key=_seed(f"{key}_childrens_parents", node["childrens_parents"]))
         
         # Indirect selection
-        indirect_selection = st.selectbox(
+        node["indirect_selection"] = st.selectbox(
             "Indirect selection",
             ["eager", "cautious", "buildable", "empty"],
             help="Controls how tests are indirectly selected",
-            key=f"{key_prefix}_indirect_{level}"
+            key=_seed(f"{key}_indirect", node["indirect_selection"])
         )
         
-        # Build criterion
-        criterion = {
-            "method": method,
-            "value": value
-        }
-        
-        if children:
-            criterion["children"] = True
-            criterion["children_depth"] = children_depth
-        
-        if parents:
-            criterion["parents"] = True
-            criterion["parents_depth"] = parents_depth
-        
-        if childrens_parents:
-            criterion["childrens_parents"] = True
-        
-        criterion["indirect_selection"] = indirect_selection
-        
     else:  # Complex Structure
         operation = st.selectbox(
             "Operator",
             ["union", "intersection"],
             help="Union = OR, Intersection = AND",
-            key=f"{key_prefix}_operation_{level}"
+            key=_seed(f"{key}_operation", node["kind"] if node["kind"] != METHOD else "union")
         )
+        tree.set_kind(node_id, operation)
         
         # For each operation, allow 2+ sub-criteria
         num_subcriteria = st.number_input(
             f"Number of {operation} elements", 
-            min_value=2, max_value=10, value=2,
-            key=f"{key_prefix}_num_sub_{level}"
+            min_value=MIN_ITEMS, max_value=MAX_ITEMS,
+            key=_seed(f"{key}_num_sub", len(node["items"]))
         )
+        tree.resize(node_id, "items", int(num_subcriteria))
         
-        subcriteria = []
-        for i in range(int(num_subcriteria)):
+        for i, child in enumerate(node["items"]):
             st.markdown(f"#### {operation.capitalize()} Element {i+1}")
             
-            # Create a collapsible section for each sub-criterion
+            # Each element is its own fragment, so editing it leaves its siblings alone
             with st.expander(f"Configure {operation} element {i+1}"):
-                # Recursively create subcriteria with a new prefix to ensure unique keys
-                subcriterion = create_criterion_section(
-                    key_prefix=f"{key_prefix}_{operation}_{i}",
-                    level=level+1
-                )
-                subcriteria.append(subcriterion)
-        
-        criterion[operation] = subcriteria
+                criterion_editor(child, level=level+1)
     
     # Exclusions (only for non-exclude criteria to avoid nesting excludes inside excludes)
     if not is_exclude:
-        add_exclusion = st.checkbox("Add exclusions", key=f"{key_prefix}_add_excl_{level}")
+        add_exclusion = st.checkbox("Add exclusions", key=_seed(f"{key}_add_excl", node["has_exclusions"]))
+        tree.set_exclusions(node_id, add_exclusion)
         
         if add_exclusion:
             st.subheader("Exclusions")
             num_exclusions = st.number_input(
-                "Number of exclusions", min_value=1, max_value=5, value=1,
-                key=f"{key_prefix}_num_excl_{level}"
+                "Number of exclusions", min_value=MIN_EXCLUSIONS, max_value=MAX_EXCLUSIONS,
+                key=_seed(f"{key}_num_excl", len(node["exclude"]))
             )
+            tree.resize(node_id, "exclude", int(num_exclusions))
             
-            exclusions = []
-            for i in range(int(num_exclusions)):
+            for i, child in enumerate(node["exclude"]):
                 st.markdown(f"#### Exclusion {i+1}")
                 with st.expander(f"Configure exclusion {i+1}"):
-                    # Create exclusion criteria (recursively, but marked as an exclusion)
-                    exclusion = create_criterion_section(
-                        key_prefix=f"{key_prefix}_excl_{i}",
-                        level=level+1,
-                        is_exclude=True
-                    )
-                    exclusions.append(exclusion)
-            
-            if exclusions:
-                criterion["exclude"] = exclusions
-    
-    return criterion
+                    criterion_editor(child, level=level+1, is_exclude=True)
+
+@st.fragment
+def criterion_preview(manifest: Manifest, state: Optional[Manifest] = None):
+    """Preview the criterion being edited; refreshed on demand since edits only rerun their subtree"""
+    st.button("Refresh preview", key="root_preview_refresh")
+    preview_selection(manifest, st.session_state.criterion_tree.to_criterion(), key="root_preview", state=state)
+
+@st.fragment
+def saved_selector_panel(i: int, manifest: Optional[Manifest], state: Optional[Manifest] = None):
+    """One saved selector; its widgets rerun only this panel"""
+    selector = st.session_state.selectors[i]
+    with st.expander(f"Selector: {selector['name']}"):
+        st.json(selector)
+        show_as = st.selectbox(
+            "Show definition as",
+            DEFINITION_TYPES,
+            key=f"show_as_{i}"
+        )
+        try:
+            converted = convert(selector["definition"], show_as)
+            if isinstance(converted, str):
+                st.code(converted)
+            else:
+                st.code(yaml.dump(converted, sort_keys=False, default_flow_style=False), language="yaml")
+        except SelectorError as e:
+            st.caption(str(e))
+        if manifest is not None:
+            node_ids = preview_selection(manifest, selector["definition"], key=f"preview_{i}", state=state)
+            selection_cost_section(manifest, selector, node_ids, key=f"cost_{i}")
+        if st.button(f"Remove selector {i+1}", key=f"remove_{i}"):
+            st.session_state.selectors.pop(i)
+            st.rerun()
 
 def selector_config_section():
     st.header("Selector configuration")
@@ -165,6 +574,15 @@ def selector_config_section():
     if 'selectors' not in st.session_state:
         st.session_state.selectors = []
     
+    with get_tracer().span("manifest.load"):
+        manifest, state_manifest = manifest_loader_section()
+    selectors_import_section()
+    if manifest is not None:
+        selector_synthesis_section(manifest)
+    # Set by a form before it reran the script, so it outlives the rerun
+    if 'selector_warning' in st.session_state:
+        st.warning(st.session_state.pop('selector_warning'))
+    
     # Simple selector form for basic information
     with st.form("selector_info_form"):
         st.subheader("Basic selector information")
@@ -199,15 +617,21 @@ def selector_config_section():
                 cli_definition = st.text_input(
                     "CLI-style Definition", 
                     "tag:nightly",
-                    help="Simple string format like 'tag:nightly' or 'path:models/staging'"
+                    help="Simple string format like 'tag:nightly' or 'path:models/staging'. "
+                         "Spaces (union), commas (intersection), graph operators and --exclude are supported."
                 )
-                definition = cli_definition
                 
                 cli_submitted = st.form_submit_button("Add Selector")
                 
                 if cli_submitted:
-                    selector = st.session_state.current_selector_info.copy()
-                    selector["definition"] = definition
+                    try:
+                        parsed = parse_cli(cli_definition)
+                    except SelectorError as e:
+                        st.error(str(e))
+                        st.stop()
+                    # dbt only accepts a single spec as a string definition
+                    definition = cli_definition.strip() if is_single_spec(cli_definition) else parsed
+                    selector = make_selector(definition=definition, **st.session_state.current_selector_info)
                     st.session_state.selectors.append(selector)
                     if 'current_selector_info' in st.session_state:
                         del st.session_state.current_selector_info
@@ -226,8 +650,15 @@ def selector_config_section():
                 kv_submitted = st.form_submit_button("Add Selector")
                 
                 if kv_submitted:
-                    selector = st.session_state.current_selector_info.copy()
-                    selector["definition"] = definition
+                    suggester = st.session_state.get("suggester")
+                    selector = make_selector(definition=definition, **st.session_state.current_selector_info)
+                    if suggester is not None and not suggester.matches(method, value):
+                        # Still added: the value may exist in another project or a later manifest
+                        suggestions = ", ".join(suggester.suggest(method, value, k=5)
+                                                if suggester.ready(method) else ())
+                        st.session_state.selector_warning = (
+                            f"Selector '{selector['name']}' added, but no {method} in the manifest matches '{value}'"
+                            + (f". Did you mean: {suggestions}?" if suggestions else ""))
                     st.session_state.selectors.append(selector)
                     if 'current_selector_info' in st.session_state:
                         del st.session_state.current_selector_info
@@ -237,16 +668,23 @@ def selector_config_section():
         else:  # Full YAML
             st.write("Define the selection criteria for your selector:")
             
-            # Create a complex structure for the definition using our recursive function
-            definition = create_criterion_section(key_prefix="root", level=0)
+            # The criterion being edited lives in session state as a tree model
+            if 'criterion_tree' not in st.session_state:
+                st.session_state.criterion_tree = CriterionTree()
+            criterion_editor(st.session_state.criterion_tree.root)
+            
+            if manifest is not None:
+                st.markdown("#### Matched nodes")
+                criterion_preview(manifest, state_manifest)
             
             # Add selector button
             if st.button("Add Selector"):
-                selector = st.session_state.current_selector_info.copy()
-                selector["definition"] = definition
+                definition = st.session_state.criterion_tree.to_criterion()
+                selector = make_selector(definition=definition, **st.session_state.current_selector_info)
                 st.session_state.selectors.append(selector)
                 if 'current_selector_info' in st.session_state:
                     del st.session_state.current_selector_info
+                st.session_state.criterion_tree = CriterionTree()
                 st.success(f"Selector '{selector['name']}' added!")
                 st.rerun()
     
@@ -254,18 +692,24 @@ def selector_config_section():
     if st.session_state.selectors:
         st.header("Current selectors")
         
-        for i, selector in enumerate(st.session_state.selectors):
-            with st.expander(f"Selector: {selector['name']}"):
-                st.json(selector)
-                if st.button(f"Remove selector {i+1}", key=f"remove_{i}"):
-                    st.session_state.selectors.pop(i)
-                    st.rerun()
+        for i in range(len(st.session_state.selectors)):
+            saved_selector_panel(i, manifest, state_manifest)
     
+    if st.session_state.selectors and manifest is not None:
+        batch_evaluation_section(manifest, state_manifest)
+
     # Generate final YAML
     if st.session_state.selectors:
         st.header("Generated selectors.yml")
-        yaml_content = {"selectors": st.session_state.selectors}
-        yaml_str = yaml.dump(yaml_content, sort_keys=False, default_flow_style=False)
+        tracer = get_tracer()
+        with tracer.span("yaml.dump", selectors=len(st.session_state.selectors)):
+            yaml_str = dump_selectors(st.session_state.selectors)
+        # Validation only reruns when the document changed
+        if st.session_state.get("validated_yaml", (None,))[0] != yaml_str:
+            with tracer.span("validate", selectors=len(st.session_state.selectors)):
+                st.session_state.validated_yaml = (yaml_str, validate_selectors(st.session_state.selectors))
+        for error in st.session_state.validated_yaml[1]:
+            st.warning(error)
 
         # Display the YAML with built-in copy button
         st.code(yaml_str, language="yaml")
@@ -285,7 +729,7 @@ def selector_config_section():
         if st.button("Clear all selectors and start over", type="primary", use_container_width=True):
             # Clear all relevant session state variables
             for key in list(st.session_state.keys()):
-                if key in ['selectors', 'current_selector_info']:
+                if key in ['selectors', 'current_selector_info', 'criterion_tree']:
                     del st.session_state[key]
             st.success("All configurations cleared!")
             st.rerun()
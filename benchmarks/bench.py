@@ -0,0 +1,262 @@
+"""Benchmark harness: times the selector engine on synthetic projects and writes JSON results
+
+    python -m benchmarks.bench --nodes 1000 10000 100000 --output results.json
+
+Each benchmark runs ``--repeat`` times after one warm-up call; results record
+min and median seconds. Compare result files across releases with
+``python -m benchmarks.bench --compare old.json new.json``.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional
+
+from dbt_selector.batch import BatchEvaluator
+from dbt_selector.cost import selection_cost, shard_selection
+from dbt_selector.evaluate import Evaluator
+from dbt_selector.graph import CHILDREN, PARENTS
+from dbt_selector.index_cache import IndexCache
+from dbt_selector.indexes import MethodIndexes
+from dbt_selector.ingest import load_manifest
+from dbt_selector.parser import _parse_cached, parse_cli
+from dbt_selector.selectors import FragmentCache, dump_selectors, import_selectors_yaml
+from dbt_selector.suggest import Suggester
+from dbt_selector.synthesize import synthesize
+
+from .synthetic import (FAN_IN_DISTRIBUTIONS, MATERIALIZATIONS, DagSpec, generate_selectors,
+                        random_cli_spec, random_glob_criterion, write_manifest)
+
+SCHEMA_VERSION = 1
+DEFAULT_NODES = (1000, 10000)
+EXPANSION_DEPTHS = (1, 2, 4, None)
+# Ratio above which --compare flags a benchmark as slower
+REGRESSION_THRESHOLD = 1.2
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": repeat}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+class Suite:
+    """Runs every benchmark for one synthetic project size"""
+
+    def __init__(self, spec: DagSpec, workdir: str, repeat: int, selectors: int):
+        self.spec = spec
+        self.workdir = workdir
+        self.repeat = repeat
+        self.num_selectors = selectors
+        self.results: List[Dict[str, Any]] = []
+
+    def record(self, name: str, fn: Callable[[], Any], repeat: Optional[int] = None, **params: Any):
+        timing = measure(fn, repeat or self.repeat)
+        self.results.append({"benchmark": name, "nodes": self.spec.nodes, "params": params, **timing})
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"  {name:<24} {label:<28} median {timing['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+
+    def run(self) -> List[Dict[str, Any]]:
+        path = os.path.join(self.workdir, f"manifest_{self.spec.nodes}.json")
+        size = write_manifest(self.spec, path)
+        print(f"{self.spec.nodes} nodes ({size / 1e6:.1f} MB manifest)", file=sys.stderr)
+        rng = random.Random(self.spec.seed)
+
+        # Index build is slow at the top of the range, so it is timed fewer times
+        slow = max(1, min(self.repeat, 3))
+        self.record("index_build.stream", lambda: load_manifest(path), repeat=slow, manifest_bytes=size)
+        cache = IndexCache(os.path.join(self.workdir, "cache"))
+        key = cache.manifest_key(path)
+        manifest = load_manifest(path)
+        self.record("index_cache.write", lambda: cache.put(key, manifest), repeat=slow)
+        self.record("index_cache.read", lambda: cache.get(key), repeat=slow)
+
+        graph = manifest.graph
+        for seeds in (1, 100):
+            seed_ids = rng.sample(range(len(manifest)), min(seeds, len(manifest)))
+            for depth in EXPANSION_DEPTHS:
+                for direction in (PARENTS, CHILDREN):
+                    def expand():
+                        graph.closure.cache_clear()
+                        graph.expand(seed_ids, direction, depth)
+                    self.record("graph.expand", expand, seeds=seeds, depth=depth or "all", direction=direction)
+
+        globs = [random_glob_criterion(rng, self.spec) for _ in range(200)]
+        built = manifest.indexes
+
+        def match_globs():
+            # Fresh match cache each time, over the already built keyed indexes and tries
+            indexes = MethodIndexes(manifest.nodes, built.tables)
+            indexes._path, indexes._fqn = built.path, built.fqn
+            indexes.match_patterns(globs)
+        self.record("globs.match", match_globs, patterns=len(globs))
+
+        def select_config():
+            # Builds the config.materialized column, then compares codes
+            indexes = MethodIndexes(manifest.nodes, built.tables)
+            for value in MATERIALIZATIONS + ("incr*",):
+                indexes.select("config", value, ["materialized"])
+        self.record("config.select", select_config, values=len(MATERIALIZATIONS) + 1)
+
+        self.record("suggest.warm_up", lambda: Suggester(manifest).warm(), repeat=slow)
+        suggester = Suggester(manifest)
+        for method in ("tag", "path", "fqn"):
+            index = suggester.index(method)
+            queries = []
+            for value in rng.sample(index.values, min(100, len(index))):
+                query = value[:rng.randint(1, len(value))]
+                # Every other query has two characters swapped, as a typo
+                if len(queries) % 2 and len(query) > 3:
+                    query = query[:1] + query[2] + query[1] + query[3:]
+                queries.append(query)
+            typo = next((query for query in queries[1::2] if len(query) > 3), queries[0])
+
+            # The first keystroke on an unwarmed suggester builds the method's indexes
+            self.record("suggest.cold", lambda: Suggester(manifest).suggest(method, typo, 10),
+                        repeat=slow, method=method)
+            index.build_grams()
+
+            def suggest():
+                for query in queries:
+                    index.suggest(query, 10)
+            self.record("suggest", suggest, method=method, queries=len(queries))
+
+        texts = [random_cli_spec(rng, self.spec) for _ in range(1000)]
+
+        def parse():
+            _parse_cached.cache_clear()
+            for text in texts:
+                parse_cli(text)
+        self.record("parse_cli", parse, specs=len(texts))
+
+        selectors = generate_selectors(self.spec, self.num_selectors, seed=self.spec.seed)
+        self.record("yaml.dump", lambda: dump_selectors(selectors, FragmentCache()), selectors=len(selectors))
+        warm = FragmentCache()
+        self.record("yaml.dump.cached", lambda: dump_selectors(selectors, warm), selectors=len(selectors))
+        document = dump_selectors(selectors)
+        self.record("yaml.import", lambda: import_selectors_yaml(document), selectors=len(selectors))
+
+        def evaluate():
+            graph.closure.cache_clear()
+            BatchEvaluator(manifest, selectors).run()
+        self.record("selectors.evaluate", evaluate, selectors=len(selectors))
+
+        # Synthetic execution times; a tenth of the nodes never ran
+        costs = array("d", (rng.random() * 10 if rng.random() < 0.9 else -1.0 for _ in range(len(manifest))))
+        models = set(manifest.indexes.resource_type.get("model", ()))
+        self.record("cost.critical_path", lambda: selection_cost(manifest, models, costs), selected=len(models))
+        self.record("cost.shard", lambda: shard_selection(manifest, models, costs, 8), selected=len(models), shards=8)
+
+        # A target that one criterion plus one exclusion selects, as after a partial rerun
+        target = Evaluator(manifest).evaluate("package:package_1 --exclude tag:tag_0")
+        self.record("synthesize", lambda: synthesize(manifest, target, budget=5.0), target=len(target))
+        return self.results
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="dbt-selector-bench-") as workdir:
+        for nodes in args.nodes:
+            spec = DagSpec(nodes=nodes, fan_in=args.fan_in, mean_parents=args.mean_parents,
+                           tags=args.tags, packages=args.packages, directories=args.directories,
+                           seed=args.seed)
+            results.extend(Suite(spec, workdir, args.repeat, args.selectors).run())
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+
+
+def _result_key(result: Dict[str, Any]) -> str:
+    return json.dumps([result["benchmark"], result["nodes"], result["params"]], sort_keys=True)
+
+
+def compare(old_path: str, new_path: str) -> int:
+    """Print median ratios between two result files; exits 1 when anything regressed"""
+    with open(old_path, encoding="utf-8") as f:
+        old = {_result_key(r): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    regressed = False
+    for result in new:
+        before = old.get(_result_key(result))
+        if before is None or not before["median_s"]:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        flag = "REGRESSED" if ratio > REGRESSION_THRESHOLD else ""
+        regressed = regressed or bool(flag)
+        params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(f"{result['benchmark']:<24} {result['nodes']:>7} {params:<40} {ratio:6.2f}x {flag}")
+    return 1 if regressed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=list(DEFAULT_NODES),
+                        help="Project sizes to generate, e.g. 1000 10000 200000")
+    parser.add_argument("--fan-in", choices=FAN_IN_DISTRIBUTIONS, default="powerlaw")
+    parser.add_argument("--mean-parents", type=float, default=2.0)
+    parser.add_argument("--tags", type=int, default=50, help="Distinct tags")
+    parser.add_argument("--packages", type=int, default=5, help="Distinct packages")
+    parser.add_argument("--directories", type=int, default=100, help="Distinct model directories")
+    parser.add_argument("--selectors", type=int, default=1000, help="Selectors in the generated selectors.yml")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return compare(*args.compare)
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Synthetic dbt manifests and selector lists for benchmarks
+
+Models are laid out in topological order, so every edge points from an
+earlier node to a later one and the graph is always a DAG. Fan-in is drawn
+from the chosen distribution. Fan-out comes from how parents are picked: a
+"powerlaw" DAG attaches preferentially to nodes that already have many
+children, producing the few very wide hubs (staging models, date spines)
+that real projects have.
+"""
+import json
+import random
+from typing import Any, Dict, List, Tuple
+
+FAN_IN_DISTRIBUTIONS = ("uniform", "poisson", "powerlaw")
+MATERIALIZATIONS = ("view", "table", "incremental", "ephemeral")
+LAYERS = ("staging", "intermediate", "marts")
+
+
+class DagSpec:
+    """Shape of a synthetic project"""
+
+    def __init__(self, nodes: int = 1000, fan_in: str = "powerlaw", mean_parents: float = 2.0,
+                 locality: int = 500, tests_per_model: float = 1.5, sources: float = 0.05,
+                 tags: int = 50, packages: int = 5, directories: int = 100, seed: int = 0):
+        if fan_in not in FAN_IN_DISTRIBUTIONS:
+            raise ValueError(f"fan_in must be one of {', '.join(FAN_IN_DISTRIBUTIONS)}")
+        self.nodes = nodes
+        self.fan_in = fan_in
+        self.mean_parents = mean_parents
+        # Parents are drawn from the last ``locality`` models, as projects are built in layers
+        self.locality = locality
+        self.tests_per_model = tests_per_model
+        self.sources = sources
+        self.tags = tags
+        self.packages = packages
+        self.directories = directories
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _num_parents(rng: random.Random, spec: DagSpec) -> int:
+    mean = spec.mean_parents
+    if spec.fan_in == "uniform":
+        return rng.randint(0, int(2 * mean))
+    if spec.fan_in == "poisson":
+        # Knuth's method; means here are small
+        limit, k, p = pow(2.718281828459045, -mean), 0, 1.0
+        while True:
+            p *= rng.random()
+            if p <= limit:
+                return k
+            k += 1
+    # Pareto tail with the requested mean
+    return min(int(rng.paretovariate(2.0) * mean / 2.0), 50)
+
+
+def generate_manifest(spec: DagSpec) -> Dict[str, Any]:
+    """A manifest.json-shaped dict with about ``spec.nodes`` resources, tests included"""
+    rng = random.Random(spec.seed)
+    nodes: Dict[str, Any] = {}
+    sources: Dict[str, Any] = {}
+    parent_map: Dict[str, List[str]] = {}
+    packages = [f"package_{i}" for i in range(spec.packages)]
+    tags = [f"tag_{i}" for i in range(spec.tags)]
+
+    total = max(spec.nodes, 1)
+    num_tests = int(total * spec.tests_per_model / (1 + spec.tests_per_model))
+    num_sources = max(1, int((total - num_tests) * spec.sources))
+    num_models = max(1, total - num_tests - num_sources)
+
+    upstream: List[str] = []
+    # Each node appears once per child it has, so sampling from it favours hubs
+    attachment: List[str] = []
+    for i in range(num_sources):
+        source_name = f"src_{i % 20}"
+        uid = f"source.{packages[0]}.{source_name}.table_{i}"
+        sources[uid] = {
+            "resource_type": "source", "package_name": packages[0], "name": f"table_{i}",
+            "source_name": source_name, "original_file_path": f"models/sources/{source_name}.yml",
+            "fqn": [packages[0], "sources", source_name, f"table_{i}"], "tags": [], "config": {"enabled": True},
+        }
+        parent_map[uid] = []
+        upstream.append(uid)
+        attachment.append(uid)
+
+    models = []
+    for i in range(num_models):
+        package = packages[0] if rng.random() < 0.8 else rng.choice(packages)
+        layer = LAYERS[min(i * len(LAYERS) // num_models, len(LAYERS) - 1)]
+        directory = f"{layer}/dir_{rng.randrange(spec.directories)}"
+        name = f"model_{i}"
+        uid = f"model.{package}.{name}"
+        model_tags = rng.sample(tags, min(len(tags), rng.choice((0, 1, 1, 2, 3))))
+        config = {
+            "enabled": True,
+            "materialized": rng.choice(MATERIALIZATIONS),
+            "tags": model_tags,
+            "schema": layer,
+        }
+        nodes[uid] = {
+            "resource_type": "model", "package_name": package, "name": name,
+            "original_file_path": f"models/{directory}/{name}.sql", "path": f"{directory}/{name}.sql",
+            "fqn": [package] + directory.split("/") + [name], "tags": model_tags, "config": config,
+            "checksum": {"name": "sha256", "checksum": f"{rng.getrandbits(64):016x}"},
+        }
+        parents: List[str] = []
+        window = upstream[-spec.locality:]
+        for _ in range(min(_num_parents(rng, spec), len(window))):
+            if spec.fan_in == "powerlaw" and attachment and rng.random() < 0.5:
+                parent = attachment[rng.randrange(max(0, len(attachment) - 4 * spec.locality), len(attachment))]
+            else:
+                parent = rng.choice(window)
+            if parent not in parents:
+                parents.append(parent)
+        parent_map[uid] = parents
+        attachment.extend(parents)
+        upstream.append(uid)
+        models.append(uid)
+
+    for i in range(num_tests):
+        model = rng.choice(models)
+        test_name = rng.choice(("not_null", "unique", "accepted_values", "relationships"))
+        model_node = nodes[model]
+        uid = f"test.{model_node['package_name']}.{test_name}_{model_node['name']}_{i}"
+        parents = [model]
+        if test_name == "relationships" and len(models) > 1:
+            other = rng.choice(models)
+            if other != model:
+                parents.append(other)
+        nodes[uid] = {
+            "resource_type": "test", "package_name": model_node["package_name"], "name": uid.split(".")[-1],
+            "original_file_path": model_node["original_file_path"].rsplit("/", 1)[0] + "/schema.yml",
+            "fqn": model_node["fqn"][:-1] + [uid.split(".")[-1]], "tags": model_node["tags"],
+            "config": {"enabled": True, "severity": "ERROR"}, "test_metadata": {"name": test_name},
+        }
+        parent_map[uid] = parents
+
+    child_map: Dict[str, List[str]] = {uid: [] for uid in parent_map}
+    for uid, parents in parent_map.items():
+        for parent in parents:
+            child_map[parent].append(uid)
+    return {
+        "metadata": {"dbt_version": "1.8.0", "generator": "dbt-selector-benchmarks", "spec": spec.as_dict()},
+        "nodes": nodes,
+        "sources": sources,
+        "macros": {},
+        "parent_map": parent_map,
+        "child_map": child_map,
+    }
+
+
+def write_manifest(spec: DagSpec, path: str) -> int:
+    """Write a synthetic manifest.json; returns its size in bytes"""
+    text = json.dumps(generate_manifest(spec))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return len(text)
+
+
+def random_cli_spec(rng: random.Random, spec: DagSpec) -> str:
+    """One CLI-style selection using the vocabulary of a synthetic project"""
+    method = rng.choice(("tag", "path", "package", "config.materialized", "fqn", "resource_type"))
+    value = {
+        "tag": lambda: f"tag_{rng.randrange(spec.tags)}",
+        "path": lambda: f"models/{rng.choice(LAYERS)}/dir_{rng.randrange(spec.directories)}",
+        "package": lambda: f"package_{rng.randrange(spec.packages)}",
+        "config.materialized": lambda: rng.choice(MATERIALIZATIONS),
+        "fqn": lambda: f"model_{rng.randrange(max(spec.nodes // 3, 1))}",
+        "resource_type": lambda: rng.choice(("model", "source", "test")),
+    }[method]()
+    prefix = rng.choice(("", "", "+", "1+", "2+"))
+    suffix = rng.choice(("", "", "+", "+1", "+3"))
+    return f"{prefix}{method}:{value}{suffix}"
+
+
+def random_glob_criterion(rng: random.Random, spec: DagSpec) -> Tuple[str, str]:
+    """A ``(method, value)`` pair with a wildcard value, as in ``fqn:marts.finance.*``"""
+    method = rng.choice(("tag", "test_name", "file", "path", "fqn"))
+    if method == "tag":
+        return method, f"tag_{rng.randrange(spec.tags)}*"
+    if method == "test_name":
+        return method, rng.choice(("not_null", "unique", "accepted_values", "relationships"))[:4] + "*"
+    if method == "file":
+        return method, f"model_{rng.randrange(100)}*"
+    layer, directory = rng.choice(LAYERS), rng.randrange(spec.directories)
+    if method == "path":
+        return method, rng.choice((f"models/{layer}/*", f"models/{layer}/dir_{directory}*",
+                                   f"models/*/dir_{directory}/model_1*.sql"))
+    package = f"package_{rng.randrange(spec.packages)}"
+    return method, rng.choice((f"{package}.{layer}.*", f"{package}.{layer}.dir_{directory}?",
+                               f"package_?.{layer}.dir_{directory}.model_*"))
+
+
+def generate_selectors(spec: DagSpec, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """A selectors list mixing single specs, unions, intersections and exclusions"""
+    from dbt_selector.parser import parse_cli
+
+    rng = random.Random(seed)
+    selectors = []
+    for i in range(count):
+        specs = [random_cli_spec(rng, spec) for _ in range(rng.choice((1, 1, 2, 3)))]
+        text = rng.choice((" ", ",")).join(specs)
+        if rng.random() < 0.2:
+            text += f" --exclude {random_cli_spec(rng, spec)}"
+        definition: Any = text if len(specs) == 1 and "--exclude" not in text else parse_cli(text)
+        if i and rng.random() < 0.1:
+            definition = {"union": [{"method": "selector", "value": f"selector_{rng.randrange(i)}"},
+                                    parse_cli(random_cli_spec(rng, spec))]}
+        selectors.append({
+            "name": f"selector_{i}",
+            "description": f"Synthetic selector {i}",
+            "default": False,
+            "definition": definition,
+        })
+    return selectors
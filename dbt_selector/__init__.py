@@ -0,0 +1,66 @@
+"""Selector evaluation engine for previewing dbt selectors against a manifest
+
+Submodules are imported on first attribute access, so ``dbt-selector --help``
+and other light commands do not pay for YAML, hashing or index code.
+"""
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "RunHistory": "artifacts",
+    "load_artifact": "artifacts",
+    "BatchEvaluator": "batch",
+    "selection_cost": "cost",
+    "shard_names": "cost",
+    "shard_selection": "cost",
+    "shard_selectors": "cost",
+    "evaluate_all": "batch",
+    "Evaluator": "evaluate",
+    "evaluate": "evaluate",
+    "ManifestError": "exceptions",
+    "SelectorError": "exceptions",
+    "IndexCache": "index_cache",
+    "load_manifest": "ingest",
+    "stream_manifest": "ingest",
+    "Manifest": "manifest",
+    "Node": "manifest",
+    "Planner": "planner",
+    "format_plan": "planner",
+    "convert": "parser",
+    "parse_cli": "parser",
+    "to_cli": "parser",
+    "to_full_yaml": "parser",
+    "to_key_value": "parser",
+    "FragmentCache": "selectors",
+    "dump_selectors": "selectors",
+    "import_selectors_yaml": "selectors",
+    "load_selectors_yaml": "selectors",
+    "make_selector": "selectors",
+    "method_criterion": "selectors",
+    "validate_selectors": "selectors",
+    "Mesh": "mesh",
+    "ManifestRegistry": "registry",
+    "load_mesh": "mesh",
+    "ManifestDiff": "state",
+    "Suggester": "suggest",
+    "suggester_for": "suggest",
+    "Synthesizer": "synthesize",
+    "synthesize": "synthesize",
+    "CriterionTree": "editor",
+    "Tracer": "trace",
+}
+
+__all__ = sorted(_EXPORTS, key=lambda name: (name[0].islower(), name))
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,252 @@
+"""Run history from run_results.json and sources.json, for the ``result`` and ``source_status`` methods
+
+Both artifacts are streamed: each entry of ``results`` is decoded on its own
+and reduced to its unique_id, status and (for sources) ``max_loaded_at``, so
+the file is never held in memory whole. Each artifact becomes a ``RunSnapshot``
+that indexes unique_ids by status.
+
+A ``RunHistory`` keeps the most recent snapshots of each kind in ring buffers
+of ``max_runs`` entries; loading more runs drops the oldest. As in dbt,
+``result:<status>`` reads the latest run_results.json and
+``source_status:fresher`` compares the latest sources.json with the one before.
+Status sets are mapped to a manifest's node IDs once per manifest and cached.
+Each node's ``execution_time``, averaged over the runs kept, feeds cost
+estimates (see ``cost``).
+"""
+import weakref
+from array import array
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, TextIO, Tuple
+
+from .evaluate import MethodHandler
+from .exceptions import ManifestError, SelectorError
+from .ingest import CHUNK_SIZE, JSONStream
+from .manifest import Manifest
+
+DEFAULT_HISTORY = 10
+RUN_RESULTS = "run_results"
+SOURCES = "sources"
+RESULT_VALUES = ("success", "error", "fail", "warn", "skipped", "pass", "runtime error")
+SOURCE_STATUS_VALUES = ("fresher", "stale", "pass", "warn", "error", "runtime error")
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    # dbt writes ISO 8601 with a trailing Z or an explicit offset
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class RunSnapshot:
+    """One run_results.json or sources.json: unique_ids by status, source load times and node timings"""
+
+    __slots__ = ("kind", "path", "generated_at", "statuses", "loaded_at", "timings")
+
+    def __init__(self, kind: str, path: str = "", generated_at: str = "",
+                 statuses: Optional[Dict[str, List[str]]] = None,
+                 loaded_at: Optional[Dict[str, float]] = None,
+                 timings: Optional[Dict[str, float]] = None):
+        self.kind = kind
+        self.path = path
+        self.generated_at = generated_at
+        self.statuses = statuses or {}
+        # Source unique_id -> max_loaded_at as a POSIX timestamp
+        self.loaded_at = loaded_at or {}
+        # unique_id -> execution_time in seconds
+        self.timings = timings or {}
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.statuses.values())
+
+    def summary(self) -> Dict[str, int]:
+        return {status: len(ids) for status, ids in sorted(self.statuses.items())}
+
+
+def stream_artifact(f: TextIO, path: str = "", chunk_size: int = CHUNK_SIZE) -> RunSnapshot:
+    """Read a run_results.json or sources.json, telling them apart by schema or content"""
+    stream = JSONStream(f, chunk_size)
+    metadata: Dict[str, Any] = {}
+    statuses: Dict[str, List[str]] = defaultdict(list)
+    loaded_at: Dict[str, float] = {}
+    timings: Dict[str, float] = {}
+    for key in stream.items():
+        if key == "metadata":
+            metadata = stream.value()
+        elif key == "results":
+            for _ in stream.elements():
+                result = stream.value()
+                if not isinstance(result, dict) or "unique_id" not in result:
+                    continue
+                unique_id = result["unique_id"]
+                statuses[str(result.get("status"))].append(unique_id)
+                if isinstance(result.get("execution_time"), (int, float)):
+                    timings[unique_id] = float(result["execution_time"])
+                if "max_loaded_at" in result:
+                    timestamp = _timestamp(result["max_loaded_at"])
+                    if timestamp is not None:
+                        loaded_at[unique_id] = timestamp
+        else:
+            stream.skip()
+    schema = str(metadata.get("dbt_schema_version", ""))
+    if "/sources/" in schema:
+        kind = SOURCES
+    elif "/run-results/" in schema:
+        kind = RUN_RESULTS
+    else:
+        kind = SOURCES if loaded_at else RUN_RESULTS
+    return RunSnapshot(kind, path, str(metadata.get("generated_at", "")), dict(statuses), loaded_at, timings)
+
+
+def load_artifact(path: str, chunk_size: int = CHUNK_SIZE) -> RunSnapshot:
+    """Stream a run_results.json or sources.json from disk"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return stream_artifact(f, path, chunk_size)
+    except (OSError, UnicodeDecodeError) as e:
+        raise ManifestError(f"Could not read {path}: {e}") from e
+    except ManifestError as e:
+        raise ManifestError(f"Could not read {path}: {e}") from e
+
+
+class RunHistory:
+    """The latest ``max_runs`` run_results.json and sources.json snapshots, in two ring buffers"""
+
+    def __init__(self, max_runs: int = DEFAULT_HISTORY):
+        if max_runs < 1:
+            raise ValueError("max_runs must be at least 1")
+        self.max_runs = max_runs
+        self.runs: Deque[RunSnapshot] = deque(maxlen=max_runs)
+        self.freshness: Deque[RunSnapshot] = deque(maxlen=max_runs)
+        # Node ID sets per manifest, keyed by (snapshot, value); dropped with the manifest
+        self._ids: "weakref.WeakKeyDictionary[Manifest, Dict[Tuple[int, str], Set[int]]]" = \
+            weakref.WeakKeyDictionary()
+        self._times: "weakref.WeakKeyDictionary[Manifest, array]" = weakref.WeakKeyDictionary()
+
+    def add(self, snapshot: RunSnapshot):
+        """Append a snapshot, keeping each buffer ordered by ``generated_at``"""
+        buffer = self.freshness if snapshot.kind == SOURCES else self.runs
+        if buffer and snapshot.generated_at and snapshot.generated_at < buffer[-1].generated_at:
+            ordered = sorted(list(buffer) + [snapshot], key=lambda s: s.generated_at)
+            buffer.clear()
+            buffer.extend(ordered)
+        else:
+            buffer.append(snapshot)
+        self._ids.clear()
+        self._times.clear()
+
+    def load(self, path: str) -> RunSnapshot:
+        snapshot = load_artifact(path)
+        self.add(snapshot)
+        return snapshot
+
+    @classmethod
+    def from_paths(cls, paths: List[str], max_runs: int = DEFAULT_HISTORY) -> "RunHistory":
+        history = cls(max_runs)
+        for path in paths:
+            history.load(path)
+        return history
+
+    @property
+    def latest_run(self) -> Optional[RunSnapshot]:
+        return self.runs[-1] if self.runs else None
+
+    @property
+    def latest_sources(self) -> Optional[RunSnapshot]:
+        return self.freshness[-1] if self.freshness else None
+
+    def _cached(self, manifest: Manifest, snapshot: RunSnapshot, value: str, compute) -> Set[int]:
+        cache = self._ids.setdefault(manifest, {})
+        key = (id(snapshot), value)
+        ids = cache.get(key)
+        if ids is None:
+            ids = cache[key] = compute()
+        return set(ids)
+
+    def select_result(self, manifest: Manifest, value: str) -> Set[int]:
+        """Nodes matched by ``result:<value>`` in the latest run"""
+        run = self.latest_run
+        if run is None:
+            raise SelectorError("The result method needs a run_results.json")
+        if value not in RESULT_VALUES and value not in run.statuses:
+            raise SelectorError(f"Invalid result selector value '{value}'; use one of {', '.join(RESULT_VALUES)}")
+        return self._cached(manifest, run, value, lambda: _node_ids(manifest, run.statuses.get(value, ())))
+
+    def select_source_status(self, manifest: Manifest, value: str) -> Set[int]:
+        """Sources matched by ``source_status:<value>`` in the latest sources.json"""
+        current = self.latest_sources
+        if current is None:
+            raise SelectorError("The source_status method needs a sources.json")
+        if value not in SOURCE_STATUS_VALUES:
+            raise SelectorError(f"Invalid source_status selector value '{value}'; "
+                                f"use one of {', '.join(SOURCE_STATUS_VALUES)}")
+        if value not in ("fresher", "stale"):
+            return self._cached(manifest, current, value, lambda: _node_ids(manifest, current.statuses.get(value, ())))
+        if len(self.freshness) < 2:
+            raise SelectorError(f"source_status:{value} compares two sources.json files; only one is loaded")
+        previous = self.freshness[-2]
+        fresher, stale = [], []
+        for unique_id, loaded_at in current.loaded_at.items():
+            before = previous.loaded_at.get(unique_id)
+            # A source missing from the previous run counts as fresher, as in dbt
+            (fresher if before is None or loaded_at > before else stale).append(unique_id)
+        wanted = fresher if value == "fresher" else stale
+        return self._cached(manifest, current, value, lambda: _node_ids(manifest, wanted))
+
+    def execution_times(self, manifest: Manifest) -> Optional[array]:
+        """Mean ``execution_time`` per node ID over the runs kept; -1.0 where a node never ran"""
+        if not self.runs:
+            return None
+        times = self._times.get(manifest)
+        if times is None:
+            totals = array("d", [0.0]) * len(manifest)
+            runs = array("i", [0]) * len(manifest)
+            ids = manifest.ids
+            for run in self.runs:
+                for unique_id, seconds in run.timings.items():
+                    i = ids.get(unique_id)
+                    if i is not None:
+                        totals[i] += seconds
+                        runs[i] += 1
+            times = self._times[manifest] = array("d", (total / count if count else -1.0
+                                                        for total, count in zip(totals, runs)))
+        return times
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "runs": len(self.runs),
+            "sources": len(self.freshness),
+            "max_runs": self.max_runs,
+            "latest_run": self.latest_run.summary() if self.latest_run else {},
+            "latest_sources": self.latest_sources.summary() if self.latest_sources else {},
+        }
+
+
+def _node_ids(manifest: Manifest, unique_ids) -> Set[int]:
+    ids = manifest.ids
+    return {ids[uid] for uid in unique_ids if uid in ids}
+
+
+def result_method(history: Optional[RunHistory], manifest: Manifest) -> MethodHandler:
+    """A ``result`` method handler reading the latest run_results.json in ``history``"""
+
+    def select(value: str, args: List[str]) -> Set[int]:
+        if history is None:
+            raise SelectorError("The result method needs a run_results.json")
+        return history.select_result(manifest, value)
+
+    return select
+
+
+def source_status_method(history: Optional[RunHistory], manifest: Manifest) -> MethodHandler:
+    """A ``source_status`` method handler comparing the last two sources.json in ``history``"""
+
+    def select(value: str, args: List[str]) -> Set[int]:
+        if history is None:
+            raise SelectorError("The source_status method needs a sources.json")
+        return history.select_source_status(manifest, value)
+
+    return select
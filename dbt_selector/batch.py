@@ -0,0 +1,226 @@
+"""Evaluate every selector in a selectors.yml in one pass with shared subresults"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from .artifacts import RunHistory, result_method, source_status_method
+from .evaluate import Evaluator
+from .exceptions import SelectorError
+from .manifest import Manifest
+from .planner import GRAPH_KEYS, LEAF, PlanNode, Planner, normalize
+from .state import ManifestDiff, state_method
+
+DEFAULT_CACHE_SIZE = 2048
+
+
+class ResultCache:
+    """Bounded LRU of subtree results keyed by a plan node's structural key"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Set[int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Set[int]]:
+        ids = self.entries.get(key)
+        if ids is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return ids
+
+    def __setitem__(self, key: str, ids: Set[int]):
+        self.entries[key] = ids
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SelectorResult:
+    """Outcome of evaluating one named selector"""
+
+    __slots__ = ("name", "node_ids", "elapsed", "error")
+
+    def __init__(self, name: str, node_ids: Optional[Set[int]] = None,
+                 elapsed: float = 0.0, error: Optional[str] = None):
+        self.name = name
+        self.node_ids = node_ids
+        self.elapsed = elapsed
+        self.error = error
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "selector": self.name,
+            "nodes": None if self.node_ids is None else len(self.node_ids),
+            "time_ms": round(self.elapsed * 1000, 2),
+            "error": self.error or "",
+        }
+
+
+class BatchEvaluator:
+    """Evaluates a list of named selectors against one manifest
+
+    Subtrees shared between selectors, including ``selector:`` references to
+    other selectors in the list, are computed once and kept in a bounded cache.
+    ``state`` is the manifest that ``state:`` criteria compare against, and
+    ``history`` the run_results.json and sources.json files that ``result:``
+    and ``source_status:`` criteria read.
+    """
+
+    def __init__(self, manifest: Manifest, selectors: List[Dict[str, Any]],
+                 cache_size: int = DEFAULT_CACHE_SIZE, state: Optional[Manifest] = None,
+                 history: Optional[RunHistory] = None):
+        self.manifest = manifest
+        self.selectors = selectors
+        self.state = state
+        self.history = history
+        self.definitions = {selector["name"]: selector["definition"] for selector in selectors}
+        self.names = [selector["name"] for selector in selectors]
+        self.cache = ResultCache(cache_size)
+        self.evaluator = Evaluator(manifest, {
+            "selector": self._select_selector,
+            "state": state_method(state, manifest),
+            "result": result_method(history, manifest),
+            "source_status": source_status_method(history, manifest),
+        })
+        self.planner = Planner(self.evaluator)
+        self.plans: Dict[str, PlanNode] = {}
+        # Leaf results kept for incremental re-evaluation, by leaf key
+        self.leaf_results: Dict[str, Set[int]] = {}
+        self.results: Dict[str, SelectorResult] = {}
+        # Set by rerun(): the evaluation being updated and its manifest diff
+        self.previous: Optional["BatchEvaluator"] = None
+        self.diff: Optional[ManifestDiff] = None
+        self.reused: List[str] = []
+        self._stack: List[str] = []
+
+    def _select_selector(self, value: str, args: List[str]) -> Set[int]:
+        # The selector method: reuse (or compute) another selector's result
+        if value not in self.definitions:
+            raise SelectorError(f"Unknown selector '{value}'")
+        return self.evaluate(value)
+
+    def evaluate(self, name: str) -> Set[int]:
+        """Node IDs for one named selector, memoized in the shared cache"""
+        key = f"selector:{name}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if name in self._stack:
+            cycle = " -> ".join(self._stack[self._stack.index(name):] + [name])
+            raise SelectorError(f"Circular selector reference: {cycle}")
+        self._stack.append(name)
+        try:
+            ids = self._carry_over(name) if self.previous is not None else None
+            if ids is None:
+                root = self.plans[name] = self.planner.plan(self.definitions[name])
+                ids = self.planner.execute(root, self.cache)
+                for leaf in _leaves(root):
+                    if leaf.key in self.cache.entries:
+                        self.leaf_results[leaf.key] = self.cache.entries[leaf.key]
+            else:
+                self.reused.append(name)
+        finally:
+            self._stack.pop()
+        self.cache[key] = ids
+        return ids
+
+    def _carry_over(self, name: str) -> Optional[Set[int]]:
+        """The previous result for ``name`` mapped onto the new manifest, if none of its inputs changed
+
+        Leaves whose seeds and graph region are unchanged are put in the cache
+        either way, so a selector that does need recomputing only redoes the
+        leaves that changed.
+        """
+        previous, diff = self.previous, self.diff
+        root, result = previous.plans.get(name), previous.results.get(name)
+        if root is None:
+            return None
+        reusable = result is not None and result.node_ids is not None
+        for leaf in _leaves(root):
+            old_ids = previous.leaf_results.get(leaf.key)
+            old_seeds = previous.planner.cached_seeds(leaf.criterion)
+            if old_ids is None or old_seeds is None:
+                reusable = False
+                continue
+            if self.planner.select_seeds(leaf.criterion) != diff.map_ids(old_seeds):
+                reusable = False
+                continue
+            criterion = leaf.criterion
+            mode = criterion.get("indirect_selection") or "eager"
+            mapped = diff.map_ids(old_ids)
+            expands = mode != "empty" or any(criterion.get(k) for k in GRAPH_KEYS)
+            # buildable reads the parents of every selected node, beyond the result itself
+            if expands and (diff.region_changed(old_ids, mapped) or
+                            (mode == "buildable" and diff.edges_changed)):
+                reusable = False
+                continue
+            self.cache[leaf.key] = self.leaf_results[leaf.key] = mapped
+        self.plans[name] = root
+        return diff.map_ids(result.node_ids) if reusable else None
+
+    def _match_patterns(self):
+        # Glob, path and fqn values of every selector, matched in one pass per index
+        criteria = []
+        for definition in self.definitions.values():
+            try:
+                root = normalize(definition)
+            except SelectorError:
+                continue
+            for leaf in _leaves(root):
+                method = str(leaf.criterion["method"])
+                if method not in self.evaluator.methods:
+                    criteria.append((method, leaf.criterion.get("value", "")))
+        self.manifest.indexes.match_patterns(criteria)
+
+    def run(self) -> List[SelectorResult]:
+        self._match_patterns()
+        results = []
+        for name in self.names:
+            start = time.perf_counter()
+            try:
+                ids = self.evaluate(name)
+                results.append(SelectorResult(name, ids, time.perf_counter() - start))
+            except SelectorError as e:
+                results.append(SelectorResult(name, None, time.perf_counter() - start, str(e)))
+        self.results = {result.name: result for result in results}
+        return results
+
+    def rerun(self, manifest: Manifest, diff: Optional[ManifestDiff] = None) -> "BatchEvaluator":
+        """Evaluate the same selectors against a newer manifest, recomputing only what changed
+
+        Call after ``run()``. Returns a new evaluator whose ``results`` are
+        filled in and whose ``reused`` lists the selectors carried over as-is.
+        """
+        batch = BatchEvaluator(manifest, self.selectors, self.cache.max_entries, self.state, self.history)
+        batch.previous = self
+        batch.diff = diff or ManifestDiff(self.manifest, manifest)
+        batch.run()
+        # The new results stand alone; drop the link so old manifests can be freed
+        batch.previous = None
+        return batch
+
+
+def _leaves(node: PlanNode):
+    if node.op == LEAF:
+        yield node
+    for child in node.children:
+        yield from _leaves(child)
+
+
+def evaluate_all(manifest: Manifest, selectors: List[Dict[str, Any]],
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 state: Optional[Manifest] = None,
+                 history: Optional[RunHistory] = None) -> List[SelectorResult]:
+    """Evaluate every selector in order, sharing common sub-criteria"""
+    return BatchEvaluator(manifest, selectors, cache_size, state, history).run()
@@ -0,0 +1,357 @@
+"""``dbt-selector`` command line: generate, validate, evaluate, diff and synthesize selectors.yml files
+
+Only argparse is imported up front; each subcommand imports what it needs, so
+the CLI starts quickly in CI and pre-commit hooks.
+"""
+import argparse
+import sys
+from typing import Any, Dict, List, Optional
+
+from .parser import DEFAULT_INDIRECT_SELECTION, INDIRECT_SELECTION_MODES
+
+OUTPUT_FORMATS = ("table", "json", "ids")
+
+
+def _read_text(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_text(path: Optional[str], text: str):
+    if not path or path == "-":
+        sys.stdout.write(text)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _load_selectors(path: str) -> List[Dict[str, Any]]:
+    from .selectors import load_selectors_yaml
+    return load_selectors_yaml(_read_text(path))
+
+
+def _load_manifest(args: argparse.Namespace, path: Optional[str] = None):
+    path = path or args.manifest
+    if args.no_cache:
+        from .ingest import load_manifest
+        return load_manifest(path)
+    from .index_cache import IndexCache
+    return IndexCache(args.cache_dir).load_manifest(path)
+
+
+def _load_state(args: argparse.Namespace):
+    return _load_manifest(args, args.state) if args.state else None
+
+
+def _load_history(args: argparse.Namespace):
+    paths = (args.run_results or []) + (args.sources or [])
+    if not paths:
+        return None
+    from .artifacts import DEFAULT_HISTORY, RunHistory
+    return RunHistory.from_paths(paths, args.history or DEFAULT_HISTORY)
+
+
+def _pick(selectors: List[Dict[str, Any]], names: Optional[List[str]]) -> List[str]:
+    from .exceptions import SelectorError
+    available = [selector["name"] for selector in selectors]
+    if not names:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise SelectorError(f"Unknown selector(s): {', '.join(unknown)}")
+    return names
+
+
+def _table(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return ""
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns}
+    lines = ["  ".join(c.ljust(widths[c]) for c in columns)]
+    lines.append("  ".join("-" * widths[c] for c in columns))
+    lines.extend("  ".join(str(row[c]).ljust(widths[c]) for c in columns) for row in rows)
+    return "\n".join(line.rstrip() for line in lines) + "\n"
+
+
+def cmd_generate(args: argparse.Namespace) -> int:
+    from .parser import is_single_spec, parse_cli
+    from .selectors import dump_selectors, make_selector, validate_selectors
+
+    definition: Any = parse_cli(args.selection, args.indirect_selection)
+    # dbt only accepts a single spec as a string definition
+    if is_single_spec(args.selection) and not args.full_yaml and \
+            args.indirect_selection == DEFAULT_INDIRECT_SELECTION:
+        definition = args.selection.strip()
+    selectors = _load_selectors(args.append) if args.append else []
+    selector = make_selector(args.name, definition, args.description, args.default)
+    names = [existing["name"] for existing in selectors]
+    if args.name in names:
+        selectors[names.index(args.name)] = selector
+    else:
+        selectors.append(selector)
+    errors = validate_selectors(selectors)
+    if errors:
+        for error in errors:
+            print(f"error: {error}", file=sys.stderr)
+        return 1
+    _write_text(args.output or args.append, dump_selectors(selectors))
+    return 0
+
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    from .exceptions import SelectorError
+    from .selectors import validate_selectors
+
+    failed = False
+    for path in args.files:
+        try:
+            errors = validate_selectors(_load_selectors(path))
+        except SelectorError as e:
+            errors = [str(e)]
+        for error in errors:
+            print(f"{path}: {error}", file=sys.stderr)
+        failed = failed or bool(errors)
+        if args.manifest and not errors:
+            failed = _check_selections(args, path) or failed
+    return 1 if failed else 0
+
+
+def _check_selections(args: argparse.Namespace, path: str) -> bool:
+    # With a manifest, selectors that fail to evaluate or select nothing are reported too
+    from .batch import evaluate_all
+    failed = False
+    for result in evaluate_all(_load_manifest(args), _load_selectors(path), state=_load_state(args),
+                               history=_load_history(args)):
+        if result.error:
+            print(f"{path}: {result.name}: {result.error}", file=sys.stderr)
+            failed = True
+        elif not result.node_ids:
+            print(f"{path}: {result.name}: selects no nodes", file=sys.stderr)
+            failed = failed or args.fail_on_empty
+    return failed
+
+
+def cmd_evaluate(args: argparse.Namespace) -> int:
+    import json
+
+    from .batch import BatchEvaluator
+
+    manifest = _load_manifest(args)
+    selectors = _load_selectors(args.file)
+    names = set(_pick(selectors, args.selector))
+    batch = BatchEvaluator(manifest, selectors, state=_load_state(args), history=_load_history(args))
+    results = [result for result in batch.run() if result.name in names]
+    if args.format == "ids":
+        ids = set()
+        for result in results:
+            ids |= result.node_ids or set()
+        _write_text(None, "".join(f"{uid}\n" for uid in manifest.unique_ids(ids)))
+    elif args.format == "json":
+        _write_text(None, json.dumps({
+            result.name: {
+                **result.as_row(),
+                "unique_ids": manifest.unique_ids(result.node_ids or set()),
+            } for result in results
+        }, indent=2) + "\n")
+    else:
+        _write_text(None, _table([result.as_row() for result in results]))
+    for result in results:
+        if result.error:
+            print(f"{result.name}: {result.error}", file=sys.stderr)
+    return 1 if any(result.error for result in results) else 0
+
+
+def cmd_diff(args: argparse.Namespace) -> int:
+    import json
+
+    from .batch import evaluate_all
+
+    manifest, state, history = _load_manifest(args), _load_state(args), _load_history(args)
+    old = {r.name: r for r in evaluate_all(manifest, _load_selectors(args.old), state=state, history=history)}
+    new = {r.name: r for r in evaluate_all(manifest, _load_selectors(args.new), state=state, history=history)}
+    errors = [f"{path}: {r.name}: {r.error}" for path, results in ((args.old, old), (args.new, new))
+              for r in results.values() if r.error]
+    for error in errors:
+        print(error, file=sys.stderr)
+    names = args.selector or list(dict.fromkeys(list(old) + list(new)))
+    changes: Dict[str, Dict[str, List[str]]] = {}
+    for name in names:
+        before = old[name].node_ids if name in old else None
+        after = new[name].node_ids if name in new else None
+        before, after = before or set(), after or set()
+        added, removed = manifest.unique_ids(after - before), manifest.unique_ids(before - after)
+        if added or removed or (name in old) != (name in new):
+            changes[name] = {"added": added, "removed": removed}
+            if name not in old:
+                changes[name]["status"] = "new selector"
+            elif name not in new:
+                changes[name]["status"] = "removed selector"
+
+    if args.format == "json":
+        _write_text(None, json.dumps(changes, indent=2) + "\n")
+    else:
+        lines = []
+        for name, change in changes.items():
+            status = f" ({change['status']})" if "status" in change else ""
+            lines.append(f"{name}{status}: +{len(change['added'])} -{len(change['removed'])}")
+            lines.extend(f"  + {uid}" for uid in change["added"])
+            lines.extend(f"  - {uid}" for uid in change["removed"])
+        _write_text(None, "".join(f"{line}\n" for line in lines))
+    return 1 if errors or (changes and args.exit_code) else 0
+
+
+def cmd_mesh(args: argparse.Namespace) -> int:
+    import json
+
+    from .mesh import load_mesh
+
+    mesh = load_mesh(args.manifest, args.workers, not args.no_cache, args.cache_dir)
+    selectors = _load_selectors(args.file)
+    names = set(_pick(selectors, args.selector))
+    results = [(result, counts) for result, counts in mesh.evaluate(selectors, history=_load_history(args))
+               if result.name in names]
+    if args.format == "json":
+        _write_text(None, json.dumps({
+            result.name: {**result.as_row(), "projects": counts} for result, counts in results
+        }, indent=2) + "\n")
+    else:
+        rows = []
+        for result, counts in results:
+            row = result.as_row()
+            row["projects"] = " ".join(f"{name}={count}" for name, count in counts.items() if count)
+            rows.append(row)
+        _write_text(None, _table(rows))
+    for result, _ in results:
+        if result.error:
+            print(f"{result.name}: {result.error}", file=sys.stderr)
+    return 1 if any(result.error for result, _ in results) else 0
+
+
+def cmd_synthesize(args: argparse.Namespace) -> int:
+    from .selectors import dump_selectors, make_selector
+    from .synthesize import resolve_nodes, synthesize
+
+    manifest = _load_manifest(args)
+    ids, unknown = resolve_nodes(manifest, _read_text(args.nodes).replace(",", " ").split())
+    for name in unknown:
+        print(f"warning: not in the manifest: {name}", file=sys.stderr)
+    synthesis = synthesize(manifest, ids, args.budget, args.indirect_selection)
+    summary = synthesis.summary()
+    print(f"{synthesis.criteria} criteria, {synthesis.exclusions} exclusions, "
+          f"{summary['missing']} missing, {summary['extra']} extra ({summary['time_ms']:.0f} ms)",
+          file=sys.stderr)
+    selector = make_selector(args.name, synthesis.definition, args.description)
+    _write_text(args.output, dump_selectors([selector]))
+    return 0 if synthesis.exact else 1
+
+
+def _add_manifest_arguments(parser: argparse.ArgumentParser, required: bool):
+    parser.add_argument("--manifest", "-m", required=required,
+                        help="Path to target/manifest.json")
+    parser.add_argument("--state", metavar="MANIFEST",
+                        help="Manifest to compare against for state: criteria, like dbt's --state")
+    _add_artifact_arguments(parser)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always rebuild the manifest indexes instead of using the on-disk cache")
+    parser.add_argument("--cache-dir", help="Index cache directory (default: $DBT_SELECTOR_CACHE_DIR "
+                                            "or ~/.cache/dbt-selector)")
+
+
+def _add_artifact_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--run-results", action="append", metavar="FILE",
+                        help="run_results.json for result: criteria (repeatable; the latest run is used)")
+    parser.add_argument("--sources", action="append", metavar="FILE",
+                        help="sources.json for source_status: criteria (repeat with an earlier run "
+                             "to compare freshness)")
+    parser.add_argument("--history", type=int, metavar="N",
+                        help="Runs of each artifact kept; older ones are dropped (default: 10)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dbt-selector",
+        description="Generate, validate and evaluate dbt selectors.yml files without starting the app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a selector from a CLI-style selection")
+    generate.add_argument("name", help="Selector name")
+    generate.add_argument("selection", help="CLI-style selection, e.g. 'tag:nightly,path:models/marts'")
+    generate.add_argument("--description", default="", help="Selector description")
+    generate.add_argument("--default", action="store_true", help="Mark as the default selector")
+    generate.add_argument("--indirect-selection", default=DEFAULT_INDIRECT_SELECTION,
+                          choices=INDIRECT_SELECTION_MODES)
+    generate.add_argument("--full-yaml", action="store_true",
+                          help="Always write the definition in full YAML form")
+    generate.add_argument("--append", metavar="FILE",
+                          help="Add to (or replace by name in) an existing selectors.yml, written in place")
+    generate.add_argument("--output", "-o", help="Output file (default: stdout, or FILE with --append)")
+    generate.set_defaults(func=cmd_generate)
+
+    validate = commands.add_parser("validate", help="Check selectors.yml files; exits 1 on problems")
+    validate.add_argument("files", nargs="+", metavar="FILE")
+    _add_manifest_arguments(validate, required=False)
+    validate.add_argument("--fail-on-empty", action="store_true",
+                          help="With --manifest, fail when a selector selects no nodes")
+    validate.set_defaults(func=cmd_validate)
+
+    evaluate = commands.add_parser("evaluate", help="List the nodes each selector selects")
+    evaluate.add_argument("file", metavar="FILE")
+    _add_manifest_arguments(evaluate, required=True)
+    evaluate.add_argument("--selector", "-s", action="append", help="Only this selector (repeatable)")
+    evaluate.add_argument("--format", "-f", choices=OUTPUT_FORMATS, default="table")
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    diff = commands.add_parser("diff", help="Nodes added or removed per selector between two selectors.yml files")
+    diff.add_argument("old", metavar="OLD")
+    diff.add_argument("new", metavar="NEW")
+    _add_manifest_arguments(diff, required=True)
+    diff.add_argument("--selector", "-s", action="append", help="Only this selector (repeatable)")
+    diff.add_argument("--format", "-f", choices=("text", "json"), default="text")
+    diff.add_argument("--exit-code", action="store_true", help="Exit 1 when any selection changed")
+    diff.set_defaults(func=cmd_diff)
+
+    mesh = commands.add_parser("mesh", help="Evaluate selectors across several projects (dbt Mesh) as one graph")
+    mesh.add_argument("file", metavar="FILE")
+    mesh.add_argument("--manifest", "-m", action="append", required=True,
+                      help="A project's target/manifest.json (repeat once per project)")
+    mesh.add_argument("--workers", "-j", type=int, help="Processes building project indexes (default: CPUs)")
+    _add_artifact_arguments(mesh)
+    mesh.add_argument("--no-cache", action="store_true",
+                      help="Always rebuild the manifest indexes instead of using the on-disk cache")
+    mesh.add_argument("--cache-dir", help="Index cache directory")
+    mesh.add_argument("--selector", "-s", action="append", help="Only this selector (repeatable)")
+    mesh.add_argument("--format", "-f", choices=("table", "json"), default="table")
+    mesh.set_defaults(func=cmd_mesh)
+
+    synthesize = commands.add_parser("synthesize", help="Write a short selector selecting exactly the listed nodes")
+    synthesize.add_argument("name", help="Selector name")
+    synthesize.add_argument("nodes", metavar="FILE",
+                            help="unique_ids or node names, whitespace or comma separated ('-' for stdin)")
+    synthesize.add_argument("--manifest", "-m", required=True, help="Path to target/manifest.json")
+    synthesize.add_argument("--budget", type=float, default=2.0,
+                            help="Seconds spent searching for fewer criteria (default: 2)")
+    synthesize.add_argument("--indirect-selection", default=DEFAULT_INDIRECT_SELECTION,
+                            choices=INDIRECT_SELECTION_MODES)
+    synthesize.add_argument("--description", default="", help="Selector description")
+    synthesize.add_argument("--no-cache", action="store_true",
+                            help="Always rebuild the manifest indexes instead of using the on-disk cache")
+    synthesize.add_argument("--cache-dir", help="Index cache directory")
+    synthesize.add_argument("--output", "-o", help="Output file (default: stdout)")
+    synthesize.set_defaults(func=cmd_synthesize)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    from .exceptions import ManifestError, SelectorError
+    try:
+        return args.func(args)
+    except (SelectorError, ManifestError, OSError) as e:
+        print(f"dbt-selector: error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
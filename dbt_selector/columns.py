@@ -0,0 +1,133 @@
+"""Dictionary-encoded config columns for ``config.<key>:<value>`` selection
+
+Each queried config key is flattened once into a column: the distinct values
+of that key become a dictionary, and every node stores the integer code of its
+value (``MISSING`` when the key is absent). Criteria then compare codes instead
+of walking node config dicts. List values (``config.tags``) match any item; a
+node's first item goes in the main column and the rest in a side list of
+``(node, code)`` pairs.
+
+Columns are built on first use of a key, so memory grows with the keys queried,
+about 4 bytes per node each. NumPy, when installed, makes comparisons
+vectorized; without it the same code arrays are scanned in Python.
+"""
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from .globs import GlobSet, has_glob
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MISSING = -1
+
+
+def config_value_keys(value: Any) -> List[str]:
+    """String forms a config value can be selected by (lists match any item)"""
+    if isinstance(value, (list, tuple)):
+        return [k for item in value for k in config_value_keys(item)]
+    if isinstance(value, dict):
+        return []
+    if isinstance(value, bool):
+        return [str(value).lower()]
+    if value is None:
+        return ["none"]
+    return [str(value)]
+
+
+class ConfigColumn:
+    """Codes of one config key for every node, with the value dictionary"""
+
+    __slots__ = ("key", "values", "positions", "codes", "extra_ids", "extra_codes", "_counts")
+
+    def __init__(self, key: str, values: List[str], codes: Any, extra_ids: Any, extra_codes: Any):
+        self.key = key
+        self.values = values
+        self.positions = {value: code for code, value in enumerate(values)}
+        self.codes = codes
+        self.extra_ids = extra_ids
+        self.extra_codes = extra_codes
+        self._counts: Optional[List[int]] = None
+
+    def codes_for(self, value: str) -> List[int]:
+        """Dictionary codes matched by a value, which may be a glob"""
+        if has_glob(value):
+            keys = GlobSet([value]).match(self.values)[value]
+            return [self.positions[key] for key in keys]
+        code = self.positions.get(value)
+        return [] if code is None else [code]
+
+    def select(self, value: str) -> Set[int]:
+        wanted = self.codes_for(value)
+        if not wanted:
+            return set()
+        if np is not None:
+            mask = self.codes == wanted[0] if len(wanted) == 1 else np.isin(self.codes, wanted)
+            ids = set(np.flatnonzero(mask).tolist())
+            if len(self.extra_ids):
+                ids.update(self.extra_ids[np.isin(self.extra_codes, wanted)].tolist())
+            return ids
+        wanted_set = set(wanted)
+        ids = {i for i, code in enumerate(self.codes) if code in wanted_set}
+        ids.update(i for i, code in zip(self.extra_ids, self.extra_codes) if code in wanted_set)
+        return ids
+
+    def count(self, value: str) -> int:
+        """Nodes matching ``value``, from per-code counts; an estimate for list values"""
+        if self._counts is None:
+            if np is not None:
+                counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+                counts += np.bincount(self.extra_codes, minlength=len(self.values))
+                self._counts = counts.tolist()
+            else:
+                counts = [0] * len(self.values)
+                for code in self.codes:
+                    if code >= 0:
+                        counts[code] += 1
+                for code in self.extra_codes:
+                    counts[code] += 1
+                self._counts = counts
+        return sum(self._counts[code] for code in self.codes_for(value))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(memoryview(a).nbytes for a in (self.codes, self.extra_ids, self.extra_codes))
+
+
+def build_column(nodes: Sequence[Any], key: str) -> ConfigColumn:
+    """Flatten config ``key`` (dotted for nested keys, e.g. ``meta.owner``) into a column"""
+    path = key.split(".")
+    values: List[str] = []
+    positions: Dict[str, int] = {}
+    codes = array("i", [MISSING]) * len(nodes)
+    extra_ids, extra_codes = array("i"), array("i")
+    # Nodes loaded together share config dicts, so each distinct dict is encoded once
+    encoded: Dict[int, List[int]] = {}
+    for i, node in enumerate(nodes):
+        config = node.config
+        node_codes = encoded.get(id(config))
+        if node_codes is None:
+            node_codes = []
+            value = config
+            for part in path:
+                if not isinstance(value, dict) or part not in value:
+                    break
+                value = value[part]
+            else:
+                for k in dict.fromkeys(config_value_keys(value)):
+                    code = positions.get(k)
+                    if code is None:
+                        code = positions[k] = len(values)
+                        values.append(k)
+                    node_codes.append(code)
+            encoded[id(config)] = node_codes
+        if node_codes:
+            codes[i] = node_codes[0]
+            for code in node_codes[1:]:
+                extra_ids.append(i)
+                extra_codes.append(code)
+    if np is not None:
+        codes, extra_ids, extra_codes = (np.frombuffer(a, dtype=np.int32) for a in (codes, extra_ids, extra_codes))
+    return ConfigColumn(key, values, codes, extra_ids, extra_codes)
@@ -0,0 +1,311 @@
+"""Execution cost of a selection, and balanced sharding into parallel jobs
+
+Node costs are ``execution_time`` seconds from run_results.json (see
+``RunHistory.execution_times``). For a selection:
+
+* the total cost sums its nodes, about what a single-threaded run takes
+* the critical path is the costliest chain of dependencies inside the
+  selection, a floor on wall time however many threads a job has
+
+``shard_selection`` splits a selection into parts that can run as separate,
+concurrent jobs. Within a job, a part's nodes run in dependency order, so
+nodes linked by dependencies among the selected nodes (a connected group) must
+share a job. Groups are placed by list scheduling, costliest first, each on the
+shard with the least work so far (LPT).
+
+A selection is often one connected group, which no number of jobs can split.
+Such selections are cut into ordered stages by dependency level: each stage
+holds whole levels, so nothing in it depends on a later stage, and the groups
+of a stage, now smaller, are balanced across its jobs. Stages run one after
+another. The number of stages minimizing the summed duration of each stage's
+slowest job is kept, fewest stages on ties.
+"""
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .graph import CHILDREN, PARENTS
+from .indexes import NAMED_METHODS
+from .manifest import Manifest, Node
+from .selectors import make_selector
+
+# Stage counts tried when a selection does not split into enough groups
+MAX_STAGES = 4
+
+
+class SelectionCost:
+    """Total and critical-path cost of a set of nodes"""
+
+    __slots__ = ("nodes", "timed", "total", "critical_path", "path")
+
+    def __init__(self, nodes: int, timed: int, total: float, critical_path: float, path: List[int]):
+        self.nodes = nodes
+        # Nodes with a recorded execution_time
+        self.timed = timed
+        self.total = total
+        self.critical_path = critical_path
+        # Node IDs along the critical path, upstream first
+        self.path = path
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "timed": self.timed,
+            "total_s": round(self.total, 2),
+            "critical_path_s": round(self.critical_path, 2),
+        }
+
+
+def _cost(costs: Sequence[float], node_id: int, default: float) -> float:
+    # Nodes that never ran are stored as -1.0
+    seconds = costs[node_id]
+    return seconds if seconds >= 0 else default
+
+
+def selection_cost(manifest: Manifest, node_ids: Iterable[int], costs: Sequence[float],
+                   default: float = 0.0) -> SelectionCost:
+    """Total cost and the longest dependency chain among ``node_ids``
+
+    ``default`` stands in for nodes without a recorded execution time.
+    """
+    selected = set(node_ids)
+    parents = manifest.graph.adjacency[PARENTS]
+    children = manifest.graph.adjacency[CHILDREN]
+    # Kahn's algorithm over the induced subgraph, tracking each node's earliest finish
+    waiting = {i: sum(1 for p in parents[i] if p in selected) for i in selected}
+    ready = [i for i, count in waiting.items() if not count]
+    start: Dict[int, float] = {}
+    via: Dict[int, int] = {}
+    finish: Dict[int, float] = {}
+    total, timed = 0.0, 0
+    while ready:
+        i = ready.pop()
+        seconds = _cost(costs, i, default)
+        total += seconds
+        timed += costs[i] >= 0
+        finish[i] = start.get(i, 0.0) + seconds
+        for child in children[i]:
+            if child not in selected:
+                continue
+            if child not in via or finish[i] > start[child]:
+                start[child] = finish[i]
+                via[child] = i
+            waiting[child] -= 1
+            if not waiting[child]:
+                ready.append(child)
+    if not finish:
+        return SelectionCost(len(selected), 0, 0.0, 0.0, [])
+    end = max(finish, key=finish.__getitem__)
+    path = [end]
+    while path[-1] in via:
+        path.append(via[path[-1]])
+    path.reverse()
+    return SelectionCost(len(selected), timed, total, finish[end], path)
+
+
+def connected_groups(manifest: Manifest, node_ids: Iterable[int]) -> List[List[int]]:
+    """The selection split where no dependency among selected nodes crosses"""
+    selected = set(node_ids)
+    adjacency = manifest.graph.adjacency
+    parents, children = adjacency[PARENTS], adjacency[CHILDREN]
+    seen: Set[int] = set()
+    groups = []
+    for seed in sorted(selected):
+        if seed in seen:
+            continue
+        seen.add(seed)
+        group, stack = [], [seed]
+        while stack:
+            i = stack.pop()
+            group.append(i)
+            for neighbours in (parents[i], children[i]):
+                for j in neighbours:
+                    if j in selected and j not in seen:
+                        seen.add(j)
+                        stack.append(j)
+        groups.append(sorted(group))
+    return groups
+
+
+class Shard:
+    """Node IDs of one parallel job, the stage it runs in, and their cost"""
+
+    __slots__ = ("node_ids", "groups", "cost", "stage")
+
+    def __init__(self, node_ids: Set[int], groups: int, cost: SelectionCost, stage: int = 1):
+        self.node_ids = node_ids
+        self.groups = groups
+        self.cost = cost
+        # Jobs of stage n start once every job of stage n - 1 has finished
+        self.stage = stage
+
+    def as_row(self) -> Dict[str, Any]:
+        return {"stage": self.stage, "groups": self.groups, **self.cost.as_row()}
+
+
+def dependency_levels(manifest: Manifest, node_ids: Iterable[int]) -> Dict[int, int]:
+    """Length of the longest chain of selected ancestors above each selected node"""
+    selected = set(node_ids)
+    parents = manifest.graph.adjacency[PARENTS]
+    children = manifest.graph.adjacency[CHILDREN]
+    waiting = {i: sum(1 for p in parents[i] if p in selected) for i in selected}
+    ready = [i for i, count in waiting.items() if not count]
+    levels = dict.fromkeys(ready, 0)
+    while ready:
+        i = ready.pop()
+        for child in children[i]:
+            if child not in selected:
+                continue
+            levels[child] = max(levels.get(child, 0), levels[i] + 1)
+            waiting[child] -= 1
+            if not waiting[child]:
+                ready.append(child)
+    return levels
+
+
+def _stage_bounds(weights: Sequence[float], stages: int, nearest: bool) -> Tuple[int, ...]:
+    """First level of each stage after the first, cutting ``weights`` into near-equal runs
+
+    Each cut is the first level boundary reaching its share of the total or,
+    with ``nearest``, the boundary closest to it, which gives a heavy level a
+    stage of its own.
+    """
+    total = sum(weights)
+    prefix = [0.0]
+    for weight in weights:
+        prefix.append(prefix[-1] + weight)
+    bounds: List[int] = []
+    for k in range(1, stages):
+        levels = range(bounds[-1] + 1 if bounds else 1, len(weights))
+        if not levels:
+            break
+        target = total * k / stages
+        if nearest:
+            bounds.append(min(levels, key=lambda level: abs(prefix[level] - target)))
+        else:
+            bounds.append(next((level for level in levels if prefix[level] >= target), levels[-1]))
+    return tuple(bounds)
+
+
+def _balance(manifest: Manifest, node_ids: Iterable[int], costs: Sequence[float],
+             shards: int, default: float) -> List[Tuple[float, int, List[List[int]]]]:
+    """LPT placement of the connected groups of ``node_ids``: (seconds, nodes, groups) per shard"""
+    weighted = [(sum(_cost(costs, i, default) for i in group), len(group), group)
+                for group in connected_groups(manifest, node_ids)]
+    weighted.sort(key=lambda entry: (-entry[0], -entry[1], entry[2][0]))
+    # Least loaded shard first; node counts break ties between untimed groups
+    heap = [(0.0, 0, k) for k in range(min(shards, len(weighted)))]
+    members: List[List[List[int]]] = [[] for _ in heap]
+    for seconds, size, group in weighted:
+        load, count, k = heapq.heappop(heap)
+        members[k].append(group)
+        heapq.heappush(heap, (load + seconds, count + size, k))
+    loads = {k: (load, count) for load, count, k in heap}
+    return [(*loads[k], groups) for k, groups in enumerate(members)]
+
+
+def shard_selection(manifest: Manifest, node_ids: Iterable[int], costs: Sequence[float],
+                    shards: int, default: float = 0.0) -> List[Shard]:
+    """Split a selection into stages of at most ``shards`` independent, balanced parts
+
+    One stage comes back when the connected groups of the selection balance on
+    their own. Stages may still have fewer shards than asked for, when even
+    their groups are too few.
+    """
+    if shards < 1:
+        raise ValueError("shards must be at least 1")
+    selected = set(node_ids)
+    if not selected:
+        return []
+    levels = dependency_levels(manifest, selected)
+    by_level: List[List[int]] = [[] for _ in range(max(levels.values()) + 1)]
+    for i, level in levels.items():
+        by_level[level].append(i)
+    seconds = [sum(_cost(costs, i, default) for i in level) for level in by_level]
+    # Untimed selections are cut by node count
+    weights = seconds if sum(seconds) else [float(len(level)) for level in by_level]
+    best_span: Optional[Tuple[float, int]] = None
+    best: List[List[Tuple[float, int, List[List[int]]]]] = []
+    candidates = {_stage_bounds(weights, stages, nearest)
+                  for stages in range(1, min(len(by_level), MAX_STAGES) + 1) for nearest in (False, True)}
+    # Fewest stages first, so ties keep the simpler plan
+    for bounds in sorted(candidates, key=lambda bounds: (len(bounds), bounds)):
+        edges = (0, *bounds, len(by_level))
+        plan = [_balance(manifest, [i for level in by_level[lo:hi] for i in level], costs, shards, default)
+                for lo, hi in zip(edges, edges[1:])]
+        # Summed over stages: the slowest job's seconds, then its node count
+        span = (sum(max(load for load, _, _ in stage) for stage in plan),
+                sum(max(count for _, count, _ in stage) for stage in plan))
+        if best_span is None or span < best_span:
+            best_span, best = span, plan
+        # Within LPT's 4/3 bound of an even split, staging cannot do much better
+        slowest = span[0] if weights is seconds else span[1]
+        if not bounds and slowest <= sum(weights) / shards * 4 / 3:
+            break
+    result = []
+    for number, stage in enumerate(best, start=1):
+        placed = []
+        for _, _, groups in stage:
+            ids = {i for group in groups for i in group}
+            placed.append(Shard(ids, len(groups), selection_cost(manifest, ids, costs, default), number))
+        placed.sort(key=lambda shard: -shard.cost.total)
+        result.extend(placed)
+    return result
+
+
+def node_criterion(node: Node) -> Dict[str, Any]:
+    """A method criterion selecting ``node`` by name, without the tests attached to it"""
+    if node.resource_type == "source":
+        criterion = {"method": "source", "value": f"{node.source_name}.{node.name}"}
+    elif node.resource_type in NAMED_METHODS:
+        criterion = {"method": node.resource_type, "value": f"{node.package_name}.{node.name}"}
+    else:
+        criterion = {"method": "fqn", "value": ".".join(node.fqn) if node.fqn else node.name}
+    criterion["indirect_selection"] = "empty"
+    return criterion
+
+
+def _stage_positions(shards: List[Shard]) -> List[int]:
+    """Each shard's 1-based position among the shards of its stage"""
+    counts: Dict[int, int] = {}
+    positions = []
+    for shard in shards:
+        counts[shard.stage] = counts.get(shard.stage, 0) + 1
+        positions.append(counts[shard.stage])
+    return positions
+
+
+def shard_names(name: str, shards: List[Shard]) -> List[str]:
+    """Selector names of ``shards``: ``<name>_shard_<k>``, or ``<name>_stage_<n>_shard_<k>`` once staged"""
+    staged = any(shard.stage > 1 for shard in shards)
+    return [f"{name}_stage_{shard.stage}_shard_{k}" if staged else f"{name}_shard_{k}"
+            for shard, k in zip(shards, _stage_positions(shards))]
+
+
+def shard_selectors(manifest: Manifest, name: str, shards: List[Shard],
+                    description: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One selector per shard, each the nodes of the shard within selector ``name``
+
+    The intersection with ``selector:<name>`` keeps fqn prefixes from reaching
+    nodes outside the original selection. No criterion selects tests
+    indirectly: the selection's tests are listed in the shard that runs them,
+    so a test never runs in two shards or before the stage building its parents.
+    """
+    stages = max((shard.stage for shard in shards), default=1)
+    jobs: Dict[int, int] = {}
+    for shard in shards:
+        jobs[shard.stage] = jobs.get(shard.stage, 0) + 1
+    selectors = []
+    for shard_name, shard, k in zip(shard_names(name, shards), shards, _stage_positions(shards)):
+        criteria = [node_criterion(manifest.nodes[i]) for i in sorted(shard.node_ids)]
+        summary = f"Shard {k} of {jobs[shard.stage]} of {name}, about {shard.cost.total:.0f}s of execution"
+        if stages > 1:
+            summary = f"Stage {shard.stage} of {stages}: {summary}"
+            if shard.stage > 1:
+                summary += f"; run after stage {shard.stage - 1}"
+        selectors.append(make_selector(
+            shard_name,
+            {"intersection": [{"method": "selector", "value": name, "indirect_selection": "empty"},
+                              {"union": criteria}]},
+            description or summary,
+        ))
+    return selectors
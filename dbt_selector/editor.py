@@ -0,0 +1,104 @@
+"""Editable criterion tree behind the app's Full YAML editor
+
+The tree is stored flat, one dict per element keyed by a stable node ID, so
+the UI can render and update each subtree independently. ``to_criterion()``
+builds the same dicts the selectors.yml model expects.
+"""
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .exceptions import SelectorError
+from .parser import DEFAULT_INDIRECT_SELECTION
+from .selectors import method_criterion
+
+METHOD = "method"
+UNION = "union"
+INTERSECTION = "intersection"
+KINDS = (METHOD, UNION, INTERSECTION)
+# Element limits offered by the editor
+MIN_ITEMS, MAX_ITEMS = 2, 10
+MIN_EXCLUSIONS, MAX_EXCLUSIONS = 1, 5
+
+
+def _new_node(kind: str = METHOD) -> Dict[str, Any]:
+    return {
+        "kind": kind,
+        "method": "tag",
+        "value": "",
+        "children": False,
+        "children_depth": 1,
+        "parents": False,
+        "parents_depth": 1,
+        "childrens_parents": False,
+        "indirect_selection": DEFAULT_INDIRECT_SELECTION,
+        "items": [],
+        "has_exclusions": False,
+        "exclude": [],
+    }
+
+
+class CriterionTree:
+    """A criterion being edited, as nodes keyed by ID with child ID lists"""
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.root = self.add_node()
+
+    def add_node(self, kind: str = METHOD) -> str:
+        # IDs are unique across trees, so widget state keyed by them never leaks into a new tree
+        node_id = uuid.uuid4().hex[:12]
+        self.nodes[node_id] = _new_node(kind)
+        return node_id
+
+    def __getitem__(self, node_id: str) -> Dict[str, Any]:
+        return self.nodes[node_id]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def set_kind(self, node_id: str, kind: str):
+        if kind not in KINDS:
+            raise SelectorError(f"Unknown criterion kind '{kind}'")
+        node = self.nodes[node_id]
+        node["kind"] = kind
+        if kind != METHOD and len(node["items"]) < MIN_ITEMS:
+            self.resize(node_id, "items", MIN_ITEMS)
+
+    def resize(self, node_id: str, field: str, count: int):
+        """Grow or shrink a node's ``items`` or ``exclude`` list, dropping removed subtrees"""
+        children: List[str] = self.nodes[node_id][field]
+        while len(children) < count:
+            children.append(self.add_node())
+        while len(children) > count:
+            self.remove_subtree(children.pop())
+
+    def set_exclusions(self, node_id: str, enabled: bool):
+        node = self.nodes[node_id]
+        node["has_exclusions"] = enabled
+        if enabled and not node["exclude"]:
+            self.resize(node_id, "exclude", MIN_EXCLUSIONS)
+
+    def remove_subtree(self, node_id: str):
+        node = self.nodes.pop(node_id)
+        for child in node["items"] + node["exclude"]:
+            self.remove_subtree(child)
+
+    def to_criterion(self, node_id: Optional[str] = None, is_exclude: bool = False) -> Dict[str, Any]:
+        """The criterion dict for a subtree, the whole tree by default"""
+        node = self.nodes[node_id or self.root]
+        if node["kind"] == METHOD:
+            criterion = method_criterion(
+                node["method"], node["value"],
+                children=node["children"],
+                children_depth=node["children_depth"] if node["children"] else None,
+                parents=node["parents"],
+                parents_depth=node["parents_depth"] if node["parents"] else None,
+                childrens_parents=node["childrens_parents"],
+                indirect_selection=node["indirect_selection"],
+            )
+        else:
+            criterion = {node["kind"]: [self.to_criterion(child) for child in node["items"]]}
+        # Exclusions cannot nest inside exclusions
+        if not is_exclude and node["has_exclusions"] and node["exclude"]:
+            criterion["exclude"] = [self.to_criterion(child, is_exclude=True) for child in node["exclude"]]
+        return criterion
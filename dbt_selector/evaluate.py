@@ -0,0 +1,139 @@
+"""Evaluate selector definitions as set operations over integer node IDs"""
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .exceptions import SelectorError
+from .graph import CHILDREN, PARENTS
+from .manifest import Manifest
+from .parser import INDIRECT_SELECTION_MODES, parse_cli
+
+TEST_RESOURCE_TYPES = ("test", "unit_test")
+
+# Extra method handlers: (value, method arguments) -> node IDs
+MethodHandler = Callable[[str, List[str]], Set[int]]
+
+
+class Evaluator:
+    """Evaluates the criterion dicts built by the app against a manifest"""
+
+    def __init__(self, manifest: Manifest, methods: Optional[Dict[str, MethodHandler]] = None):
+        self.manifest = manifest
+        self.methods: Dict[str, MethodHandler] = dict(methods or {})
+
+    def evaluate(self, definition: Any) -> Set[int]:
+        """Node IDs selected by a selector definition"""
+        if isinstance(definition, str):
+            definition = parse_cli(definition)
+        if not isinstance(definition, dict) or not definition:
+            raise SelectorError(f"Invalid selector definition: {definition!r}")
+
+        if "union" in definition:
+            ids = self._union(definition["union"])
+        elif "intersection" in definition:
+            ids = self._intersection(definition["intersection"])
+        elif "method" in definition:
+            ids = self.select_method(definition["method"], definition.get("value", ""))
+            ids = self.expand_graph(ids, definition)
+        elif len(definition) == 1 and "exclude" not in definition:
+            # Key-value form, e.g. {"tag": "nightly"}
+            method, value = next(iter(definition.items()))
+            ids = self.expand_graph(self.select_method(method, value), {})
+        else:
+            raise SelectorError(f"Invalid selector definition: {definition!r}")
+
+        if definition.get("exclude"):
+            ids -= self._union(definition["exclude"])
+        return ids
+
+    def select_method(self, method: str, value: Any) -> Set[int]:
+        method, *args = str(method).split(".")
+        handler = self.methods.get(method)
+        if handler is not None:
+            return handler(str(value), args)
+        return self.manifest.indexes.select(method, value, args)
+
+    def expand_graph(self, ids: Set[int], criterion: Dict[str, Any]) -> Set[int]:
+        """Apply a criterion's graph operators, then indirect test selection"""
+        graph = self.manifest.graph
+        if criterion.get("childrens_parents"):
+            ids = graph.childrens_parents(ids)
+        else:
+            selected = set(ids)
+            if criterion.get("parents"):
+                selected |= graph.expand(ids, PARENTS, _depth(criterion, "parents_depth"))
+            if criterion.get("children"):
+                selected |= graph.expand(ids, CHILDREN, _depth(criterion, "children_depth"))
+            ids = selected
+        mode = criterion.get("indirect_selection") or "eager"
+        if mode not in INDIRECT_SELECTION_MODES:
+            raise SelectorError(f"Invalid indirect_selection '{mode}'")
+        return ids | self._indirect_tests(ids, mode)
+
+    def _indirect_tests(self, ids: Set[int], mode: str) -> Set[int]:
+        """Tests attached to the selection, following dbt's indirect_selection modes"""
+        if mode == "empty" or not ids:
+            return set()
+        graph, index = self.manifest.graph, self.manifest.indexes.resource_type
+        children, parents = graph.adjacency[CHILDREN], graph.adjacency[PARENTS]
+        tests = set()
+        for resource_type in TEST_RESOURCE_TYPES:
+            tests.update(index.get(resource_type, ()))
+        # Walk whichever side is smaller: the selection's children or all tests
+        if len(tests) < len(ids):
+            candidates = {t for t in tests - ids if any(p in ids for p in parents[t])}
+        else:
+            candidates = {c for i in ids for c in children[i] if c in tests} - ids
+        if mode == "eager" or not candidates:
+            return candidates
+        allowed = ids
+        if mode == "buildable":
+            allowed = graph.expand(ids, PARENTS)
+        return {t for t in candidates if all(p in allowed for p in parents[t])}
+
+    def _split_excludes(self, items: List[Any]):
+        # Items of the form {"exclude": [...]} subtract from the whole list
+        include, exclude = [], []
+        if not isinstance(items, list):
+            raise SelectorError(f"Expected a list of criteria, got {items!r}")
+        for item in items:
+            if isinstance(item, dict) and list(item) == ["exclude"]:
+                exclude.extend(item["exclude"])
+            else:
+                include.append(item)
+        return include, exclude
+
+    def _union(self, items: List[Any]) -> Set[int]:
+        include, exclude = self._split_excludes(items)
+        ids: Set[int] = set()
+        for item in include:
+            ids |= self.evaluate(item)
+        if exclude:
+            ids -= self._union(exclude)
+        return ids
+
+    def _intersection(self, items: List[Any]) -> Set[int]:
+        include, exclude = self._split_excludes(items)
+        ids: Optional[Set[int]] = None
+        for item in include:
+            selected = self.evaluate(item)
+            ids = selected if ids is None else ids & selected
+            if not ids:
+                break
+        ids = ids or set()
+        if exclude and ids:
+            ids -= self._union(exclude)
+        return ids
+
+
+def _depth(criterion: Dict[str, Any], key: str) -> Optional[int]:
+    depth = criterion.get(key)
+    if depth is None:
+        return None
+    try:
+        return int(depth)
+    except (TypeError, ValueError):
+        raise SelectorError(f"Invalid {key} {depth!r}") from None
+
+
+def evaluate(manifest: Manifest, definition: Any) -> List[str]:
+    """Sorted unique_ids selected by a definition"""
+    return manifest.unique_ids(Evaluator(manifest).evaluate(definition))
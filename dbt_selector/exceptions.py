@@ -0,0 +1,9 @@
+"""Errors raised by the selector engine"""
+
+
+class SelectorError(ValueError):
+    """Raised when a selector definition cannot be evaluated"""
+
+
+class ManifestError(ValueError):
+    """Raised when a manifest.json cannot be read"""
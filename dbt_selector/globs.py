@@ -0,0 +1,113 @@
+"""Many glob patterns matched together: over index keys, or down a segment trie
+
+Selector values such as ``tag:nightly_*``, ``fqn:marts.finance.*`` or
+``path:models/staging/*`` are globs. Matching each one separately costs a scan
+of every index key (or trie branch) per pattern. Here all patterns for one
+index are compiled together and the keys, or the trie, are walked once.
+"""
+import re
+from collections import defaultdict
+from fnmatch import translate
+from typing import Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+GLOB_CHARS = "*?["
+# Marks the patterns whose literal prefix ends at a prefix-trie node
+_END = ""
+
+Matcher = Callable[[str], object]
+
+
+def has_glob(value: str) -> bool:
+    return any(c in value for c in GLOB_CHARS)
+
+
+def compile_glob(pattern: str) -> Matcher:
+    """A case-sensitive fnmatch test for ``pattern``"""
+    return re.compile(translate(pattern)).match
+
+
+def literal_prefix(pattern: str) -> str:
+    """The part of a pattern before its first wildcard"""
+    end = min((i for i in (pattern.find(c) for c in GLOB_CHARS) if i >= 0), default=len(pattern))
+    return pattern[:end]
+
+
+class GlobSet:
+    """Patterns compiled into a trie of their literal prefixes
+
+    A key is walked down the trie character by character; only patterns whose
+    literal prefix the key starts with run their regex. ``tag_*`` and
+    ``tag_daily_?`` are never tried against ``finance``.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(dict.fromkeys(patterns))
+        self._root: Dict[str, dict] = {}
+        for pattern in self.patterns:
+            node = self._root
+            for c in literal_prefix(pattern):
+                node = node.setdefault(c, {})
+            node.setdefault(_END, []).append((pattern, compile_glob(pattern)))
+
+    def candidates(self, key: str) -> List[Tuple[str, Matcher]]:
+        node = self._root
+        found = list(node.get(_END, ()))
+        for c in key:
+            node = node.get(c)
+            if node is None:
+                break
+            found.extend(node.get(_END, ()))
+        return found
+
+    def match(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Keys matched by each pattern, in one pass over ``keys``"""
+        matched: Dict[str, List[str]] = {pattern: [] for pattern in self.patterns}
+        if not self.patterns:
+            return matched
+        for key in keys:
+            for pattern, match in self.candidates(key):
+                if match(key):
+                    matched[pattern].append(key)
+        return matched
+
+
+def match_trie(trie, patterns: Sequence[Sequence[str]], star_selects_rest: bool = True) -> List[Set[int]]:
+    """Node IDs under ``trie`` (a ``SegmentTrie``) matched by each segment pattern
+
+    Same semantics as ``SegmentTrie.match``: a pattern matches every node at
+    or below the trie nodes it reaches, and a ``*`` segment matches everything
+    beneath, as dbt's fqn method does. With ``star_selects_rest`` off, only a
+    final ``*`` does; an inner one matches a single component, as in a path
+    glob. Each trie node is visited once with all patterns still alive at it.
+    """
+    results: List[Set[int]] = [set() for _ in patterns]
+    segments = [[(part, compile_glob(part) if has_glob(part) else None) for part in parts]
+                for parts in patterns]
+    stack = [(trie, [(i, 0) for i in range(len(patterns))])]
+    while stack:
+        node, states = stack.pop()
+        literal: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        wildcard: List[Tuple[int, int, Matcher]] = []
+        for i, pos in states:
+            if pos == len(segments[i]):
+                results[i].update(node.subtree())
+                continue
+            part, match = segments[i][pos]
+            if part == "*" and (star_selects_rest or pos == len(segments[i]) - 1):
+                for child in node.children.values():
+                    results[i].update(child.subtree())
+            elif match is None:
+                literal[part].append((i, pos + 1))
+            else:
+                wildcard.append((i, pos + 1, match))
+        if wildcard:
+            for key, child in node.children.items():
+                alive = literal.get(key, []) + [(i, pos) for i, pos, match in wildcard if match(key)]
+                if alive:
+                    stack.append((child, alive))
+        else:
+            for key, alive in literal.items():
+                child = node.children.get(key)
+                if child is not None:
+                    stack.append((child, alive))
+    return results
@@ -0,0 +1,136 @@
+"""Compact CSR adjacency for parent/child graph expansion"""
+from array import array
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+PARENTS = "parents"
+CHILDREN = "children"
+
+# Above this many seeds one multi-source BFS beats unioning per-node closures
+CLOSURE_SEED_LIMIT = 64
+CLOSURE_CACHE_SIZE = 4096
+
+
+class Adjacency:
+    """One direction of the DAG: ``targets[offsets[i]:offsets[i + 1]]`` are i's neighbours"""
+
+    __slots__ = ("offsets", "targets")
+
+    def __init__(self, offsets: array, targets: array):
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_lists(cls, neighbours: List[List[int]]) -> "Adjacency":
+        offsets = array("q", [0])
+        targets = array("i")
+        for ids in neighbours:
+            targets.extend(ids)
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    @classmethod
+    def from_edges(cls, num_nodes: int, sources: array, targets: array) -> "Adjacency":
+        """Counting-sort (source, target) int pairs into CSR without per-node lists"""
+        offsets = array("q", [0]) * (num_nodes + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(num_nodes):
+            offsets[i + 1] += offsets[i]
+        cursor = offsets[:-1]
+        ordered = array("i", [0]) * len(targets)
+        for source, target in zip(sources, targets):
+            ordered[cursor[source]] = target
+            cursor[source] += 1
+        return cls(offsets, ordered)
+
+    def __getitem__(self, node_id: int) -> array:
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def degree(self, node_id: int) -> int:
+        return self.offsets[node_id + 1] - self.offsets[node_id]
+
+    @property
+    def nbytes(self) -> int:
+        return (len(self.offsets) * self.offsets.itemsize
+                + len(self.targets) * self.targets.itemsize)
+
+
+class Graph:
+    """Parent and child adjacency over integer node IDs with bounded BFS"""
+
+    def __init__(self, parents: Adjacency, children: Adjacency):
+        self.adjacency = {PARENTS: parents, CHILDREN: children}
+        self.closure = lru_cache(maxsize=CLOSURE_CACHE_SIZE)(self._closure)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.adjacency[PARENTS].offsets) - 1
+
+    @classmethod
+    def from_maps(cls, ids: Dict[str, int], parent_map: Dict[str, List[str]],
+                  child_map: Optional[Dict[str, List[str]]] = None) -> "Graph":
+        """Build from manifest parent_map/child_map, dropping unknown unique_ids"""
+        parents: List[List[int]] = [[] for _ in range(len(ids))]
+        for unique_id, parent_ids in (parent_map or {}).items():
+            node_id = ids.get(unique_id)
+            if node_id is not None:
+                parents[node_id] = [ids[p] for p in parent_ids if p in ids]
+        if child_map:
+            children: List[List[int]] = [[] for _ in range(len(ids))]
+            for unique_id, child_ids in child_map.items():
+                node_id = ids.get(unique_id)
+                if node_id is not None:
+                    children[node_id] = [ids[c] for c in child_ids if c in ids]
+        else:
+            children = [[] for _ in range(len(ids))]
+            for node_id, parent_ids in enumerate(parents):
+                for parent_id in parent_ids:
+                    children[parent_id].append(node_id)
+        return cls(Adjacency.from_lists(parents), Adjacency.from_lists(children))
+
+    def _closure(self, node_id: int, direction: str, depth: Optional[int]) -> FrozenSet[int]:
+        # Memoized per (node, direction, depth) through self.closure
+        return frozenset(self._bfs((node_id,), direction, depth))
+
+    def _bfs(self, seeds: Iterable[int], direction: str, depth: Optional[int]) -> Set[int]:
+        """Nodes reachable from seeds within ``depth`` edges, excluding the seeds"""
+        adjacency = self.adjacency[direction]
+        offsets, targets = adjacency.offsets, adjacency.targets
+        seen = bytearray(self.num_nodes)
+        frontier = list(seeds)
+        for node_id in frontier:
+            seen[node_id] = 1
+        reached: Set[int] = set()
+        level = 0
+        while frontier and (depth is None or level < depth):
+            next_frontier = []
+            for node_id in frontier:
+                for neighbour in targets[offsets[node_id]:offsets[node_id + 1]]:
+                    if not seen[neighbour]:
+                        seen[neighbour] = 1
+                        next_frontier.append(neighbour)
+            reached.update(next_frontier)
+            frontier = next_frontier
+            level += 1
+        return reached
+
+    def expand(self, seeds: Iterable[int], direction: str, depth: Optional[int] = None) -> Set[int]:
+        """Seeds plus their ancestors or descendants, ``n+`` / ``+n`` style"""
+        seeds = set(seeds)
+        if len(seeds) <= CLOSURE_SEED_LIMIT:
+            reached = set()
+            for node_id in seeds:
+                reached |= self.closure(node_id, direction, depth)
+        else:
+            reached = self._bfs(seeds, direction, depth)
+        return seeds | reached
+
+    def childrens_parents(self, seeds: Iterable[int]) -> Set[int]:
+        """The ``@`` operator: seeds, their descendants and all of those nodes' ancestors"""
+        descendants = self.expand(seeds, CHILDREN)
+        return self.expand(descendants, PARENTS)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.adjacency.values())
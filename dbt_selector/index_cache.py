@@ -0,0 +1,318 @@
+"""Persistent on-disk cache of built manifest indexes
+
+Each entry is one versioned binary file named after the manifest's content
+hash and ``metadata.dbt_version``::
+
+    MAGIC | header length (u64) | header (JSON) | 8-byte aligned blocks
+
+The header lists every block as ``[offset, length, typecode]``. Integer blocks
+(graph CSR arrays and index postings) are memory-mapped and used in place
+without copying. The node table and index keys are marshal-encoded, so an
+entry is only valid for the Python version and byte order that wrote it;
+anything else is treated as a miss and rebuilt.
+"""
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .exceptions import ManifestError
+from .graph import CHILDREN, PARENTS, Adjacency, Graph
+from .indexes import KEYED_INDEXES, MethodIndexes
+from .ingest import JSONStream, Progress, load_manifest
+from .manifest import Manifest, Node
+
+FORMAT_VERSION = 2
+MAGIC = b"DBTSELIX"
+DEFAULT_MAX_ENTRIES = 8
+HASH_CHUNK_SIZE = 1 << 22
+# Content hashes remembered per (path, size, mtime) so warm starts skip rehashing
+HASH_MEMO_FILE = "hashes.json"
+HASH_MEMO_SIZE = 64
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("DBT_SELECTOR_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "dbt-selector")
+
+
+def hash_file(path: str) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_metadata(path: str) -> Dict[str, Any]:
+    """The manifest's ``metadata`` block, normally its first key, without reading the rest"""
+    with open(path, encoding="utf-8") as f:
+        stream = JSONStream(f, chunk_size=1 << 16)
+        for key in stream.items():
+            if key == "metadata":
+                return stream.value()
+            stream.skip()
+    return {}
+
+
+def _runtime_tag() -> str:
+    # marshal output and native int arrays depend on both of these
+    return f"{sys.implementation.cache_tag}-{sys.byteorder}"
+
+
+def _node_table(manifest: Manifest) -> bytes:
+    configs: List[dict] = []
+    config_ids: Dict[int, int] = {}
+    rows = []
+    for node in manifest.nodes:
+        config_id = config_ids.get(id(node.config))
+        if config_id is None:
+            config_id = config_ids[id(node.config)] = len(configs)
+            configs.append(node.config)
+        rows.append(tuple(config_id if field == "config" else getattr(node, field)
+                          for field in Node.__slots__))
+    return marshal.dumps((rows, configs))
+
+
+def _nodes_from_table(data: Any) -> List[Node]:
+    rows, configs = marshal.loads(data)
+    nodes = [Node(*row) for row in rows]
+    # Rows carry an index into the shared config list in place of the dict
+    for node in nodes:
+        node.config = configs[node.config]
+    return nodes
+
+
+class MappedPostings(Mapping):
+    """Read-only keyed index whose postings are sliced from a mapped block on access"""
+
+    def __init__(self, keys: List[str], offsets: memoryview, ids: memoryview):
+        self.positions = dict(zip(keys, range(len(keys))))
+        self.offsets = offsets
+        self.ids = ids
+
+    def __getitem__(self, key: str) -> memoryview:
+        j = self.positions[key]
+        return self.ids[self.offsets[j]:self.offsets[j + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.positions
+
+
+def entry_chunks(manifest: Manifest) -> List[Any]:
+    """A built manifest as the byte chunks of a cache entry, in order"""
+    blocks: List[Tuple[str, Any, str]] = [("nodes", _node_table(manifest), "B")]
+    for direction in (PARENTS, CHILDREN):
+        adjacency = manifest.graph.adjacency[direction]
+        blocks.append((f"{direction}.offsets", adjacency.offsets, "q"))
+        blocks.append((f"{direction}.targets", adjacency.targets, "i"))
+    for name in KEYED_INDEXES:
+        index = manifest.indexes.tables[name]
+        offsets, ids = array("q", [0]), array("i")
+        for postings in index.values():
+            ids.extend(postings)
+            offsets.append(len(ids))
+        blocks.append((f"index.{name}.keys", marshal.dumps(list(index)), "B"))
+        blocks.append((f"index.{name}.offsets", offsets, "q"))
+        blocks.append((f"index.{name}.ids", ids, "i"))
+    blocks.append(("external_edges", marshal.dumps(manifest.external_edges), "B"))
+
+    layout, offset = {}, 0
+    for name, data, typecode in blocks:
+        size = memoryview(data).nbytes
+        layout[name] = [offset, size, typecode]
+        offset += size + (-size % 8)
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "runtime": _runtime_tag(),
+        "metadata": manifest.metadata,
+        "blocks": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    chunks: List[Any] = [MAGIC, struct.pack("<Q", len(header)), header]
+    for _, data, _ in blocks:
+        size = memoryview(data).nbytes
+        chunks.append(data)
+        chunks.append(b"\0" * (-size % 8))
+    return chunks
+
+
+def replace_file(path: str, write: Callable[[IO[bytes]], None]):
+    """Write ``path`` atomically through a temporary file of its own
+
+    Each writer gets a uniquely named temporary file, so threads and processes
+    writing the same path never move each other's half-written files.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                    prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_entry(path: str, manifest: Manifest):
+    """Serialize a built manifest to ``path`` atomically"""
+    def write(f: IO[bytes]):
+        for chunk in entry_chunks(manifest):
+            f.write(chunk)
+    replace_file(path, write)
+
+
+def entry_from_buffer(view: memoryview) -> Optional[Manifest]:
+    """A Manifest over an entry held in memory, or None if another format wrote it
+
+    Integer blocks stay views into ``view``; nothing is copied.
+    """
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        return None
+    (header_size,) = struct.unpack_from("<Q", view, len(MAGIC))
+    base = len(MAGIC) + 8
+    header = json.loads(bytes(view[base:base + header_size]))
+    if header.get("format_version") != FORMAT_VERSION or header.get("runtime") != _runtime_tag():
+        return None
+    base += header_size
+
+    def block(name: str):
+        offset, size, typecode = header["blocks"][name]
+        data = view[base + offset:base + offset + size]
+        return data if typecode == "B" else data.cast(typecode)
+
+    nodes = _nodes_from_table(block("nodes"))
+    graph = Graph(*(Adjacency(block(f"{direction}.offsets"), block(f"{direction}.targets"))
+                    for direction in (PARENTS, CHILDREN)))
+    tables = {}
+    for name in KEYED_INDEXES:
+        tables[name] = MappedPostings(marshal.loads(block(f"index.{name}.keys")),
+                                      block(f"index.{name}.offsets"), block(f"index.{name}.ids"))
+    return Manifest(nodes, header["metadata"], graph, MethodIndexes(nodes, tables),
+                    external_edges=marshal.loads(block("external_edges")))
+
+
+def read_entry(path: str) -> Optional[Manifest]:
+    """Map a cache entry back into a Manifest, or None if it was written by another format"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return entry_from_buffer(memoryview(mapped))
+
+
+class IndexCache:
+    """Directory of cache entries keyed by manifest content hash, evicted LRU"""
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory or default_cache_dir()
+        self.max_entries = max_entries
+        # Serializes read-modify-write of the hash memo between threads of one process
+        self._memo_lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.idx")
+
+    def manifest_key(self, path: str) -> str:
+        """``<content hash>-<dbt_version>`` for a manifest.json on disk"""
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        abs_path = os.path.abspath(path)
+        memo_path = os.path.join(self.directory, HASH_MEMO_FILE)
+        with self._memo_lock:
+            entry = self._read_memo(memo_path).get(abs_path)
+        if entry and entry["stamp"] == stamp:
+            return entry["key"]
+
+        dbt_version = str(read_metadata(path).get("dbt_version", "unknown"))
+        safe_version = "".join(c if c.isalnum() or c in ".-_" else "_" for c in dbt_version)
+        key = f"{hash_file(path)}-{safe_version}"
+        with self._memo_lock:
+            # Re-read, so entries memoized by other threads meanwhile are kept
+            memo = self._read_memo(memo_path)
+            memo.pop(abs_path, None)
+            memo[abs_path] = {"stamp": stamp, "key": key}
+            memo = dict(list(memo.items())[-HASH_MEMO_SIZE:])
+            try:
+                replace_file(memo_path, lambda f: f.write(json.dumps(memo).encode("utf-8")))
+            except OSError:
+                # Only a lost memo: the next start hashes the manifest again
+                pass
+        return key
+
+    @staticmethod
+    def _read_memo(memo_path: str) -> Dict[str, Any]:
+        try:
+            with open(memo_path, encoding="utf-8") as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return memo if isinstance(memo, dict) else {}
+
+    def get(self, key: str) -> Optional[Manifest]:
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            manifest = read_entry(path)
+        except (OSError, ValueError, EOFError, KeyError, TypeError, struct.error):
+            manifest = None
+        if manifest is None:
+            # Corrupt or written by another format: drop it so it is rebuilt
+            os.remove(path)
+            return None
+        os.utime(path)
+        return manifest
+
+    def put(self, key: str, manifest: Manifest):
+        write_entry(self.entry_path(key), manifest)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries beyond ``max_entries``"""
+        entries = [os.path.join(self.directory, name)
+                   for name in os.listdir(self.directory) if name.endswith(".idx")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load_manifest(self, path: str, progress: Optional[Progress] = None) -> Manifest:
+        """Load a manifest from the cache, building and storing it on a miss"""
+        if progress:
+            progress(0.0, "Checking index cache")
+        try:
+            key = self.manifest_key(path)
+        except (OSError, ValueError) as e:
+            raise ManifestError(f"Could not read manifest {path}: {e}") from e
+        manifest = self.get(key)
+        if manifest is None:
+            manifest = load_manifest(path, progress=progress)
+            if progress:
+                progress(1.0, "Writing index cache")
+            try:
+                self.put(key, manifest)
+            except OSError:
+                # The manifest is built; it is only missing from the cache next time
+                pass
+        return manifest
@@ -0,0 +1,335 @@
+"""Inverted indexes answering each dbt selector method without scanning nodes"""
+from array import array
+from collections import defaultdict
+from fnmatch import fnmatchcase
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .columns import ConfigColumn, build_column
+from .exceptions import SelectorError
+from .globs import GlobSet, has_glob, match_trie
+
+# Postings are sorted int32 arrays: 4 bytes per entry instead of a set slot
+Postings = array
+EMPTY = array("i")
+
+# Resource types selected by name through their own method
+NAMED_METHODS = {
+    "exposure": "exposure",
+    "metric": "metric",
+    "semantic_model": "semantic_model",
+    "saved_query": "saved_query",
+}
+
+
+class SegmentTrie:
+    """Prefix trie over path components or fqn segments"""
+
+    __slots__ = ("children", "ids", "_subtree")
+
+    def __init__(self):
+        self.children: Dict[str, "SegmentTrie"] = {}
+        self.ids = array("i")
+        self._subtree = None
+
+    def insert(self, parts: Sequence[str], node_id: int):
+        node = self
+        for part in parts:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = SegmentTrie()
+            node = child
+        node.ids.append(node_id)
+
+    def subtree(self) -> FrozenSet[int]:
+        """All node IDs at or below this trie node (memoized)"""
+        if self._subtree is None:
+            ids = set(self.ids)
+            for child in self.children.values():
+                ids.update(child.subtree())
+            self._subtree = frozenset(ids)
+        return self._subtree
+
+    def match(self, parts: Sequence[str], star_selects_rest: bool = True) -> Set[int]:
+        """Node IDs whose segments start with ``parts``
+
+        A ``*`` segment selects everything beneath the current prefix, other
+        segments may use fnmatch wildcards against a single component. With
+        ``star_selects_rest`` off, only a final ``*`` does so.
+        """
+        frontier = [self]
+        for i, part in enumerate(parts):
+            if part == "*" and (star_selects_rest or i == len(parts) - 1):
+                ids: Set[int] = set()
+                for node in frontier:
+                    for child in node.children.values():
+                        ids.update(child.subtree())
+                return ids
+            if has_glob(part):
+                frontier = [child for node in frontier
+                            for key, child in node.children.items()
+                            if fnmatchcase(key, part)]
+            else:
+                frontier = [node.children[part] for node in frontier
+                            if part in node.children]
+            if not frontier:
+                return set()
+        ids = set()
+        for node in frontier:
+            ids.update(node.subtree())
+        return ids
+
+
+def split_path(path: str) -> List[str]:
+    return [p for p in path.replace("\\", "/").split("/") if p and p != "."]
+
+
+def flat_fqn(fqn: Iterable[str]) -> List[str]:
+    # Dots in model names act as namespace separators, as in dbt
+    return [item for segment in fqn for item in segment.split(".")]
+
+
+def lookup_keyed(index: Dict[str, Postings], value: str) -> Set[int]:
+    """Exact lookup, or a union over every key matching a wildcard value"""
+    if has_glob(value):
+        ids: Set[int] = set()
+        for key, postings in index.items():
+            if fnmatchcase(key, value):
+                ids.update(postings)
+        return ids
+    return set(index.get(value, EMPTY))
+
+
+def _add(index: Dict[Any, List[int]], key: Any, node_id: int):
+    # Node IDs arrive in increasing order, so only the last entry can repeat
+    ids = index[key]
+    if not ids or ids[-1] != node_id:
+        ids.append(node_id)
+
+
+def _pack(index: Dict[Any, List[int]]) -> Dict[Any, Postings]:
+    return {key: array("i", ids) for key, ids in index.items()}
+
+
+# Indexes mapping a string key to the postings of nodes with that value
+ATTRIBUTE_INDEXES = (
+    "tag", "package", "resource_type", "group", "access", "file", "name", "test_name",
+)
+KEYED_INDEXES = ATTRIBUTE_INDEXES + ("version",) + tuple(NAMED_METHODS)
+# Methods answered from one keyed index, whose glob values are matched in batches
+GLOB_KEYED_METHODS = ("tag", "package", "resource_type", "group", "access", "file", "test_name")
+# Methods answered by walking a segment trie; every value is matched in batches
+TRIE_METHODS = ("path", "fqn")
+
+
+def build_keyed_indexes(nodes: Sequence[Any]) -> Dict[str, Dict[str, Postings]]:
+    """One pass over the node table filling every keyed index"""
+    tables = {name: defaultdict(list) for name in KEYED_INDEXES}
+    tag, package, resource_type = tables["tag"], tables["package"], tables["resource_type"]
+    group, access, file, name = tables["group"], tables["access"], tables["file"], tables["name"]
+    for i, node in enumerate(nodes):
+        for t in node.tags:
+            _add(tag, t, i)
+        _add(package, node.package_name, i)
+        _add(resource_type, node.resource_type, i)
+        if node.group:
+            _add(group, node.group, i)
+        if node.access:
+            _add(access, node.access, i)
+        if node.path:
+            parts = split_path(node.path)
+            if parts:
+                _add(file, parts[-1], i)
+                _add(file, parts[-1].rsplit(".", 1)[0], i)
+        if node.fqn:
+            _add(name, node.fqn[-1], i)
+        if node.name:
+            _add(name, node.name, i)
+        if node.test_name:
+            _add(tables["test_name"], node.test_name, i)
+        if node.version is not None:
+            _add(tables["version"], str(node.version), i)
+        if node.resource_type in NAMED_METHODS:
+            _add(tables[node.resource_type], node.name, i)
+    return {name: _pack(index) for name, index in tables.items()}
+
+
+class MethodIndexes:
+    """Per-method inverted indexes over a node table
+
+    ``tables`` restores previously built keyed indexes (see ``index_cache``);
+    the path and fqn tries and config columns are built on first use.
+    """
+
+    def __init__(self, nodes: Sequence[Any], tables: Optional[Dict[str, Dict[str, Postings]]] = None):
+        self.nodes = nodes
+        self.tables = tables if tables is not None else build_keyed_indexes(nodes)
+        for name in ATTRIBUTE_INDEXES:
+            setattr(self, name, self.tables[name])
+        self.named = {method: self.tables[method] for method in NAMED_METHODS}
+        self._all_ids = None
+        self._path: Optional[SegmentTrie] = None
+        self._fqn: Optional[SegmentTrie] = None
+        # config.<key> columns are built on first use of each key
+        self._config: Dict[str, ConfigColumn] = {}
+        # Matches of glob and trie values by (method, value), see match_patterns()
+        self._matches: Dict[Tuple[str, str], Set[int]] = {}
+
+    @property
+    def all_ids(self) -> FrozenSet[int]:
+        if self._all_ids is None:
+            self._all_ids = frozenset(range(len(self.nodes)))
+        return self._all_ids
+
+    @property
+    def path(self) -> SegmentTrie:
+        if self._path is None:
+            trie = SegmentTrie()
+            for i, node in enumerate(self.nodes):
+                if node.path:
+                    trie.insert(split_path(node.path), i)
+            self._path = trie
+        return self._path
+
+    @property
+    def fqn(self) -> SegmentTrie:
+        if self._fqn is None:
+            trie = SegmentTrie()
+            for i, node in enumerate(self.nodes):
+                if node.fqn:
+                    trie.insert(flat_fqn(node.fqn), i)
+            self._fqn = trie
+        return self._fqn
+
+    def config_column(self, key: str) -> ConfigColumn:
+        column = self._config.get(key)
+        if column is None:
+            column = self._config[key] = build_column(self.nodes, key)
+        return column
+
+    def match_patterns(self, criteria: Iterable[Tuple[str, str]]):
+        """Match many ``(method, value)`` pairs at once and cache the results
+
+        Glob values of keyed methods are compiled into one ``GlobSet`` per
+        index and every index key is tested once; path and fqn values are
+        matched in one walk of their trie. ``select`` then answers these
+        criteria from the cache.
+        """
+        keyed: Dict[str, Set[str]] = defaultdict(set)
+        trie: Dict[str, Set[str]] = defaultdict(set)
+        for method, value in criteria:
+            value = str(value)
+            if (method, value) in self._matches:
+                continue
+            if method in TRIE_METHODS:
+                trie[method].add(value)
+            elif method in GLOB_KEYED_METHODS and has_glob(value):
+                keyed[method].add(value)
+        for method, values in keyed.items():
+            self._match_keyed(method, getattr(self, method), values)
+        if trie["path"]:
+            values = sorted(trie["path"])
+            patterns = [split_path(v) for v in values]
+            for value, ids in zip(values, match_trie(self.path, patterns, star_selects_rest=False)):
+                self._matches["path", value] = ids
+        if trie["fqn"]:
+            values = sorted(trie["fqn"])
+            names = self._match_keyed("name", self.name, [v for v in values if has_glob(v)])
+            for value, ids in zip(values, match_trie(self.fqn, [flat_fqn([v]) for v in values])):
+                ids.update(names[value] if value in names else self.name.get(value, EMPTY))
+                self._matches["fqn", value] = ids
+
+    def _match_keyed(self, method: str, index: Dict[str, Postings],
+                     patterns: Iterable[str]) -> Dict[str, Set[int]]:
+        matched = {}
+        for pattern, keys in GlobSet(patterns).match(index).items():
+            ids: Set[int] = set()
+            for key in keys:
+                ids.update(index[key])
+            matched[pattern] = self._matches[method, pattern] = ids
+        return matched
+
+    def _matched(self, method: str, value: str) -> Set[int]:
+        # Cached sets are shared, callers get a copy
+        ids = self._matches.get((method, value))
+        if ids is None:
+            self.match_patterns([(method, value)])
+            ids = self._matches[method, value]
+        return set(ids)
+
+    def select(self, method: str, value: str, args: Sequence[str] = ()) -> Set[int]:
+        """Node IDs matched by a single ``method[.args]:value`` criterion"""
+        value = str(value)
+        if method in TRIE_METHODS or (method in GLOB_KEYED_METHODS and has_glob(value)):
+            return self._matched(method, value)
+        if method == "tag":
+            return lookup_keyed(self.tag, value)
+        if method == "file":
+            return lookup_keyed(self.file, value)
+        if method == "package":
+            return lookup_keyed(self.package, value)
+        if method == "resource_type":
+            return lookup_keyed(self.resource_type, value)
+        if method == "group":
+            return lookup_keyed(self.group, value)
+        if method == "access":
+            return lookup_keyed(self.access, value)
+        if method == "test_name":
+            return lookup_keyed(self.test_name, value)
+        if method == "config":
+            if not args:
+                raise SelectorError("The config method needs a key, e.g. config.materialized")
+            return self.config_column(".".join(args)).select(value)
+        if method == "source":
+            return self._select_source(value)
+        if method == "version":
+            return self._select_version(value)
+        if method in NAMED_METHODS:
+            return self._select_named(method, value)
+        raise SelectorError(f"The '{method}' method cannot be evaluated against a manifest")
+
+    def _select_named(self, method: str, value: str) -> Set[int]:
+        parts = value.split(".")
+        ids = lookup_keyed(self.named[method], parts[-1])
+        if len(parts) > 1:
+            package = parts[0]
+            ids = {i for i in ids if fnmatchcase(self.nodes[i].package_name, package)}
+        return ids
+
+    def _select_source(self, value: str) -> Set[int]:
+        parts = value.split(".")
+        if len(parts) > 3:
+            raise SelectorError(f"Invalid source selector value '{value}'")
+        # source:<source>, source:<source>.<table>, source:<package>.<source>.<table>
+        fields = {1: ("source_name",),
+                  2: ("source_name", "name"),
+                  3: ("package_name", "source_name", "name")}[len(parts)]
+        return {
+            i for i in self.resource_type.get("source", EMPTY)
+            if all(fnmatchcase(getattr(self.nodes[i], f) or "", p)
+                   for f, p in zip(fields, parts))
+        }
+
+    def _select_version(self, value: str) -> Set[int]:
+        if value not in ("latest", "prerelease", "old", "none"):
+            raise SelectorError(f"Invalid version selector value '{value}'")
+        if value == "none":
+            return {i for i, node in enumerate(self.nodes)
+                    if node.version is None and node.resource_type == "model"}
+        ids = set()
+        for i in (i for ids in self.tables["version"].values() for i in ids):
+            node = self.nodes[i]
+            if node.latest_version is None:
+                continue
+            cmp = _compare_versions(node.version, node.latest_version)
+            if (value == "latest" and cmp == 0) or (value == "prerelease" and cmp > 0) \
+                    or (value == "old" and cmp < 0):
+                ids.add(i)
+        return ids
+
+
+def _compare_versions(a: Any, b: Any) -> int:
+    try:
+        a, b = float(a), float(b)
+    except (TypeError, ValueError):
+        a, b = str(a), str(b)
+    return (a > b) - (a < b)
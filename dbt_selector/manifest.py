@@ -0,0 +1,138 @@
+"""Load a dbt manifest.json into a compact node table for selector previews"""
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .graph import Graph
+from .indexes import MethodIndexes
+
+# Manifest sections that hold selectable resources
+NODE_SECTIONS = [
+    "nodes", "sources", "exposures", "metrics",
+    "semantic_models", "saved_queries",
+]
+
+
+class Node:
+    """The subset of a manifest resource that selector methods look at"""
+
+    __slots__ = (
+        "unique_id", "resource_type", "package_name", "name", "path",
+        "fqn", "tags", "config", "group", "access", "version",
+        "latest_version", "source_name", "test_name", "checksum",
+    )
+
+    def __init__(self, unique_id: str, resource_type: str, package_name: str,
+                 name: str, path: str, fqn: tuple, tags: tuple, config: dict,
+                 group: Optional[str] = None, access: Optional[str] = None,
+                 version: Any = None, latest_version: Any = None,
+                 source_name: Optional[str] = None,
+                 test_name: Optional[str] = None,
+                 checksum: Optional[str] = None):
+        self.unique_id = unique_id
+        self.resource_type = resource_type
+        self.package_name = package_name
+        self.name = name
+        self.path = path
+        self.fqn = fqn
+        self.tags = tags
+        self.config = config
+        self.group = group
+        self.access = access
+        self.version = version
+        self.latest_version = latest_version
+        self.source_name = source_name
+        self.test_name = test_name
+        self.checksum = checksum
+
+    def __repr__(self):
+        return f"Node({self.unique_id!r})"
+
+
+def intern(value: Any) -> Any:
+    """Share one copy of repeated strings (tags, packages, config values) across nodes"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {sys.intern(k): intern(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [intern(v) for v in value]
+    return value
+
+
+def _intern_optional(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def node_from_dict(unique_id: str, data: Dict[str, Any],
+                   configs: Optional[Dict[str, dict]] = None) -> Node:
+    """Keep only the fields selector methods need from a manifest entry
+
+    ``configs`` lets nodes with identical configs share one dict while loading.
+    """
+    config = data.get("config") or {}
+    if configs is not None:
+        key = json.dumps(config, sort_keys=True, default=str)
+        config = configs.get(key) or configs.setdefault(key, intern(config))
+    else:
+        config = intern(config)
+    test_metadata = data.get("test_metadata") or {}
+    checksum = data.get("checksum") or {}
+    return Node(
+        unique_id=sys.intern(unique_id),
+        resource_type=sys.intern(data.get("resource_type") or unique_id.split(".", 1)[0]),
+        package_name=sys.intern(data.get("package_name", "")),
+        name=data.get("name", ""),
+        path=data.get("original_file_path") or data.get("path") or "",
+        fqn=tuple(intern(data.get("fqn") or ())),
+        tags=tuple(intern(data.get("tags") or config.get("tags") or ())),
+        config=config,
+        group=_intern_optional(data.get("group") or config.get("group")),
+        access=_intern_optional(data.get("access") or config.get("access")),
+        version=data.get("version"),
+        latest_version=data.get("latest_version"),
+        source_name=_intern_optional(data.get("source_name")),
+        test_name=_intern_optional(test_metadata.get("name")),
+        checksum=checksum.get("checksum") if isinstance(checksum, dict) else checksum,
+    )
+
+
+class Manifest:
+    """Node table with integer node IDs and per-method indexes built once"""
+
+    def __init__(self, nodes: List[Node], metadata: Optional[Dict[str, Any]] = None,
+                 graph: Optional[Graph] = None, indexes: Optional[MethodIndexes] = None,
+                 external_edges: Optional[List[Tuple[str, str]]] = None):
+        self.nodes = nodes
+        self.metadata = metadata or {}
+        self.ids = {node.unique_id: i for i, node in enumerate(nodes)}
+        self.indexes = indexes or MethodIndexes(nodes)
+        self.graph = graph or Graph.from_maps(self.ids, {})
+        # (child, parent) unique_ids of parent_map edges to nodes outside this manifest,
+        # such as cross-project refs in a dbt Mesh
+        self.external_edges: List[Tuple[str, str]] = external_edges or []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def all_ids(self) -> frozenset:
+        return self.indexes.all_ids
+
+    def unique_ids(self, node_ids: Iterable[int]) -> List[str]:
+        """Map integer node IDs back to sorted unique_ids"""
+        return sorted(self.nodes[i].unique_id for i in node_ids)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Manifest":
+        nodes = []
+        for section in NODE_SECTIONS:
+            for unique_id, entry in (data.get(section) or {}).items():
+                nodes.append(node_from_dict(unique_id, entry))
+        ids = {node.unique_id: i for i, node in enumerate(nodes)}
+        parent_map = data.get("parent_map") or {}
+        graph = Graph.from_maps(ids, parent_map, data.get("child_map"))
+        external = [(child, parent) for child, parents in parent_map.items() if child in ids
+                    for parent in parents if parent not in ids]
+        return cls(nodes, data.get("metadata"), graph, external_edges=external)
+
@@ -0,0 +1,223 @@
+"""Evaluate selectors across several dbt projects (a dbt Mesh) as one graph
+
+Each project's manifest is loaded and indexed in its own worker process. A
+worker hands the built manifest back as an index-cache entry (see
+``index_cache``) written into a shared-memory block, so the parent copies one
+flat buffer instead of unpickling a node table, CSR arrays and postings.
+
+The parent stitches the projects into one ``Manifest``:
+
+* node IDs are assigned project by project, so each project owns a contiguous
+  ID range
+* a node present in several manifests (an upstream public model seen from a
+  downstream project) is kept once, from the project named like its package
+* each project's edges are remapped, and ``parent_map`` references to nodes
+  outside a manifest are resolved against the merged node set
+* keyed index postings are remapped and concatenated rather than rebuilt
+"""
+import os
+from array import array
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .artifacts import RunHistory
+from .batch import BatchEvaluator, SelectorResult
+from .exceptions import ManifestError
+from .graph import PARENTS, Adjacency, Graph
+from .index_cache import IndexCache, entry_chunks, entry_from_buffer
+from .indexes import KEYED_INDEXES, MethodIndexes
+from .ingest import load_manifest
+from .manifest import Manifest
+
+
+def project_name(manifest: Manifest, path: str = "") -> str:
+    """``metadata.project_name``, else the package most of the manifest's nodes belong to"""
+    name = manifest.metadata.get("project_name")
+    if name:
+        return name
+    packages = Counter(node.package_name for node in manifest.nodes if node.resource_type != "test")
+    if packages:
+        return packages.most_common(1)[0][0]
+    return os.path.basename(os.path.dirname(os.path.abspath(path))) or path
+
+
+def _build_project(path: str, use_cache: bool, cache_dir: Optional[str]) -> Tuple[str, int]:
+    # Runs in a worker: build the manifest, then publish it as one shared-memory block
+    manifest = IndexCache(cache_dir).load_manifest(path) if use_cache else load_manifest(path)
+    chunks = [memoryview(chunk).cast("B") for chunk in entry_chunks(manifest)]
+    size = sum(chunk.nbytes for chunk in chunks)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    offset = 0
+    for chunk in chunks:
+        block.buf[offset:offset + chunk.nbytes] = chunk
+        offset += chunk.nbytes
+    if os.name == "posix":
+        # The parent unlinks the block; stop this process's tracker from removing it first
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, "shared_memory")
+    block.close()
+    return block.name, size
+
+
+def _discard_block(name: str):
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def _read_block(name: str, size: int) -> Manifest:
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        data = bytes(block.buf[:size])
+    finally:
+        block.close()
+        block.unlink()
+    manifest = entry_from_buffer(memoryview(data))
+    if manifest is None:
+        raise ManifestError("A worker returned an unreadable manifest")
+    return manifest
+
+
+def load_projects(paths: Sequence[str], workers: Optional[int] = None, use_cache: bool = True,
+                  cache_dir: Optional[str] = None) -> List[Manifest]:
+    """Load and index several manifests, in parallel worker processes when ``workers`` allows"""
+    if len(paths) < 2 or workers == 1:
+        return [IndexCache(cache_dir).load_manifest(path) if use_cache else load_manifest(path)
+                for path in paths]
+    published: List[Tuple[str, int]] = []
+    manifests: List[Manifest] = []
+    error: Optional[Exception] = None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_build_project, path, use_cache, cache_dir) for path in paths]
+            # Every worker's result is collected even if another project failed, so its block is freed
+            for future in futures:
+                try:
+                    published.append(future.result())
+                except (ManifestError, OSError) as e:
+                    error = error or e
+                except Exception as e:
+                    # A crashed worker (BrokenProcessPool) or an unpicklable result
+                    error = error or ManifestError(f"Could not load manifests: {e}")
+        while error is None and published:
+            manifests.append(_read_block(*published.pop(0)))
+    finally:
+        # Blocks never read, after a failure anywhere above, are unlinked rather than left in /dev/shm
+        for name, _ in published:
+            _discard_block(name)
+    if error is not None:
+        raise error
+    return manifests
+
+
+class Mesh:
+    """Several projects merged into one manifest, with each project's node ID range"""
+
+    def __init__(self, manifest: Manifest, projects: List[str], starts: List[int]):
+        self.manifest = manifest
+        self.projects = projects
+        # Project i owns node IDs starts[i] .. starts[i + 1] - 1
+        self.starts = starts
+
+    def project_of(self, node_id: int) -> str:
+        return self.projects[bisect_right(self.starts, node_id) - 1]
+
+    def split(self, node_ids: Iterable[int]) -> Dict[str, int]:
+        """Node counts per project"""
+        counts = [0] * len(self.projects)
+        starts = self.starts
+        for node_id in node_ids:
+            counts[bisect_right(starts, node_id) - 1] += 1
+        return dict(zip(self.projects, counts))
+
+    def evaluate(self, selectors: List[Dict[str, Any]], state: Optional[Manifest] = None,
+                 history: Optional[RunHistory] = None) -> List[Tuple[SelectorResult, Dict[str, int]]]:
+        """Every selector over the merged graph, with its node counts per project"""
+        results = BatchEvaluator(self.manifest, selectors, state=state, history=history).run()
+        return [(result, self.split(result.node_ids or ())) for result in results]
+
+
+def merge_projects(manifests: Sequence[Manifest], names: Sequence[str]) -> Mesh:
+    """Stitch per-project manifests into one Mesh"""
+    # Pick one owning project per unique_id, preferring the project that defines it
+    owner: Dict[str, int] = {}
+    for p, manifest in enumerate(manifests):
+        for node in manifest.nodes:
+            current = owner.get(node.unique_id)
+            if current is None or (node.package_name == names[p] != names[current]):
+                owner[node.unique_id] = p
+
+    nodes, starts, remaps = [], [], []
+    for p, manifest in enumerate(manifests):
+        starts.append(len(nodes))
+        remap = array("i", [-1]) * len(manifest)
+        for i, node in enumerate(manifest.nodes):
+            if owner[node.unique_id] == p:
+                remap[i] = len(nodes)
+                nodes.append(node)
+        remaps.append(remap)
+    ids = {node.unique_id: i for i, node in enumerate(nodes)}
+
+    parents, children = array("i"), array("i")
+    external: List[Tuple[str, str]] = []
+    bounds = list(zip(starts, starts[1:] + [len(nodes)]))
+    for p, manifest in enumerate(manifests):
+        remap, (start, end) = remaps[p], bounds[p]
+        # Nodes another project owns stand for that project's copy
+        for i, node in enumerate(manifest.nodes):
+            if remap[i] < 0:
+                remap[i] = ids[node.unique_id]
+        # A node's edges come from the project that owns it, so none is added twice
+        adjacency = manifest.graph.adjacency[PARENTS]
+        offsets, targets = adjacency.offsets, adjacency.targets
+        for i in range(len(manifest)):
+            child = remap[i]
+            if not start <= child < end:
+                continue
+            for parent in targets[offsets[i]:offsets[i + 1]]:
+                parents.append(remap[parent])
+                children.append(child)
+        for child_id, parent_id in manifest.external_edges:
+            child, parent = ids[child_id], ids.get(parent_id)
+            if not start <= child < end:
+                continue
+            if parent is None:
+                external.append((child_id, parent_id))
+            else:
+                parents.append(parent)
+                children.append(child)
+    graph = Graph(Adjacency.from_edges(len(nodes), children, parents),
+                  Adjacency.from_edges(len(nodes), parents, children))
+
+    # Projects are appended in ID order, so concatenated postings stay sorted
+    tables: Dict[str, Dict[str, array]] = {name: defaultdict(lambda: array("i")) for name in KEYED_INDEXES}
+    for p, manifest in enumerate(manifests):
+        remap, (start, end) = remaps[p], bounds[p]
+        for name in KEYED_INDEXES:
+            merged = tables[name]
+            for key, postings in manifest.indexes.tables[name].items():
+                owned = [remap[i] for i in postings if start <= remap[i] < end]
+                if owned:
+                    merged[key].extend(owned)
+    metadata = {"projects": list(names),
+                "dbt_version": next((m.metadata.get("dbt_version") for m in manifests), None)}
+    merged = Manifest(nodes, metadata, graph, MethodIndexes(nodes, {k: dict(v) for k, v in tables.items()}),
+                      external_edges=external)
+    return Mesh(merged, list(names), starts)
+
+
+def load_mesh(paths: Sequence[str], workers: Optional[int] = None, use_cache: bool = True,
+              cache_dir: Optional[str] = None) -> Mesh:
+    """Load the manifests of several projects and merge them into one graph"""
+    manifests = load_projects(paths, workers, use_cache, cache_dir)
+    names = [project_name(manifest, path) for manifest, path in zip(manifests, paths)]
+    duplicates = [name for name, count in Counter(names).items() if count > 1]
+    if duplicates:
+        raise ManifestError(f"Several manifests belong to the same project: {', '.join(duplicates)}")
+    return merge_projects(manifests, names)
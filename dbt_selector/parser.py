@@ -0,0 +1,206 @@
+"""Parser for CLI-style selection strings and converters between definition forms
+
+CLI strings compile to the same criterion dicts the app's criterion editor
+builds: space separated specs are a union, comma separated specs an
+intersection, and everything after ``--exclude`` becomes the ``exclude`` list.
+"""
+import copy
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from .exceptions import SelectorError
+
+# Selector methods dbt understands, as offered in the app
+METHODS = (
+    "tag", "path", "package", "config", "fqn", "resource_type", "source",
+    "exposure", "metric", "state", "group", "access", "file", "saved_query",
+    "semantic_model", "source_status", "result", "test_name", "test_type",
+    "version", "unique_id", "selector",
+)
+
+# Definition forms, named as in the app's "Definition type" radio
+CLI_STYLE = "CLI-style"
+KEY_VALUE = "Key-value"
+FULL_YAML = "Full YAML"
+DEFINITION_TYPES = (CLI_STYLE, KEY_VALUE, FULL_YAML)
+
+DEFAULT_INDIRECT_SELECTION = "eager"
+INDIRECT_SELECTION_MODES = ("eager", "cautious", "buildable", "empty")
+PARSE_CACHE_SIZE = 1024
+
+# Same shape as dbt's own single-spec pattern
+SPEC_PATTERN = re.compile(
+    r"\A"
+    r"(?P<childrens_parents>@)?"
+    r"(?P<parents>(?P<parents_depth>\d*)\+)?"
+    r"((?P<method>[\w.]+):)?(?P<value>.*?)"
+    r"(?P<children>\+(?P<children_depth>\d*))?"
+    r"\Z"
+)
+FILE_EXTENSIONS = (".sql", ".py", ".csv")
+
+
+def default_method(value: str) -> str:
+    """Method dbt infers for a bare value: path, file or fqn"""
+    if "/" in value or "\\" in value:
+        return "path"
+    if value.lower().endswith(FILE_EXTENSIONS):
+        return "file"
+    return "fqn"
+
+
+def parse_spec(spec: str, indirect_selection: str = DEFAULT_INDIRECT_SELECTION) -> Dict[str, Any]:
+    """One ``[@][n+]method[.args]:value[+n]`` spec as a method criterion"""
+    match = SPEC_PATTERN.match(spec)
+    if match is None or not match.group("value"):
+        raise SelectorError(f"Invalid selector spec '{spec}'")
+    if match.group("childrens_parents") and match.group("parents"):
+        raise SelectorError(f"Invalid selector spec '{spec}': '@' and a '+' prefix cannot be combined")
+
+    value = match.group("value")
+    method = match.group("method") or default_method(value)
+    if method.split(".", 1)[0] not in METHODS:
+        raise SelectorError(f"Unknown selector method '{method}' in '{spec}'")
+    criterion: Dict[str, Any] = {"method": method, "value": value}
+    if match.group("children"):
+        criterion["children"] = True
+        if match.group("children_depth"):
+            criterion["children_depth"] = int(match.group("children_depth"))
+    if match.group("parents"):
+        criterion["parents"] = True
+        if match.group("parents_depth"):
+            criterion["parents_depth"] = int(match.group("parents_depth"))
+    if match.group("childrens_parents"):
+        criterion["childrens_parents"] = True
+    criterion["indirect_selection"] = indirect_selection
+    return criterion
+
+
+def _parse_group(tokens: List[str], indirect_selection: str) -> Dict[str, Any]:
+    # A space separated group of tokens; commas inside a token intersect
+    criteria = []
+    for token in tokens:
+        specs = [parse_spec(spec, indirect_selection) for spec in token.split(",")]
+        criteria.append(specs[0] if len(specs) == 1 else {"intersection": specs})
+    return criteria[0] if len(criteria) == 1 else {"union": criteria}
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(text: str, indirect_selection: str) -> Dict[str, Any]:
+    include: List[str] = []
+    exclude: List[str] = []
+    target = include
+    for token in text.split():
+        if token == "--exclude":
+            target = exclude
+        elif token.startswith("-"):
+            raise SelectorError(f"Unsupported flag '{token}' in '{text}'")
+        else:
+            target.append(token)
+    if not include:
+        raise SelectorError(f"No selection in '{text}'")
+    criterion = _parse_group(include, indirect_selection)
+    if target is exclude and not exclude:
+        raise SelectorError(f"Nothing to exclude after --exclude in '{text}'")
+    if exclude:
+        excluded = _parse_group(exclude, indirect_selection)
+        criterion["exclude"] = excluded["union"] if "union" in excluded else [excluded]
+    return criterion
+
+
+def parse_cli(text: str, indirect_selection: str = DEFAULT_INDIRECT_SELECTION) -> Dict[str, Any]:
+    """Compile a CLI-style selection string into a criterion dict
+
+    Results are cached per string, so Streamlit reruns do not re-tokenize.
+    """
+    return copy.deepcopy(_parse_cached(text.strip(), indirect_selection))
+
+
+def is_single_spec(text: str) -> bool:
+    """Whether dbt accepts ``text`` verbatim as a string definition in selectors.yml"""
+    text = text.strip()
+    return bool(text) and not any(c in text for c in " \t\n,")
+
+
+def spec_to_cli(criterion: Dict[str, Any]) -> str:
+    """A method criterion back in ``[@][n+]method:value[+n]`` form"""
+    parts = []
+    if criterion.get("childrens_parents"):
+        parts.append("@")
+    if criterion.get("parents"):
+        parts.append(f"{criterion.get('parents_depth') or ''}+")
+    parts.append(f"{criterion['method']}:{criterion.get('value', '')}")
+    if criterion.get("children"):
+        parts.append(f"+{criterion.get('children_depth') or ''}")
+    return "".join(parts)
+
+
+def _not_expressible(definition: Any, reason: str) -> SelectorError:
+    return SelectorError(f"Cannot be written as a CLI string ({reason}): {definition!r}")
+
+
+def _to_cli_group(definition: Dict[str, Any], nested: bool) -> str:
+    if definition.get("indirect_selection", DEFAULT_INDIRECT_SELECTION) != DEFAULT_INDIRECT_SELECTION:
+        raise _not_expressible(definition, "per-criterion indirect_selection")
+    if "exclude" in definition and nested:
+        raise _not_expressible(definition, "nested exclusion")
+    if "method" in definition:
+        return spec_to_cli(definition)
+    if "intersection" in definition:
+        items = [to_full_yaml(item) for item in definition["intersection"]]
+        if not all("method" in item and "exclude" not in item for item in items):
+            raise _not_expressible(definition, "intersection of non-method criteria")
+        return ",".join(_to_cli_group(item, True) for item in items)
+    if "union" in definition:
+        items = [to_full_yaml(item) for item in definition["union"]]
+        if any("union" in item or list(item) == ["exclude"] for item in items):
+            raise _not_expressible(definition, "nested union or exclusion")
+        return " ".join(_to_cli_group(item, True) for item in items)
+    raise SelectorError(f"Invalid selector definition: {definition!r}")
+
+
+def to_cli(definition: Any) -> str:
+    """Any definition form as a CLI-style string"""
+    if isinstance(definition, str):
+        parse_cli(definition)
+        return definition.strip()
+    definition = to_full_yaml(definition)
+    text = _to_cli_group(definition, False)
+    if definition.get("exclude"):
+        excluded = [to_full_yaml(item) for item in definition["exclude"]]
+        text += " --exclude " + " ".join(_to_cli_group(item, True) for item in excluded)
+    return text
+
+
+def to_key_value(definition: Any) -> Dict[str, str]:
+    """A definition as a ``{method: value}`` dict; only plain method criteria fit"""
+    criterion = to_full_yaml(definition)
+    extra = set(criterion) - {"method", "value", "indirect_selection"}
+    if "method" not in criterion or extra or \
+            criterion.get("indirect_selection", DEFAULT_INDIRECT_SELECTION) != DEFAULT_INDIRECT_SELECTION:
+        raise SelectorError(f"Only a single method without operators fits the key-value form: {definition!r}")
+    return {criterion["method"]: criterion.get("value", "")}
+
+
+def to_full_yaml(definition: Any) -> Dict[str, Any]:
+    """Any definition form as a full criterion dict"""
+    if isinstance(definition, str):
+        return parse_cli(definition)
+    if not isinstance(definition, dict) or not definition:
+        raise SelectorError(f"Invalid selector definition: {definition!r}")
+    if len(definition) == 1 and not {"union", "intersection", "exclude", "method"} & set(definition):
+        method, value = next(iter(definition.items()))
+        return {"method": method, "value": value}
+    return definition
+
+
+def convert(definition: Any, definition_type: str) -> Any:
+    """Convert between the app's CLI-style, Key-value and Full YAML forms"""
+    if definition_type == CLI_STYLE:
+        return to_cli(definition)
+    if definition_type == KEY_VALUE:
+        return to_key_value(definition)
+    if definition_type == FULL_YAML:
+        return to_full_yaml(definition)
+    raise ValueError(f"Unknown definition type '{definition_type}'")
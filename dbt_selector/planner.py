@@ -0,0 +1,297 @@
+"""Query planner for nested union/intersection/exclude selector definitions
+
+Definitions are normalized before evaluation:
+
+* key-value and CLI-style forms become method criteria
+* nested unions inside unions and intersections inside intersections are
+  flattened, and identical subtrees are deduplicated
+* exclusions become negated operands at the end of an intersection, so they
+  are only evaluated when the positive operands left something to subtract from
+
+Intersection operands run in ascending order of estimated cardinality, taken
+from index statistics, and evaluation stops as soon as a set comes up empty.
+Identical subtrees anywhere in the tree are evaluated once per execution.
+"""
+import json
+import math
+import time
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Optional, Set
+
+from .evaluate import TEST_RESOURCE_TYPES, Evaluator, _depth
+from .exceptions import SelectorError
+from .indexes import ATTRIBUTE_INDEXES, GLOB_KEYED_METHODS, NAMED_METHODS, has_glob
+from .parser import spec_to_cli, to_full_yaml
+
+LEAF = "leaf"
+UNION = "union"
+INTERSECTION = "intersection"
+EXCLUDE = "exclude"
+
+# Methods answered by a keyed index, so their cardinality is a postings length
+KEYED_METHODS = {"tag": "tag", "package": "package", "resource_type": "resource_type",
+                 "group": "group", "access": "access", "file": "file", "test_name": "test_name"}
+KEYED_METHODS.update({method: method for method in NAMED_METHODS})
+GRAPH_KEYS = ("parents", "children", "childrens_parents")
+# Levels assumed for unbounded +/@ expansion when estimating
+UNBOUNDED_DEPTH_ESTIMATE = 4
+
+
+def _expansion_estimate(seeds: int, degree: float, depth: int, num_nodes: int) -> int:
+    """Nodes reached from ``seeds`` in ``depth`` levels of ``degree`` neighbours, at most ``num_nodes``"""
+    if not seeds:
+        return 0
+    # Compared in log space, so deep expansions cannot overflow a float
+    if math.log(seeds) + max(depth, 0) * math.log1p(degree) >= math.log(num_nodes or 1):
+        return num_nodes
+    return int(seeds * (1 + degree) ** max(depth, 0))
+
+
+class PlanNode:
+    """One operator in a selector plan"""
+
+    __slots__ = ("op", "children", "criterion", "key", "estimate", "cost", "actual", "elapsed")
+
+    def __init__(self, op: str, children: Optional[List["PlanNode"]] = None,
+                 criterion: Optional[Dict[str, Any]] = None):
+        self.op = op
+        self.children = children or []
+        self.criterion = criterion
+        if op == LEAF:
+            self.key = json.dumps(criterion, sort_keys=True, default=str)
+        elif op == EXCLUDE:
+            self.key = f"{op}({self.children[0].key})"
+        else:
+            # Union and intersection are commutative
+            self.key = f"{op}({','.join(sorted(child.key for child in self.children))})"
+        self.estimate = 0
+        self.cost = 0
+        self.actual: Optional[int] = None
+        self.elapsed: Optional[float] = None
+
+    def label(self) -> str:
+        if self.op == LEAF:
+            text = spec_to_cli(self.criterion)
+            mode = self.criterion.get("indirect_selection", "eager")
+            return text if mode == "eager" else f"{text} (indirect_selection={mode})"
+        return self.op.upper()
+
+
+def _split_excludes(items: Any):
+    if not isinstance(items, list):
+        raise SelectorError(f"Expected a list of criteria, got {items!r}")
+    include, exclude = [], []
+    for item in items:
+        if isinstance(item, dict) and list(item) == ["exclude"]:
+            exclude.extend(item["exclude"])
+        else:
+            include.append(item)
+    return include, exclude
+
+
+def _combine(op: str, children: List[PlanNode]) -> PlanNode:
+    """Flatten same-operator children and drop duplicate subtrees"""
+    flat: List[PlanNode] = []
+    seen = set()
+    for child in children:
+        for grandchild in (child.children if child.op == op else [child]):
+            if grandchild.key not in seen:
+                seen.add(grandchild.key)
+                flat.append(grandchild)
+    if op == INTERSECTION and all(child.op == EXCLUDE for child in flat):
+        raise SelectorError("An intersection needs at least one criterion that is not an exclusion")
+    if len(flat) == 1:
+        return flat[0]
+    return PlanNode(op, flat)
+
+
+def _with_excludes(node: PlanNode, excludes: List[Any]) -> PlanNode:
+    # X minus E is evaluated as X AND NOT E, so E joins X's intersection when it has one
+    if not excludes:
+        return node
+    excluded = normalize({"union": excludes}) if len(excludes) > 1 else normalize(excludes[0])
+    return _combine(INTERSECTION, [node, PlanNode(EXCLUDE, [excluded])])
+
+
+def normalize(definition: Any) -> PlanNode:
+    """Rewrite any definition form into a flattened, deduplicated plan tree"""
+    definition = to_full_yaml(definition)
+    excludes = list(definition.get("exclude") or [])
+    if UNION in definition:
+        include, listed = _split_excludes(definition[UNION])
+        node = _combine(UNION, [normalize(item) for item in include])
+        excludes += listed
+    elif INTERSECTION in definition:
+        include, listed = _split_excludes(definition[INTERSECTION])
+        node = _combine(INTERSECTION, [normalize(item) for item in include])
+        excludes += listed
+    elif "method" in definition:
+        node = PlanNode(LEAF, criterion={k: v for k, v in definition.items() if k != "exclude"})
+    else:
+        raise SelectorError(f"Invalid selector definition: {definition!r}")
+    return _with_excludes(node, excludes)
+
+
+def seed_key(criterion: Dict[str, Any]) -> str:
+    return f"{criterion['method']}:{criterion.get('value', '')}"
+
+
+class Planner:
+    """Plans and executes selector definitions against one manifest"""
+
+    def __init__(self, evaluator: Evaluator):
+        self.evaluator = evaluator
+        self.manifest = evaluator.manifest
+        graph = self.manifest.graph
+        num_nodes = max(len(self.manifest), 1)
+        self.avg_degree = {direction: len(adjacency.targets) / num_nodes
+                           for direction, adjacency in graph.adjacency.items()}
+        resource_types = self.manifest.indexes.resource_type
+        tests = sum(len(resource_types.get(t, ())) for t in TEST_RESOURCE_TYPES)
+        # Indirectly selected tests per directly selected node
+        self.test_ratio = tests / max(num_nodes - tests, 1)
+        # Seed sets computed while estimating are reused during execution
+        self._seeds: Dict[str, Set[int]] = {}
+
+    def plan(self, definition: Any) -> PlanNode:
+        """Normalize a definition and order its operands by estimated cost"""
+        root = normalize(definition)
+        self._estimate(root)
+        return root
+
+    def _leaf_seeds_estimate(self, criterion: Dict[str, Any]) -> int:
+        method, *args = str(criterion["method"]).split(".")
+        value = str(criterion.get("value", ""))
+        indexes = self.manifest.indexes
+        if method in KEYED_METHODS and method not in self.evaluator.methods:
+            index = getattr(indexes, method) if method in ATTRIBUTE_INDEXES else indexes.named[method]
+            if method in NAMED_METHODS:
+                value = value.split(".")[-1]
+            if has_glob(value):
+                if method in GLOB_KEYED_METHODS:
+                    # Matched through the index's compiled patterns; kept for execution
+                    return len(self.select_seeds(criterion))
+                return sum(len(ids) for key, ids in index.items() if fnmatchcase(key, value))
+            return len(index.get(value, ()))
+        if method == "config" and args and method not in self.evaluator.methods:
+            return indexes.config_column(".".join(args)).count(value)
+        # Tries, sources and custom methods: select once and keep the result
+        return len(self.select_seeds(criterion))
+
+    def select_seeds(self, criterion: Dict[str, Any]) -> Set[int]:
+        """A leaf's method matches before graph operators, computed once per planner"""
+        key = seed_key(criterion)
+        seeds = self._seeds.get(key)
+        if seeds is None:
+            seeds = self._seeds[key] = self.evaluator.select_method(
+                criterion["method"], criterion.get("value", ""))
+        return seeds
+
+    def cached_seeds(self, criterion: Dict[str, Any]) -> Optional[Set[int]]:
+        """Seeds already computed for a leaf, without selecting them"""
+        return self._seeds.get(seed_key(criterion))
+
+    def _estimate(self, node: PlanNode):
+        num_nodes = len(self.manifest)
+        for child in node.children:
+            self._estimate(child)
+        if node.op == LEAF:
+            seeds = self._leaf_seeds_estimate(node.criterion)
+            estimate = seeds
+            criterion = node.criterion
+            if criterion.get("childrens_parents"):
+                estimate = num_nodes if seeds else 0
+            for direction in ("parents", "children"):
+                if criterion.get(direction):
+                    depth = _depth(criterion, f"{direction}_depth") or UNBOUNDED_DEPTH_ESTIMATE
+                    estimate += _expansion_estimate(seeds, self.avg_degree[direction], depth, num_nodes)
+            if criterion.get("indirect_selection", "eager") != "empty":
+                estimate = int(estimate * (1 + self.test_ratio))
+            node.estimate = min(num_nodes, estimate)
+            node.cost = seeds + (node.estimate if any(criterion.get(k) for k in GRAPH_KEYS) else 0)
+        elif node.op == UNION:
+            node.estimate = min(num_nodes, sum(child.estimate for child in node.children))
+            node.cost = sum(child.cost for child in node.children)
+        elif node.op == INTERSECTION:
+            positives = sorted((c for c in node.children if c.op != EXCLUDE), key=lambda c: c.estimate)
+            negatives = [c for c in node.children if c.op == EXCLUDE]
+            node.children = positives + negatives
+            node.estimate = positives[0].estimate
+            node.cost = sum(child.cost for child in node.children)
+        else:  # EXCLUDE
+            node.estimate = node.children[0].estimate
+            node.cost = node.children[0].cost
+
+    def execute(self, root: PlanNode, memo: Optional[Dict[str, Set[int]]] = None) -> Set[int]:
+        """Evaluate a plan; ``memo`` shares subtree results by structural key"""
+        memo = {} if memo is None else memo
+        for node in _walk(root):
+            node.actual = node.elapsed = None
+        return set(self._execute(root, memo))
+
+    def _execute(self, node: PlanNode, memo: Dict[str, Set[int]]) -> Set[int]:
+        cached = memo.get(node.key)
+        if cached is not None:
+            node.actual, node.elapsed = len(cached), 0.0
+            return cached
+        start = time.perf_counter()
+        if node.op == LEAF:
+            ids = self.evaluator.expand_graph(self.select_seeds(node.criterion), node.criterion)
+        elif node.op == UNION:
+            ids = set()
+            for child in node.children:
+                ids |= self._execute(child, memo)
+        elif node.op == INTERSECTION:
+            ids = None
+            for child in node.children:
+                if child.op == EXCLUDE:
+                    excluded = self._execute(child.children[0], memo)
+                    child.actual, child.elapsed = len(excluded), child.children[0].elapsed
+                    ids = ids - excluded
+                else:
+                    selected = self._execute(child, memo)
+                    ids = set(selected) if ids is None else ids & selected
+                if not ids:
+                    # Short-circuit: the remaining operands cannot add anything back
+                    break
+            ids = ids or set()
+        else:
+            raise SelectorError("An exclusion can only be evaluated inside an intersection")
+        node.elapsed = time.perf_counter() - start
+        node.actual = len(ids)
+        memo[node.key] = ids
+        return ids
+
+    def evaluate(self, definition: Any) -> Set[int]:
+        return self.execute(self.plan(definition))
+
+    def explain(self, definition: Any, analyze: bool = False) -> str:
+        """The plan as indented text with estimates, and actual rows/time when analyzed"""
+        root = self.plan(definition)
+        if analyze:
+            self.execute(root)
+        return format_plan(root, analyze)
+
+
+def _walk(node: PlanNode):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def format_plan(root: PlanNode, analyze: bool = False) -> str:
+    lines: List[str] = []
+    _explain(root, 0, analyze, lines)
+    return "\n".join(lines)
+
+
+def _explain(node: PlanNode, depth: int, analyze: bool, lines: List[str]):
+    text = f"{'  ' * depth}{node.label()}  (est={node.estimate} cost={node.cost}"
+    if analyze:
+        if node.actual is None:
+            text += " skipped"
+        else:
+            text += f" rows={node.actual} time={node.elapsed * 1000:.2f}ms"
+    lines.append(text + ")")
+    for child in node.children:
+        _explain(child, depth + 1, analyze, lines)
@@ -0,0 +1,215 @@
+"""Manifests shared by every session of a long-running process (the app server)
+
+A ``ManifestRegistry`` loads each version of a manifest.json (its path and
+mtime) once, on a small thread pool, so a session asking for a manifest gets a
+``ManifestBuild`` back immediately and can keep rendering while the build
+reports its progress. Sessions asking for a manifest already loaded, or still
+loading, attach to the same build.
+
+Entries are reference counted by holder (a session and the role it loads the
+manifest for, e.g. ``"<session>:state"``). A holder attaching to another
+version of its manifest releases the old one. Sessions end without notice, so
+a holder's claim lapses after ``lease`` seconds without being renewed.
+
+Built manifests are kept until their estimated size exceeds ``max_bytes``;
+then the least recently used entries nobody holds are dropped. Entries in use
+are never dropped, even when they alone exceed the limit.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import ManifestError
+from .index_cache import IndexCache
+from .manifest import Manifest
+
+DEFAULT_MAX_BYTES = 2 << 30
+DEFAULT_WORKERS = 2
+DEFAULT_LEASE = 3600.0
+# Nodes sampled to estimate the size of the node table
+SIZE_SAMPLE = 256
+
+
+def _deep_size(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def estimate_bytes(manifest: Manifest) -> int:
+    """Approximate memory held by a manifest: node table, graph arrays and index postings"""
+    nodes = manifest.nodes
+    if not nodes:
+        return 0
+    step = max(len(nodes) // SIZE_SAMPLE, 1)
+    sample = nodes[::step]
+    per_node = sum(sys.getsizeof(node) + sum(_deep_size(getattr(node, field)) for field in node.__slots__)
+                   for node in sample) / len(sample)
+    total = int(per_node * len(nodes))
+    for adjacency in manifest.graph.adjacency.values():
+        total += memoryview(adjacency.offsets).nbytes + memoryview(adjacency.targets).nbytes
+    for table in manifest.indexes.tables.values():
+        for key, postings in table.items():
+            total += sys.getsizeof(key) + memoryview(postings).nbytes
+    # The unique_id -> node ID map
+    return total + sys.getsizeof(manifest.ids) + len(nodes) * sys.getsizeof(0)
+
+
+class ManifestBuild:
+    """One manifest version being loaded, or loaded, for every session that asks for it"""
+
+    def __init__(self, path: str, mtime: float):
+        self.path = path
+        self.mtime = mtime
+        self.future: "Future[Manifest]" = Future()
+        self.stage = "Queued"
+        self.fraction = 0.0
+        self.size = 0
+        self.elapsed: Optional[float] = None
+        # Holder -> time its claim was last renewed
+        self.holders: Dict[str, float] = {}
+        self.last_used = time.monotonic()
+
+    def report(self, fraction: float, stage: str):
+        self.fraction = fraction
+        self.stage = stage
+
+    @property
+    def ready(self) -> bool:
+        return self.future.done()
+
+    @property
+    def progress(self) -> Tuple[float, str]:
+        return self.fraction, self.stage
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Whether the build finished within ``timeout`` seconds"""
+        return bool(wait([self.future], timeout).done)
+
+    def result(self, timeout: Optional[float] = None) -> Manifest:
+        """The manifest, waiting for the build; raises ``ManifestError`` if it failed"""
+        return self.future.result(timeout)
+
+    def error(self) -> Optional[BaseException]:
+        return self.future.exception() if self.future.done() else None
+
+    def refs(self, now: float, lease: float) -> int:
+        return sum(1 for seen in self.holders.values() if now - seen <= lease)
+
+    def as_row(self, now: float, lease: float) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "stage": self.stage,
+            "progress": round(self.fraction, 2),
+            "sessions": self.refs(now, lease),
+            "size_mb": round(self.size / (1 << 20), 1),
+            "build_s": round(self.elapsed, 2) if self.elapsed is not None else None,
+        }
+
+
+class ManifestRegistry:
+    """Reference-counted manifests built on a thread pool and evicted by size, safe to share between threads"""
+
+    def __init__(self, cache: Optional[IndexCache] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 workers: int = DEFAULT_WORKERS, lease: float = DEFAULT_LEASE):
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.lease = lease
+        self.builds: "OrderedDict[Tuple[str, float], ManifestBuild]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="manifest-build")
+        self._lock = threading.Lock()
+
+    def attach(self, path: str, holder: str) -> ManifestBuild:
+        """The build of the manifest at ``path``, started if needed, held by ``holder``"""
+        path = os.path.abspath(path)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError as e:
+            raise ManifestError(f"Could not read manifest {path}: {e}") from e
+        key = (path, mtime)
+        now = time.monotonic()
+        with self._lock:
+            for other_key, other in self.builds.items():
+                if other_key != key:
+                    other.holders.pop(holder, None)
+            build = self.builds.get(key)
+            if build is None or (build.ready and build.error() is not None):
+                # A failed build is retried by the next session that asks
+                self.misses += 1
+                build = self.builds[key] = ManifestBuild(path, mtime)
+                self._pool.submit(self._build, build)
+            else:
+                self.hits += 1
+            self.builds.move_to_end(key)
+            build.holders[holder] = now
+            build.last_used = now
+        return build
+
+    def release(self, holder: str):
+        """Drop ``holder``'s claim on any manifest"""
+        with self._lock:
+            for build in self.builds.values():
+                build.holders.pop(holder, None)
+
+    def _build(self, build: ManifestBuild):
+        start = time.perf_counter()
+        try:
+            if self.cache is not None:
+                manifest = self.cache.load_manifest(build.path, build.report)
+            else:
+                from .ingest import load_manifest
+                manifest = load_manifest(build.path, progress=build.report)
+            # Tries are built lazily otherwise, on some session's first path: or fqn: preview
+            build.report(1.0, "Building path and fqn indexes")
+            manifest.indexes.path
+            manifest.indexes.fqn
+            build.size = estimate_bytes(manifest)
+        except ManifestError as e:
+            build.report(1.0, "Failed")
+            build.elapsed = time.perf_counter() - start
+            build.future.set_exception(e)
+            return
+        except BaseException as e:
+            build.report(1.0, "Failed")
+            build.elapsed = time.perf_counter() - start
+            build.future.set_exception(ManifestError(f"Could not load manifest {build.path}: {e}"))
+            return
+        build.report(1.0, "Ready")
+        build.elapsed = time.perf_counter() - start
+        build.future.set_result(manifest)
+        self.evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(build.size for build in self.builds.values())
+
+    def evict(self):
+        """Drop unheld manifests, least recently used first, until the rest fit in ``max_bytes``"""
+        now = time.monotonic()
+        with self._lock:
+            total = self.total_bytes
+            for key, build in list(self.builds.items()):
+                if total <= self.max_bytes:
+                    break
+                if build.ready and not build.refs(now, self.lease):
+                    del self.builds[key]
+                    total -= build.size
+                    self.evictions += 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [build.as_row(now, self.lease) for build in self.builds.values()]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
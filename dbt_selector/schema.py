@@ -0,0 +1,243 @@
+"""Declarative schema for selectors.yml entries, compiled once into validator closures
+
+A schema is a dict with a ``type`` and type-specific keys. ``compile_schema``
+turns it into a function ``check(value, where, context)`` that appends
+``"<where>: <problem>"`` strings to ``context.errors``, so a whole document is
+checked in a single walk without re-inspecting the schema per node.
+
+Types:
+
+- ``string``: ``enum``, ``pattern`` (a compiled regex), ``min_length``
+- ``boolean``; ``integer``: ``minimum``; ``scalar``: a non-empty string or number
+- ``list``: ``items``, ``min_items``
+- ``object``: ``properties``, ``required``, ``on_match`` (called with the object);
+  properties may set ``missing`` (message when required and absent) and ``nullable``
+- ``definition``: a selector definition, dispatched on its form: a string is
+  parsed by ``string`` and re-checked, a mapping goes to the schema of the first
+  of its ``keys`` present, and a one-key ``{method: value}`` mapping to ``method``
+- ``ref``: a named schema from ``definitions``, resolved lazily for recursion
+"""
+import re
+from typing import Any, Callable, Dict, List
+
+from .exceptions import SelectorError
+from .parser import DEFAULT_INDIRECT_SELECTION, INDIRECT_SELECTION_MODES, METHODS, _parse_cached
+
+Check = Callable[[Any, str, "Context"], None]
+_NUMBERS = (int, float)
+
+
+class Context:
+    """Problems and ``selector:`` references collected during one walk"""
+
+    __slots__ = ("errors", "references")
+
+    def __init__(self):
+        self.errors: List[str] = []
+        self.references: List[str] = []
+
+
+def compile_schema(schema: Dict[str, Any], definitions: Dict[str, Dict[str, Any]]) -> Check:
+    """A validator for ``schema``; ``ref`` entries name schemas in ``definitions``"""
+    compiled: Dict[str, Check] = {}
+
+    def resolve(name: str) -> Check:
+        if name not in compiled:
+            # Placeholder first, so recursive references compile to a lookup
+            compiled[name] = lambda value, where, context: compiled[name](value, where, context)
+            compiled[name] = build(definitions[name], name)
+        return compiled[name]
+
+    def build(node: Dict[str, Any], key: str) -> Check:
+        kind = node["type"]
+        message = node.get("message")
+        if kind == "ref":
+            name = node["name"]
+            return lambda value, where, context: resolve(name)(value, where, context)
+        if kind == "string":
+            return _string(node, key, message)
+        if kind == "boolean":
+            message = message or f"'{key}' must be true or false"
+
+            def check_boolean(value, where, context):
+                if type(value) is not bool:
+                    context.errors.append(f"{where}: {message}")
+            return check_boolean
+        if kind == "integer":
+            minimum = node.get("minimum")
+            message = message or f"{key} must be a positive integer"
+
+            def check_integer(value, where, context):
+                if type(value) is not int or (minimum is not None and value < minimum):
+                    context.errors.append(f"{where}: {message}, got {value!r}")
+            return check_integer
+        if kind == "scalar":
+            message = message or f"'{key}' must be a non-empty string or number"
+
+            def check_scalar(value, where, context):
+                if value == "" or type(value) is bool or not isinstance(value, (str,) + _NUMBERS):
+                    context.errors.append(f"{where}: {message}")
+            return check_scalar
+        if kind == "list":
+            return _list(node, key, message, build(node["items"], key))
+        if kind == "object":
+            properties = {name: build(sub, name) for name, sub in node.get("properties", {}).items()}
+            return _object(node, properties)
+        if kind == "definition":
+            keyed = tuple((name, build(sub, name)) for name, sub in node["keys"])
+            return _definition(node, keyed)
+        raise ValueError(f"Unknown schema type '{kind}'")
+
+    return build(schema, "")
+
+
+def _string(node: Dict[str, Any], key: str, message: str) -> Check:
+    enum = frozenset(node["enum"]) if "enum" in node else None
+    pattern = node.get("pattern")
+    min_length = node.get("min_length", 0)
+    # ``message`` may refer to the offending value as ``{value}``
+    wrong_type = message or f"'{key}' must be a string"
+    wrong_value = message or f"invalid {key} '{{value}}'"
+
+    def check_string(value, where, context):
+        if type(value) is not str or len(value) < min_length:
+            context.errors.append(f"{where}: " + wrong_type.format(value=value))
+        elif (enum is not None and value not in enum) or (pattern is not None and not pattern.match(value)):
+            context.errors.append(f"{where}: " + wrong_value.format(value=value))
+    return check_string
+
+
+def _list(node: Dict[str, Any], key: str, message: str, check_item: Check) -> Check:
+    min_items = node.get("min_items", 0)
+    message = message or f"'{key}' must be a non-empty list"
+
+    def check_list(value, where, context):
+        if type(value) is not list or len(value) < min_items:
+            context.errors.append(f"{where}: {message}")
+            return
+        for i, item in enumerate(value):
+            check_item(item, f"{where}.{key}[{i}]", context)
+    return check_list
+
+
+def _object(node: Dict[str, Any], properties: Dict[str, Check]) -> Check:
+    required = tuple(node.get("required", ()))
+    on_match = node.get("on_match")
+    nullable = frozenset(name for name, sub in node.get("properties", {}).items() if sub.get("nullable"))
+    missing = {name: sub.get("missing", f"missing '{name}'") for name, sub in node.get("properties", {}).items()}
+
+    def check_object(value, where, context):
+        if type(value) is not dict:
+            context.errors.append(f"{where}: expected a mapping, got {value!r}")
+            return
+        for name in required:
+            if name not in value:
+                context.errors.append(f"{where}: {missing[name]}")
+        for name, item in value.items():
+            check = properties.get(name)
+            if check is not None and not (item is None and name in nullable):
+                check(item, where, context)
+        if on_match is not None:
+            on_match(value, context)
+    return check_object
+
+
+def _definition(node: Dict[str, Any], keyed) -> Check:
+    parse = node["string"]
+    fallback = node.get("message", "expected a method, union or intersection")
+    check_method = dict(keyed)["method"]
+    reserved = frozenset(name for name, _ in keyed) | {"exclude"}
+
+    def check_definition(value, where, context):
+        if type(value) is str:
+            try:
+                value = parse(value)
+            except SelectorError as e:
+                context.errors.append(f"{where}: {e}")
+                return
+        if type(value) is not dict or not value:
+            context.errors.append(f"{where}: Invalid selector definition: {value!r}")
+            return
+        for name, check in keyed:
+            if name in value:
+                check(value, where, context)
+                return
+        if len(value) == 1 and next(iter(value)) not in reserved:
+            # ``{tag: nightly}`` shorthand: the key is the method
+            (method, item), = value.items()
+            check_method({"method": method, "value": item}, where, context)
+        else:
+            context.errors.append(f"{where}: {fallback}")
+    return check_definition
+
+
+def _collect_reference(criterion: Dict[str, Any], context: Context):
+    if criterion.get("method") == "selector":
+        context.references.append(str(criterion.get("value", "")))
+
+
+METHOD_PATTERN = re.compile(r"(?:%s)(?:\.[^.]+)*\Z" % "|".join(map(re.escape, METHODS)))
+EXCLUDE = {"type": "list", "min_items": 1, "items": {"type": "ref", "name": "item"}}
+SET_ITEMS = {"type": "list", "min_items": 1, "items": {"type": "ref", "name": "item"}}
+METHOD_CRITERION = {
+    "type": "object",
+    "required": ["method", "value"],
+    "properties": {
+        "method": {"type": "string", "pattern": METHOD_PATTERN, "message": "unknown selector method '{value}'",
+                   "missing": "expected a method"},
+        "value": {"type": "scalar", "message": "a method criterion needs a value",
+                  "missing": "a method criterion needs a value"},
+        "children": {"type": "boolean"},
+        "parents": {"type": "boolean"},
+        "childrens_parents": {"type": "boolean"},
+        "children_depth": {"type": "integer", "minimum": 1, "nullable": True},
+        "parents_depth": {"type": "integer", "minimum": 1, "nullable": True},
+        "indirect_selection": {"type": "string", "enum": INDIRECT_SELECTION_MODES,
+                               "message": "invalid indirect_selection '{value}'"},
+        "exclude": EXCLUDE,
+    },
+    "on_match": _collect_reference,
+}
+
+
+def _set_criterion(operator: str) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            operator: SET_ITEMS,
+            "indirect_selection": METHOD_CRITERION["properties"]["indirect_selection"],
+            "exclude": EXCLUDE,
+        },
+    }
+
+
+def _parse_definition(text: str) -> Dict[str, Any]:
+    # The cached parse is shared, so the result is only read, never modified
+    return _parse_cached(text.strip(), DEFAULT_INDIRECT_SELECTION)
+
+
+def _definition_schema(*extra_keys) -> Dict[str, Any]:
+    return {
+        "type": "definition",
+        "string": _parse_definition,
+        "keys": (("method", METHOD_CRITERION), ("union", _set_criterion("union")),
+                 ("intersection", _set_criterion("intersection"))) + extra_keys,
+    }
+
+
+DEFINITIONS = {
+    "definition": _definition_schema(),
+    # Inside union, intersection and exclude lists, ``{exclude: [...]}`` alone is an item too
+    "item": _definition_schema(("exclude", {"type": "object", "properties": {"exclude": EXCLUDE}})),
+}
+SELECTOR_SCHEMA = {
+    "type": "object",
+    "required": ["definition"],
+    "properties": {
+        "description": {"type": "string"},
+        "default": {"type": "boolean"},
+        "definition": {"type": "ref", "name": "definition"},
+    },
+}
+
+check_selector = compile_schema(SELECTOR_SCHEMA, DEFINITIONS)
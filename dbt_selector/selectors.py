@@ -0,0 +1,175 @@
+"""The selectors.yml document: criterion and selector model, YAML emitter and validation
+
+Documents are read and written with libyaml's C loader and dumper when PyYAML
+was built with it. Each selector's YAML is cached by a hash of its content, so
+re-emitting a long list after one edit only renders the selector that changed.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from .exceptions import SelectorError
+from .parser import DEFAULT_INDIRECT_SELECTION
+from .schema import Context, check_selector
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+FRAGMENT_CACHE_SIZE = 8192
+
+
+def method_criterion(method: str, value: str, children: bool = False,
+                     children_depth: Optional[int] = None, parents: bool = False,
+                     parents_depth: Optional[int] = None, childrens_parents: bool = False,
+                     indirect_selection: str = DEFAULT_INDIRECT_SELECTION) -> Dict[str, Any]:
+    """A single-method criterion, with keys in the order dbt documents them"""
+    criterion: Dict[str, Any] = {"method": method, "value": value}
+    if children:
+        criterion["children"] = True
+        if children_depth is not None:
+            criterion["children_depth"] = children_depth
+    if parents:
+        criterion["parents"] = True
+        if parents_depth is not None:
+            criterion["parents_depth"] = parents_depth
+    if childrens_parents:
+        criterion["childrens_parents"] = True
+    criterion["indirect_selection"] = indirect_selection
+    return criterion
+
+
+def make_selector(name: str, definition: Any, description: str = "",
+                  default: bool = False) -> Dict[str, Any]:
+    """One entry of the ``selectors`` list"""
+    return {"name": name, "description": description, "default": default, "definition": definition}
+
+
+def structural_hash(selector: Dict[str, Any]) -> bytes:
+    """Digest of a selector's content; key order counts, since it is kept in the output"""
+    text = json.dumps(selector, ensure_ascii=False, separators=(",", ":"), default=repr)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class FragmentCache:
+    """LRU of rendered selector YAML by structural hash, safe to share between threads"""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[bytes, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def render(self, selector: Dict[str, Any]) -> str:
+        """``selector`` as a ``- name: ...`` block list item"""
+        key = structural_hash(selector)
+        with self._lock:
+            fragment = self.entries.get(key)
+            if fragment is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+        # A one-item list renders exactly as the item does under the top-level key
+        fragment = yaml.dump([selector], Dumper=SafeDumper, sort_keys=False, default_flow_style=False)
+        with self._lock:
+            self.entries[key] = fragment
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return fragment
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+_fragments = FragmentCache()
+
+
+def fragment_cache() -> FragmentCache:
+    """The cache ``dump_selectors`` uses when none is given"""
+    return _fragments
+
+
+def dump_selectors(selectors: List[Dict[str, Any]], cache: Optional[FragmentCache] = None) -> str:
+    """A selectors.yml document for a list of selectors, re-rendering only uncached ones"""
+    if not selectors:
+        return yaml.dump({"selectors": []}, Dumper=SafeDumper, default_flow_style=False)
+    if cache is None:
+        cache = _fragments
+    return "selectors:\n" + "".join(cache.render(selector) for selector in selectors)
+
+
+def load_selectors_yaml(text: str) -> List[Dict[str, Any]]:
+    """The ``selectors`` list from a selectors.yml document"""
+    try:
+        data = yaml.load(text, Loader=SafeLoader)
+    except yaml.YAMLError as e:
+        raise SelectorError(f"Invalid YAML: {e}") from e
+    if not isinstance(data, dict) or not isinstance(data.get("selectors"), list):
+        raise SelectorError("Expected a top-level 'selectors' list")
+    for selector in data["selectors"]:
+        if not isinstance(selector, dict) or "name" not in selector or "definition" not in selector:
+            raise SelectorError(f"Every selector needs a name and a definition: {selector!r}")
+    return data["selectors"]
+
+
+def import_selectors_yaml(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Load a selectors.yml document and validate it; returns the selectors and their problems"""
+    selectors = load_selectors_yaml(text)
+    return selectors, validate_selectors(selectors)
+
+
+def _cycles(graph: Dict[str, List[str]]) -> List[List[str]]:
+    cycles, state = [], {}
+
+    def visit(name: str, path: List[str]):
+        state[name] = "visiting"
+        for ref in graph.get(name, ()):
+            if state.get(ref) == "visiting":
+                cycles.append(path[path.index(ref):] + [ref])
+            elif ref in graph and ref not in state:
+                visit(ref, path + [ref])
+        state[name] = "done"
+
+    for name in graph:
+        if name not in state:
+            visit(name, [name])
+    return cycles
+
+
+def validate_selectors(selectors: List[Dict[str, Any]]) -> List[str]:
+    """Problems dbt would reject a selectors list for; empty when it is valid"""
+    errors: List[str] = []
+    names = set()
+    references: Dict[str, List[str]] = {}
+    defaults = 0
+    for i, selector in enumerate(selectors):
+        if not isinstance(selector, dict):
+            errors.append(f"selectors[{i}]: expected a mapping")
+            continue
+        name = selector.get("name")
+        if not isinstance(name, str) or not name:
+            errors.append(f"selectors[{i}]: 'name' must be a non-empty string")
+            continue
+        if name in names:
+            errors.append(f"{name}: duplicate selector name")
+        names.add(name)
+        context = Context()
+        check_selector(selector, name, context)
+        errors.extend(context.errors)
+        references.setdefault(name, []).extend(context.references)
+        if selector.get("default") is True:
+            defaults += 1
+
+    if defaults > 1:
+        errors.append("Only one selector can set 'default: true'")
+    for name, refs in references.items():
+        for ref in refs:
+            if ref not in references:
+                errors.append(f"{name}: references unknown selector '{ref}'")
+    for cycle in _cycles(references):
+        errors.append(f"Circular selector reference: {' -> '.join(cycle)}")
+    return errors
@@ -0,0 +1,163 @@
+"""Differences between two manifests, for the ``state`` method and incremental re-evaluation
+
+A ``ManifestDiff`` compares an old manifest (a ``--state`` baseline, or the
+previous version of the same project) with a new one by unique_id. It records
+which nodes were added, removed, or changed in body, config or edges, and maps
+integer node IDs from the old manifest to the new one.
+"""
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .evaluate import MethodHandler
+from .exceptions import SelectorError
+from .graph import CHILDREN, PARENTS
+from .manifest import Manifest, Node
+
+# Node fields that feed the method indexes; checksum only matters to state:modified.body
+INDEXED_FIELDS = tuple(field for field in Node.__slots__ if field not in ("unique_id", "checksum"))
+_indexed_fields = attrgetter(*INDEXED_FIELDS)
+# Config keys that decide where a node is built
+RELATION_KEYS = ("database", "schema", "alias")
+STATE_VALUES = (
+    "new", "old", "modified", "unmodified",
+    "modified.body", "modified.configs", "modified.relation", "modified.contract",
+)
+
+
+class ManifestDiff:
+    """Node-level differences from ``old`` to ``new``; sets hold new-manifest IDs unless noted"""
+
+    def __init__(self, old: Manifest, new: Manifest):
+        self.old = old
+        self.new = new
+        # old ID -> new ID, or -1 when the node was removed
+        self.old_to_new: List[int] = [new.ids.get(node.unique_id, -1) for node in old.nodes]
+        self.same_ids = len(old) == len(new) and self.old_to_new == list(range(len(new)))
+        self.removed: Set[int] = {i for i, j in enumerate(self.old_to_new) if j < 0}  # old IDs
+        matched = {j for j in self.old_to_new if j >= 0}
+        self.added: Set[int] = set(range(len(new))) - matched
+        self.modified_body: Set[int] = set()
+        self.modified_configs: Set[int] = set()
+        self.modified_relation: Set[int] = set()
+        self.modified_contract: Set[int] = set()
+        # Nodes whose index entries differ
+        self.attributes_changed: Set[int] = set()
+        for i, j in enumerate(self.old_to_new):
+            if j < 0:
+                continue
+            before, after = old.nodes[i], new.nodes[j]
+            if before.checksum != after.checksum:
+                self.modified_body.add(j)
+            if before.config is not after.config and before.config != after.config:
+                self.modified_configs.add(j)
+                if any(before.config.get(k) != after.config.get(k) for k in RELATION_KEYS):
+                    self.modified_relation.add(j)
+                if before.config.get("contract") != after.config.get("contract"):
+                    self.modified_contract.add(j)
+            if _indexed_fields(before) != _indexed_fields(after):
+                self.attributes_changed.add(j)
+        self.edges_changed = self._edges_changed()
+        # New-manifest nodes whose selection inputs may differ
+        self.dirty: Set[int] = self.added | self.attributes_changed | self.edges_changed
+
+    def _edges_changed(self) -> Set[int]:
+        # A node counts as changed when its parent or child set differs by unique_id
+        changed = set(self.added)
+        old_graph, new_graph = self.old.graph.adjacency, self.new.graph.adjacency
+        for direction in (PARENTS, CHILDREN):
+            before, after = old_graph[direction], new_graph[direction]
+            if self.same_ids and _same_buffer(before.offsets, after.offsets) and \
+                    _same_buffer(before.targets, after.targets):
+                continue
+            for i, j in enumerate(self.old_to_new):
+                if j < 0 or j in changed:
+                    continue
+                neighbours = before[i]
+                if self.same_ids and neighbours == after[j]:
+                    continue
+                if len(neighbours) != after.degree(j) or \
+                        {self.old_to_new[k] for k in neighbours} != set(after[j]):
+                    changed.add(j)
+        return changed
+
+    @property
+    def modified(self) -> Set[int]:
+        return (self.added | self.modified_body | self.modified_configs
+                | self.modified_relation | self.modified_contract)
+
+    def is_empty(self) -> bool:
+        return not (self.removed or self.dirty or self.modified_body)
+
+    def map_ids(self, old_ids: Iterable[int]) -> Set[int]:
+        """Old-manifest IDs as new-manifest IDs, dropping removed nodes"""
+        if self.same_ids:
+            return set(old_ids)
+        old_to_new = self.old_to_new
+        return {old_to_new[i] for i in old_ids if old_to_new[i] >= 0}
+
+    def region_changed(self, old_ids: Iterable[int], mapped: Set[int]) -> bool:
+        """Whether graph expansion over ``mapped`` (and its direct children) may differ
+
+        Expansion and indirect test selection only read the adjacency of the
+        nodes they reach and of those nodes' children, so a result can be
+        carried over when none of them was added, removed or rewired.
+        """
+        if self.removed and any(self.old_to_new[i] < 0 for i in old_ids):
+            return True
+        dirty = self.dirty
+        if len(dirty) < len(mapped):
+            # Few changes: a dirty node matters if it or one of its parents is in the region
+            parents = self.new.graph.adjacency[PARENTS]
+            return any(j in mapped or any(p in mapped for p in parents[j]) for j in dirty)
+        children = self.new.graph.adjacency[CHILDREN]
+        return any(j in dirty or any(c in dirty for c in children[j]) for j in mapped)
+
+    def select(self, value: str) -> Set[int]:
+        """Nodes matched by ``state:<value>``"""
+        if value == "new":
+            return set(self.added)
+        if value == "old":
+            return set(range(len(self.new))) - self.added
+        if value == "modified":
+            return self.modified
+        if value == "unmodified":
+            return set(range(len(self.new))) - self.modified
+        if value == "modified.body":
+            return set(self.modified_body)
+        if value == "modified.configs":
+            return set(self.modified_configs)
+        if value == "modified.relation":
+            return set(self.modified_relation)
+        if value == "modified.contract":
+            return set(self.modified_contract)
+        raise SelectorError(f"state:{value} is not supported for previews; use one of {', '.join(STATE_VALUES)}")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "modified.body": len(self.modified_body),
+            "modified.configs": len(self.modified_configs),
+            "edges_changed": len(self.edges_changed - self.added),
+        }
+
+
+def _same_buffer(a: Any, b: Any) -> bool:
+    return memoryview(a).nbytes == memoryview(b).nbytes and memoryview(a).tobytes() == memoryview(b).tobytes()
+
+
+def state_method(state: Optional[Manifest], manifest: Manifest) -> MethodHandler:
+    """A ``state`` method handler comparing ``manifest`` against a state manifest
+
+    The diff is only computed once a ``state:`` criterion is evaluated.
+    """
+    diffs: List[ManifestDiff] = []
+
+    def select(value: str, args: List[str]) -> Set[int]:
+        if state is None:
+            raise SelectorError("The state method needs a state manifest to compare against")
+        if not diffs:
+            diffs.append(ManifestDiff(state, manifest))
+        return diffs[0].select(value)
+
+    return select
@@ -0,0 +1,304 @@
+"""Typeahead suggestions for selector values, from the values present in a manifest
+
+Each method's candidate values (tags, paths and their directories, dotted fqn
+prefixes, packages, groups, exposure and metric names, ...) are collected with
+the number of nodes each selects. A ``CompletionIndex`` answers a query in two
+steps:
+
+* prefix matches: the case-folded values are kept sorted, so the values
+  starting with the query are one contiguous range found by bisection (a
+  flattened prefix trie); the range's best-ranked values are taken
+* fuzzy matches, when fewer than ``k`` values start with the query: a trigram
+  index finds values sharing most of the query's trigrams, so ``stagnig``
+  still suggests ``staging``
+
+Values are ranked by node count, then length. Indexes are built per method on
+first use, the trigram index on the first fuzzy query, and result lists are
+kept in an LRU per ``(method, query)``. On a large manifest the first query of
+a method takes seconds, so ``Suggester.start_warming`` builds every index on a
+background thread ahead of the first keystroke, and ``ready`` tells whether a
+method's queries will be answered from built indexes.
+"""
+import heapq
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+from difflib import get_close_matches
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .artifacts import RESULT_VALUES, SOURCE_STATUS_VALUES
+from .exceptions import SelectorError
+from .indexes import EMPTY, GLOB_KEYED_METHODS, NAMED_METHODS, flat_fqn, split_path
+from .manifest import Manifest
+from .state import STATE_VALUES
+
+DEFAULT_SUGGESTIONS = 10
+SUGGESTION_CACHE_SIZE = 4096
+# Share of a query's trigrams a fuzzy match must contain
+MIN_TRIGRAM_SHARE = 0.5
+# Up to this many values of a depth are compared with difflib rather than by trigrams
+SMALL_VOCABULARY = 128
+MIN_SIMILARITY = 0.6
+# Fuzzy matching reads trigram lists up to this long, and verifies this many candidates
+MAX_CANDIDATE_POSTINGS = 5000
+MAX_CANDIDATES = 256
+# Prefix ranges wider than this share of the values are walked in rank order instead
+WIDE_RANGE = 1 / 16
+# Methods whose values are a fixed vocabulary rather than manifest contents
+FIXED_VALUES = {
+    "state": STATE_VALUES,
+    "result": RESULT_VALUES,
+    "source_status": SOURCE_STATUS_VALUES,
+    "version": ("latest", "prerelease", "old", "none"),
+}
+# Segment separators of hierarchical values
+SEPARATORS = {"path": "/", "fqn": ".", "source": "."}
+SUGGEST_METHODS = GLOB_KEYED_METHODS + ("path", "fqn", "source") + tuple(NAMED_METHODS) + tuple(FIXED_VALUES)
+# Warmed first: the methods most values are typed for
+WARM_FIRST = ("tag", "path", "fqn", "package")
+
+
+def trigrams(text: str) -> List[str]:
+    # Padded so short values and value starts get trigrams of their own
+    padded = f"  {text}"
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+class CompletionIndex:
+    """One method's candidate values, searchable by prefix and by trigrams
+
+    With a ``separator`` (``/`` for paths, ``.`` for fqns) fuzzy matching only
+    compares values with as many segments as the query, so a typo in
+    ``models/stagng`` is matched against directories, not every file path.
+    """
+
+    def __init__(self, counts: Dict[str, int], separator: str = ""):
+        self.values = sorted(counts, key=lambda value: (value.lower(), value))
+        self.folded = [value.lower() for value in self.values]
+        self.counts = array("i", (counts[value] for value in self.values))
+        self.separator = separator
+        # Positions by rank: most nodes first, then shortest
+        self.ranked = array("i", sorted(range(len(self.values)), key=self._rank))
+        # Positions by segment count, and their trigram postings built on first use
+        self.depths: Dict[int, array] = defaultdict(lambda: array("i"))
+        for i, value in enumerate(self.folded):
+            self.depths[self._depth(value)].append(i)
+        self._grams: Dict[int, Dict[str, array]] = {}
+        self.grams_built = False
+
+    def _rank(self, i: int) -> Tuple[int, int, str]:
+        return -self.counts[i], len(self.values[i]), self.values[i]
+
+    def _depth(self, value: str) -> int:
+        return value.count(self.separator) if self.separator else 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def prefix(self, query: str, k: int) -> List[int]:
+        """Positions of the best ``k`` values starting with ``query``, ignoring case"""
+        query = query.lower()
+        lo = bisect_left(self.folded, query)
+        hi = bisect_left(self.folded, query + "\U0010ffff", lo)
+        if hi - lo <= k:
+            return sorted(range(lo, hi), key=self._rank)
+        if hi - lo > len(self.values) * WIDE_RANGE:
+            # A broad prefix: the first k ranked values inside the range come quickly
+            found = []
+            for i in self.ranked:
+                if lo <= i < hi:
+                    found.append(i)
+                    if len(found) == k:
+                        break
+            return found
+        return heapq.nsmallest(k, range(lo, hi), key=self._rank)
+
+    def grams(self, depth: int) -> Dict[str, array]:
+        """Trigram postings of the values with ``depth`` separators"""
+        index = self._grams.get(depth)
+        if index is None:
+            postings: Dict[str, List[int]] = defaultdict(list)
+            for i in self.depths.get(depth, EMPTY):
+                for gram in trigrams(self.folded[i]):
+                    postings[gram].append(i)
+            index = self._grams[depth] = {gram: array("i", ids) for gram, ids in postings.items()}
+        return index
+
+    def build_grams(self):
+        """Build the trigram postings of every depth fuzzy queries compare by trigrams"""
+        for depth, positions in list(self.depths.items()):
+            if len(positions) > SMALL_VOCABULARY:
+                self.grams(depth)
+        self.grams_built = True
+
+    def fuzzy(self, query: str, k: int, skip: Sequence[int] = ()) -> List[int]:
+        """Positions of the ``k`` values most similar to ``query``"""
+        query = query.lower()
+        if not query:
+            return []
+        depth, skipped = self._depth(query), set(skip)
+        positions = self.depths.get(depth, EMPTY)
+        if len(positions) <= SMALL_VOCABULARY:
+            # Few values: compare each directly, which also catches transposed characters
+            folded = {self.folded[i]: i for i in positions if i not in skipped}
+            return [folded[value] for value in get_close_matches(query, list(folded), k, MIN_SIMILARITY)]
+        grams = trigrams(query)
+        index = self.grams(depth)
+        lists = sorted((index.get(gram, EMPTY) for gram in grams), key=len)
+        needed = max(1, int(len(grams) * MIN_TRIGRAM_SHARE + 0.5))
+        # A value holding `needed` of the trigrams is in one of the rarest len - needed + 1
+        # lists; trigrams common to most values add candidates but little signal
+        rare = [postings for postings in lists[:len(lists) - needed + 1]
+                if len(postings) <= MAX_CANDIDATE_POSTINGS] or lists[:1]
+        candidates: Counter = Counter()
+        for postings in rare:
+            candidates.update(postings)
+        wanted = set(grams)
+        scored = []
+        for i, _ in candidates.most_common(MAX_CANDIDATES):
+            if i in skipped:
+                continue
+            value_grams = trigrams(self.folded[i])
+            shared = len(wanted.intersection(value_grams))
+            if shared >= needed:
+                scored.append((-shared / (len(wanted) + len(value_grams) - shared), *self._rank(i), i))
+        return [entry[-1] for entry in heapq.nsmallest(k, scored)]
+
+    def suggest(self, query: str, k: int) -> List[str]:
+        found = self.prefix(query, k)
+        if len(found) < k:
+            found += self.fuzzy(query, k - len(found), found)
+        return [self.values[i] for i in found]
+
+
+def _candidates(manifest: Manifest, method: str) -> Dict[str, int]:
+    """Values ``method`` can select in ``manifest``, with the nodes each one selects"""
+    indexes = manifest.indexes
+    if method in FIXED_VALUES:
+        return {value: 0 for value in FIXED_VALUES[method]}
+    if method in GLOB_KEYED_METHODS:
+        return {key: len(ids) for key, ids in indexes.tables[method].items()}
+    if method in NAMED_METHODS:
+        return {key: len(ids) for key, ids in indexes.named[method].items()}
+    counts: Counter = Counter()
+    if method == "path":
+        # A directory selects every node beneath it
+        for node in manifest.nodes:
+            parts = split_path(node.path) if node.path else []
+            for end in range(1, len(parts) + 1):
+                counts["/".join(parts[:end])] += 1
+    elif method == "fqn":
+        for node in manifest.nodes:
+            parts = flat_fqn(node.fqn) if node.fqn else []
+            for end in range(1, len(parts) + 1):
+                counts[".".join(parts[:end])] += 1
+    elif method == "source":
+        for i in indexes.resource_type.get("source", EMPTY):
+            node = manifest.nodes[i]
+            counts[node.source_name] += 1
+            counts[f"{node.source_name}.{node.name}"] += 1
+    else:
+        raise SelectorError(f"No suggestions for the '{method}' method")
+    return dict(counts)
+
+
+class Suggester:
+    """Ranked value suggestions per selector method for one manifest, safe to share between threads"""
+
+    def __init__(self, manifest: Manifest, cache_size: int = SUGGESTION_CACHE_SIZE):
+        # A weak reference, so the shared suggester does not keep its manifest alive
+        self._manifest = weakref.ref(manifest)
+        self.cache_size = cache_size
+        self.indexes: Dict[str, CompletionIndex] = {}
+        self.entries: "OrderedDict[Tuple[str, str, int], List[str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._warming: Optional[threading.Thread] = None
+
+    @property
+    def manifest(self) -> Manifest:
+        manifest = self._manifest()
+        if manifest is None:
+            raise SelectorError("The manifest behind these suggestions is no longer loaded")
+        return manifest
+
+    def index(self, method: str) -> CompletionIndex:
+        index = self.indexes.get(method)
+        if index is None:
+            index = CompletionIndex(_candidates(self.manifest, method), SEPARATORS.get(method, ""))
+            with self._lock:
+                index = self.indexes.setdefault(method, index)
+        return index
+
+    def warm(self, methods: Iterable[str] = SUGGEST_METHODS):
+        """Build the completion and trigram indexes of ``methods`` ahead of their first query"""
+        first = [method for method in WARM_FIRST if method in methods]
+        for method in first + [method for method in methods if method not in first]:
+            if method in SUGGEST_METHODS:
+                self.index(method).build_grams()
+
+    def start_warming(self) -> threading.Thread:
+        """Warm every method's indexes on a background thread, once"""
+        with self._lock:
+            if self._warming is None:
+                self._warming = threading.Thread(target=self._warm_quietly, name="suggest-warm", daemon=True)
+                self._warming.start()
+            return self._warming
+
+    def _warm_quietly(self):
+        try:
+            self.warm()
+        except SelectorError:
+            # The manifest was unloaded; its suggestions are not needed any more
+            pass
+
+    def ready(self, method: str) -> bool:
+        """Whether queries for ``method`` are answered without building indexes first"""
+        index = self.indexes.get(method)
+        return index is not None and index.grams_built
+
+    def suggest(self, method: str, query: str, k: int = DEFAULT_SUGGESTIONS) -> List[str]:
+        """Up to ``k`` values of ``method`` for a partly typed ``query``, best first"""
+        if method not in SUGGEST_METHODS:
+            return []
+        key = (method, query, k)
+        with self._lock:
+            found = self.entries.get(key)
+            if found is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return list(found)
+            self.misses += 1
+        found = self.index(method).suggest(query, k)
+        with self._lock:
+            self.entries[key] = found
+            while len(self.entries) > self.cache_size:
+                self.entries.popitem(last=False)
+        return list(found)
+
+    def matches(self, method: str, value: str) -> bool:
+        """Whether ``method:value`` selects anything; True for methods without suggestions"""
+        if method not in SUGGEST_METHODS:
+            return True
+        if method in FIXED_VALUES:
+            return value in FIXED_VALUES[method]
+        try:
+            return bool(self.manifest.indexes.select(method, value))
+        except SelectorError:
+            return False
+
+
+_suggesters: "weakref.WeakKeyDictionary[Manifest, Suggester]" = weakref.WeakKeyDictionary()
+_suggesters_lock = threading.Lock()
+
+
+def suggester_for(manifest: Manifest) -> Suggester:
+    """The shared ``Suggester`` of a manifest, created on first use"""
+    with _suggesters_lock:
+        suggester = _suggesters.get(manifest)
+        if suggester is None:
+            suggester = _suggesters[manifest] = Suggester(manifest)
+        return suggester
@@ -0,0 +1,384 @@
+"""Synthesize a short selector definition that selects a given set of nodes
+
+Pasting a list of models into a selector gives one criterion per node, which
+is slow for dbt to resolve and hard to read. ``synthesize`` instead looks for a
+few criteria, taken from the attributes the target nodes share, whose union
+minus a few exclusions is exactly the target:
+
+1. candidate criteria are collected from the target's tags, packages, path
+   directories, ``config.materialized`` values, resource types and groups,
+   ranked by how much of the target they cover and how little else (read
+   from the indexes). The best of them are also tried in intersecting pairs,
+   with ``+`` operators, and ``<node>+`` / ``+<node>`` name the target's
+   roots and leaves. Each is evaluated once and kept as a bitmap (a Python
+   int), so unions and overlaps are integer operations
+2. exclusion candidates come from the nodes the inclusions would select by
+   mistake, keeping only those that exclude no target node
+3. inclusions are picked by lazy greedy set cover over the target, skipping
+   any whose extra nodes cannot be excluded, then exclusions are picked the
+   same way over the extra nodes; a second pass with exact inclusions only
+   is kept if it needs fewer criteria
+4. nodes left over when the time budget runs out are listed one by one
+
+Inclusions get part of the budget, so exclusions are searched for as well.
+
+Every candidate is evaluated with the same engine as previews, so graph
+operators and indirect test selection behave as in the final definition.
+"""
+import heapq
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .evaluate import Evaluator
+from .exceptions import SelectorError
+from .graph import CHILDREN, PARENTS
+from .indexes import split_path
+from .manifest import Manifest, Node
+from .parser import DEFAULT_INDIRECT_SELECTION
+from .selectors import method_criterion
+
+DEFAULT_BUDGET = 2.0
+# Candidate criteria evaluated at most, for the inclusions and for the exclusions
+MAX_CANDIDATES = 2000
+# Criteria also tried with + operators, and imprecise criteria tried in pairs
+GRAPH_VARIANTS = 32
+PAIRED_CRITERIA = 64
+# Share of the time budget spent on inclusions
+INCLUDE_SHARE = 0.6
+
+Leaf = Tuple[str, str, str]  # (method, value, graph operator: "", "children" or "parents")
+Candidate = Tuple[Leaf, ...]  # one leaf, or several intersected
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:  # Python < 3.10
+    def _popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+
+def to_bitmap(node_ids: Iterable[int], size: int) -> int:
+    """A set of node IDs as an int with bit ``i`` set for node ``i``"""
+    buf = bytearray((size + 7) // 8)
+    for i in node_ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def from_bitmap(bits: int) -> Set[int]:
+    ids = set()
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            ids.add(byte_index * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+def node_attributes(node: Node) -> List[Tuple[str, str]]:
+    """The ``(method, value)`` criteria a node is selected by"""
+    found = [("tag", tag) for tag in node.tags]
+    found.append(("package", node.package_name))
+    found.append(("resource_type", node.resource_type))
+    if node.group:
+        found.append(("group", node.group))
+    parts = split_path(node.path) if node.path else []
+    found.extend(("path", "/".join(parts[:end])) for end in range(1, len(parts)))
+    materialized = node.config.get("materialized") if isinstance(node.config, dict) else None
+    if isinstance(materialized, str):
+        found.append(("config.materialized", materialized))
+    return found
+
+
+def node_name(node: Node) -> Tuple[str, str]:
+    """A criterion naming one node"""
+    if node.resource_type == "source":
+        return "source", f"{node.source_name}.{node.name}"
+    return "fqn", ".".join(node.fqn) if node.fqn else node.name
+
+
+class Synthesis:
+    """A synthesized definition and how closely it matches the target"""
+
+    __slots__ = ("definition", "node_ids", "target", "criteria", "exclusions", "elapsed", "timed_out")
+
+    def __init__(self, definition: Dict[str, Any], node_ids: Set[int], target: Set[int],
+                 criteria: int, exclusions: int, elapsed: float, timed_out: bool):
+        self.definition = definition
+        self.node_ids = node_ids
+        self.target = target
+        self.criteria = criteria
+        self.exclusions = exclusions
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+
+    @property
+    def exact(self) -> bool:
+        return self.node_ids == self.target
+
+    @property
+    def missing(self) -> Set[int]:
+        return self.target - self.node_ids
+
+    @property
+    def extra(self) -> Set[int]:
+        return self.node_ids - self.target
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "criteria": self.criteria,
+            "exclusions": self.exclusions,
+            "exact": self.exact,
+            "missing": len(self.missing),
+            "extra": len(self.extra),
+            "time_ms": round(self.elapsed * 1000, 2),
+            "timed_out": self.timed_out,
+        }
+
+
+class Synthesizer:
+    """Searches criteria over one manifest for a target node set"""
+
+    def __init__(self, manifest: Manifest, indirect_selection: str = DEFAULT_INDIRECT_SELECTION,
+                 evaluator: Optional[Evaluator] = None):
+        self.manifest = manifest
+        self.indirect_selection = indirect_selection
+        self.evaluator = evaluator or Evaluator(manifest)
+        self.size = len(manifest)
+        # Bitmaps of single criteria, kept across calls on the same manifest
+        self.bitmaps: Dict[Leaf, int] = {}
+
+    def leaf_criterion(self, leaf: Leaf, indirect_selection: Optional[str] = None) -> Dict[str, Any]:
+        method, value, operator = leaf
+        return method_criterion(method, value, children=operator == "children",
+                                parents=operator == "parents",
+                                indirect_selection=indirect_selection or self.indirect_selection)
+
+    def criterion(self, candidate: Candidate) -> Dict[str, Any]:
+        if len(candidate) == 1:
+            return self.leaf_criterion(candidate[0])
+        return {"intersection": [self.leaf_criterion(leaf) for leaf in candidate]}
+
+    def bitmap(self, leaf: Leaf) -> int:
+        bits = self.bitmaps.get(leaf)
+        if bits is None:
+            try:
+                ids = self.evaluator.evaluate(self.leaf_criterion(leaf))
+            except SelectorError:
+                ids = set()
+            bits = self.bitmaps[leaf] = to_bitmap(ids, self.size)
+        return bits
+
+    def _seeds(self, leaf: Leaf) -> Set[int]:
+        # Nodes a criterion selects before graph operators and tests, read from the indexes
+        method, *args = leaf[0].split(".")
+        try:
+            return self.manifest.indexes.select(method, leaf[1], args)
+        except SelectorError:
+            return set()
+
+    def _leaves(self, node_ids: Iterable[int]) -> List[Leaf]:
+        """Criteria matching any of ``node_ids``, those covering most of them most precisely first"""
+        counts: Counter = Counter()
+        nodes = self.manifest.nodes
+        for i in node_ids:
+            counts.update(node_attributes(nodes[i]))
+        scored = []
+        for (method, value), count in counts.most_common(MAX_CANDIDATES):
+            # count² / size: coverage weighted by the share of the criterion's nodes that are wanted
+            size = len(self._seeds((method, value, "")))
+            if size:
+                scored.append((-count * count / size, method, value))
+        scored.sort()
+        return [(method, value, "") for _, method, value in scored]
+
+    def _region_leaves(self, target: Set[int]) -> List[Leaf]:
+        # Whole upstream or downstream regions of the target, named by one node
+        nodes, adjacency = self.manifest.nodes, self.manifest.graph.adjacency
+        leaves = []
+        for i in sorted(target):
+            if not any(p in target for p in adjacency[PARENTS][i]) and adjacency[CHILDREN].degree(i):
+                leaves.append((*node_name(nodes[i]), "children"))
+            if not any(c in target for c in adjacency[CHILDREN][i]) and adjacency[PARENTS].degree(i):
+                leaves.append((*node_name(nodes[i]), "parents"))
+        return leaves
+
+    def synthesize(self, target: Iterable[int], budget: float = DEFAULT_BUDGET) -> Synthesis:
+        """A definition selecting ``target`` with few criteria, searched for at most ``budget`` seconds"""
+        start = time.perf_counter()
+        # Inclusions may use part of the budget, so the search for exclusions always gets a turn
+        deadline = start + budget * INCLUDE_SHARE
+        target_ids = set(target)
+        if not target_ids:
+            raise SelectorError("No target nodes to synthesize a selector for")
+        goal = to_bitmap(target_ids, self.size)
+        timed_out = False
+
+        include: Dict[Candidate, int] = {}
+
+        def collect(leaves: Iterable[Leaf]) -> bool:
+            # False once the budget is spent or one criterion selects the target exactly
+            nonlocal timed_out
+            for leaf in leaves:
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    return False
+                bits = self.bitmap(leaf)
+                if bits & goal:
+                    include[(leaf,)] = bits
+                    if bits == goal:
+                        return False
+            return True
+
+        def pair() -> bool:
+            # Intersections of two imprecise criteria, kept when more precise than either
+            nonlocal timed_out
+            loose = [c for c in sorted(include, key=lambda c: -_popcount(include[c] & goal))
+                     if len(c) == 1 and include[c] & ~goal][:PAIRED_CRITERIA]
+            for a, first in enumerate(loose):
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    return False
+                for second in loose[a + 1:]:
+                    bits = include[first] & include[second]
+                    if bits & goal and _popcount(bits & ~goal) < min(_popcount(include[first] & ~goal),
+                                                                     _popcount(include[second] & ~goal)):
+                        include[first + second] = bits
+                        if bits == goal:
+                            return False
+            return True
+
+        def variants() -> List[Leaf]:
+            # Graph operators on the attributes covering most of the target
+            ranked = sorted((c for c in include if len(c) == 1 and not c[0][2]),
+                            key=lambda c: -_popcount(include[c] & goal))[:GRAPH_VARIANTS]
+            return [(leaf[0], leaf[1], operator) for (leaf,) in ranked for operator in ("children", "parents")]
+
+        # The best-ranked attributes are paired before the long tail is evaluated
+        leaves = self._leaves(target_ids)
+        found = (collect(leaves[:PAIRED_CRITERIA]) and pair() and collect(leaves[PAIRED_CRITERIA:])
+                 and collect(variants()) and collect(self._region_leaves(target_ids)))
+        if not found and goal in include.values():
+            # One criterion selects the target exactly
+            candidate = next(c for c, bits in include.items() if bits == goal)
+            definition = self.criterion(candidate)
+            return Synthesis(definition, self.evaluator.evaluate(definition), target_ids, 1, 0,
+                             time.perf_counter() - start, timed_out)
+
+        # Extra nodes of the inclusions, and the criteria that can remove them without touching
+        # the target; inclusions selecting more extra nodes than target nodes are not worth fixing
+        size = _popcount(goal)
+        fixable = [bits for bits in include.values() if _popcount(bits & ~goal) <= size]
+        extra = 0
+        for bits in sorted(fixable, key=lambda bits: -_popcount(bits & goal))[:GRAPH_VARIANTS]:
+            extra |= bits & ~goal
+        deadline = start + budget
+        exclude: Dict[Candidate, int] = {}
+        if extra:
+            for leaf in self._leaves(from_bitmap(extra)):
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    break
+                if not self._seeds(leaf).isdisjoint(target_ids):
+                    continue
+                bits = self.bitmap(leaf)
+                if bits & extra and not bits & goal:
+                    exclude[(leaf,)] = bits
+        excludable = 0
+        for bits in exclude.values():
+            excludable |= bits
+
+        best: Optional[Tuple[int, List[Candidate], List[Candidate]]] = None
+        for allow_extra in (True, False):
+            usable = {c: bits for c, bits in include.items()
+                      if not bits & ~goal & ~(excludable if allow_extra else 0)}
+            chosen = _prune(_greedy_cover(goal, usable), usable, goal)
+            selected = 0
+            for candidate in chosen:
+                selected |= usable[candidate]
+            removals = _greedy_cover(selected & ~goal, exclude) if selected & ~goal else []
+            # Target nodes left uncovered cost one criterion each
+            total = len(chosen) + len(removals) + _popcount(goal & ~selected)
+            if best is None or total < best[0]:
+                best = (total, chosen, removals)
+        _, chosen, removals = best
+
+        # Target nodes no shared criterion reaches are named one by one
+        covered = 0
+        for candidate in chosen:
+            covered |= include[candidate]
+        criteria = [self.criterion(candidate) for candidate in chosen]
+        for i in sorted(from_bitmap(goal & ~covered)):
+            criteria.append(self.leaf_criterion((*node_name(self.manifest.nodes[i]), ""), "empty"))
+        exclusions = [self.criterion(candidate) for candidate in removals]
+
+        if len(criteria) == 1 and not exclusions:
+            definition = criteria[0]
+        else:
+            definition = {"union": criteria}
+            if exclusions:
+                definition["exclude"] = exclusions
+        node_ids = self.evaluator.evaluate(definition)
+        return Synthesis(definition, node_ids, target_ids, len(criteria), len(exclusions),
+                         time.perf_counter() - start, timed_out)
+
+
+def _greedy_cover(goal: int, sets: Dict[Candidate, int]) -> List[Candidate]:
+    """Lazy greedy set cover: candidates covering the most of ``goal`` still uncovered
+
+    Ties go to the candidate selecting the fewest nodes outside ``goal``.
+    """
+    heap = [(-_popcount(bits & goal), _popcount(bits & ~goal), candidate) for candidate, bits in sets.items()]
+    heapq.heapify(heap)
+    uncovered = goal
+    chosen = []
+    while uncovered and heap:
+        _, extra, candidate = heapq.heappop(heap)
+        gain = _popcount(sets[candidate] & uncovered)
+        if not gain:
+            continue
+        # Gains only shrink, so a refreshed gain still ahead of the next bound is the best
+        if heap and (-gain, extra) > heap[0][:2]:
+            heapq.heappush(heap, (-gain, extra, candidate))
+            continue
+        chosen.append(candidate)
+        uncovered &= ~sets[candidate]
+    return chosen
+
+
+def _prune(chosen: List[Candidate], sets: Dict[Candidate, int], goal: int) -> List[Candidate]:
+    """Drop picks whose share of ``goal`` the later picks cover anyway"""
+    kept = list(chosen)
+    for candidate in reversed(chosen):
+        rest = 0
+        for other in kept:
+            if other != candidate:
+                rest |= sets[other]
+        if not sets[candidate] & goal & ~rest:
+            kept.remove(candidate)
+    return kept
+
+
+def resolve_nodes(manifest: Manifest, names: Sequence[str]) -> Tuple[Set[int], List[str]]:
+    """Node IDs for unique_ids or node names, and the entries matching neither"""
+    ids: Set[int] = set()
+    unknown = []
+    by_name = manifest.indexes.name
+    for name in names:
+        name = name.strip()
+        if not name:
+            continue
+        if name in manifest.ids:
+            ids.add(manifest.ids[name])
+        elif name in by_name:
+            ids.update(by_name[name])
+        else:
+            unknown.append(name)
+    return ids, unknown
+
+
+def synthesize(manifest: Manifest, target: Iterable[int], budget: float = DEFAULT_BUDGET,
+               indirect_selection: str = DEFAULT_INDIRECT_SELECTION) -> Synthesis:
+    """A short definition selecting exactly ``target``, where one is found within ``budget`` seconds"""
+    return Synthesizer(manifest, indirect_selection).synthesize(target, budget)
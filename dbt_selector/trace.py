@@ -0,0 +1,233 @@
+"""Span timings per app rerun, exportable as JSON or a Chrome trace
+
+A ``Tracer`` records nested, named spans::
+
+    with tracer.span("evaluate", selectors=12):
+        ...
+
+into one ``Trace`` per rerun, keeping the last ``max_runs`` traces. While
+disabled, ``span`` returns a shared no-op context manager, so instrumented
+code pays one attribute check per span.
+
+Each trace also records the process's peak resident memory and, while
+``tracemalloc`` is tracing, the peak of traced allocations during the rerun.
+Allocation tracing is process-wide and slows every thread, so it is switched on
+for the whole process by ``DBT_SELECTOR_TRACE_MEMORY``, never per session.
+``chrome_trace`` writes the Trace Event Format read by chrome://tracing and
+https://ui.perfetto.dev.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_MAX_RUNS = 50
+TRACE_MEMORY_ENV = "DBT_SELECTOR_TRACE_MEMORY"
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water mark of this process's resident memory, where the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def start_memory_tracing() -> bool:
+    """Start ``tracemalloc`` if ``DBT_SELECTOR_TRACE_MEMORY`` asks for it; whether allocations are traced"""
+    if os.environ.get(TRACE_MEMORY_ENV, "").lower() in ("1", "true", "yes") and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+
+def hit_rate(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return hits / total if total else None
+
+
+class Span:
+    """One timed section of a rerun"""
+
+    __slots__ = ("name", "start", "duration", "depth", "thread", "args")
+
+    def __init__(self, name: str, start: float, depth: int, thread: int, args: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.depth = depth
+        self.thread = thread
+        self.args = args
+
+    def as_row(self, origin: float) -> Dict[str, Any]:
+        return {
+            "span": "  " * self.depth + self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "ms": round(self.duration * 1000, 2),
+            "details": " ".join(f"{key}={value}" for key, value in self.args.items()),
+        }
+
+
+class Trace:
+    """The spans of one rerun, with its memory high-water marks"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.peak_rss_mb: Optional[float] = None
+        self.traced_peak_mb: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return max((span.start + span.duration - self.origin for span in self.spans), default=0.0)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [span.as_row(self.origin) for span in sorted(self.spans, key=lambda span: span.start)]
+
+    def totals(self) -> Dict[str, float]:
+        """Milliseconds per span name, summed over repeats"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration * 1000
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "started": self.started,
+            "ms": round(self.duration * 1000, 3),
+            "peak_rss_mb": self.peak_rss_mb,
+            "traced_peak_mb": self.traced_peak_mb,
+            "spans": [{"name": span.name, "start_ms": round((span.start - self.origin) * 1000, 3),
+                       "ms": round(span.duration * 1000, 3), "depth": span.depth,
+                       "thread": span.thread, "args": span.args} for span in self.spans],
+        }
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "trace", "span")
+
+    def __init__(self, tracer: "Tracer", trace: Trace, span: Span):
+        self.tracer = tracer
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.tracer._local.depth = self.span.depth + 1
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.duration = time.perf_counter() - self.span.start
+        self.tracer._local.depth = self.span.depth
+        self.trace.spans.append(self.span)
+        return False
+
+
+class Tracer:
+    """Spans per rerun, kept for the last ``max_runs`` reruns; a no-op while disabled"""
+
+    def __init__(self, max_runs: int = DEFAULT_MAX_RUNS, enabled: bool = False):
+        self.enabled = enabled
+        self.runs: Deque[Trace] = deque(maxlen=max_runs)
+        self.current: Optional[Trace] = None
+        self._local = threading.local()
+
+    def begin(self, label: str = "") -> Optional[Trace]:
+        """Start the trace of a new rerun"""
+        if not self.enabled:
+            return None
+        self.current = Trace(label)
+        self._local.depth = 0
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return self.current
+
+    def end(self) -> Optional[Trace]:
+        """Close the current trace, recording memory high-water marks, and keep it"""
+        trace, self.current = self.current, None
+        if trace is None:
+            return None
+        trace.peak_rss_mb = peak_rss_mb()
+        if tracemalloc.is_tracing():
+            trace.traced_peak_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        if trace.spans:
+            self.runs.append(trace)
+        return trace
+
+    def span(self, name: str, **args: Any):
+        """A context manager timing ``name`` within the current rerun"""
+        trace = self.current
+        if trace is None:
+            return _NULL_SPAN
+        depth = getattr(self._local, "depth", 0)
+        return _ActiveSpan(self, trace, Span(name, 0.0, depth, threading.get_ident(), args))
+
+    @contextmanager
+    def run(self, label: str, **args: Any) -> Iterator[None]:
+        """A span, and the trace of a rerun of its own when no rerun is being traced
+
+        Streamlit fragments rerun without the rest of the script; wrapped in
+        ``run`` they are spans of a full rerun, or traces of their own.
+        """
+        if self.current is not None or not self.enabled:
+            with self.span(label, **args):
+                yield
+            return
+        self.begin(label)
+        try:
+            with self.span(label, **args):
+                yield
+        finally:
+            self.end()
+
+    def clear(self):
+        self.runs.clear()
+
+    def as_json(self, traces: Optional[Iterable[Trace]] = None) -> str:
+        return json.dumps({"runs": [trace.as_dict() for trace in (self.runs if traces is None else traces)]},
+                          indent=2, default=str)
+
+    def chrome_trace(self, traces: Optional[Iterable[Trace]] = None) -> str:
+        """The kept traces as Trace Event Format JSON, one complete event per span"""
+        events: List[Dict[str, Any]] = []
+        pid = os.getpid()
+        for trace in self.runs if traces is None else traces:
+            # Microseconds since the epoch, so consecutive reruns line up on one timeline
+            base = trace.started * 1e6
+            events.append({"name": trace.label or "rerun", "ph": "i", "s": "p", "pid": pid, "tid": 0,
+                           "ts": base, "args": {"peak_rss_mb": trace.peak_rss_mb,
+                                                "traced_peak_mb": trace.traced_peak_mb}})
+            for span in trace.spans:
+                events.append({"name": span.name, "ph": "X", "pid": pid, "tid": span.thread,
+                               "ts": base + (span.start - trace.origin) * 1e6,
+                               "dur": span.duration * 1e6, "args": span.args})
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+
+    def write(self, path: str, chrome: bool = True):
+        """Write the kept traces to ``path``, as a Chrome trace or as plain JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.chrome_trace() if chrome else self.as_json())
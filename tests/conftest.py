@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import DagSpec, generate_manifest
+from dbt_selector.manifest import Manifest
+
+
+def jaffle_dict():
+    """A small hand-written project: a source, staging models, a mart, tests and a package model"""
+    def model(name, layer, tags=(), materialized="view", package="jaffle"):
+        return model_entry(name, package_name=package, original_file_path=f"models/{layer}/{name}.sql",
+                           fqn=[package, layer, name], tags=list(tags),
+                           config={"materialized": materialized, "tags": list(tags)},
+                           checksum={"name": "sha256", "checksum": f"{name}-v1"})
+
+    def test(name, *models):
+        return {"resource_type": "test", "package_name": "jaffle", "name": name,
+                "original_file_path": "models/marts/schema.yml", "fqn": ["jaffle", "marts", name],
+                "tags": [], "config": {"severity": "ERROR"}, "test_metadata": {"name": name.split("_")[0]}}
+
+    nodes = {
+        "model.jaffle.stg_orders": model("stg_orders", "staging", ["nightly"]),
+        "model.jaffle.stg_payments": model("stg_payments", "staging", ["nightly", "finance"], "table"),
+        "model.jaffle.orders": model("orders", "marts", ["finance"], "incremental"),
+        "model.utils.calendar": model("calendar", "utils", materialized="table", package="utils"),
+        "test.jaffle.unique_orders": test("unique_orders"),
+        "test.jaffle.relationships_orders_payments": test("relationships_orders_payments"),
+    }
+    sources = {
+        "source.jaffle.raw.raw_orders": {
+            "resource_type": "source", "package_name": "jaffle", "name": "raw_orders", "source_name": "raw",
+            "original_file_path": "models/staging/sources.yml", "fqn": ["jaffle", "staging", "raw", "raw_orders"],
+            "tags": [], "config": {"enabled": True}},
+    }
+    parent_map = {
+        "source.jaffle.raw.raw_orders": [],
+        "model.jaffle.stg_orders": ["source.jaffle.raw.raw_orders"],
+        "model.jaffle.stg_payments": [],
+        "model.jaffle.orders": ["model.jaffle.stg_orders", "model.jaffle.stg_payments"],
+        "model.utils.calendar": [],
+        "test.jaffle.unique_orders": ["model.jaffle.orders"],
+        "test.jaffle.relationships_orders_payments": ["model.jaffle.orders", "model.jaffle.stg_payments"],
+    }
+    return {"metadata": {"dbt_version": "1.8.0", "project_name": "jaffle"},
+            "nodes": nodes, "sources": sources, "parent_map": parent_map}
+
+
+@pytest.fixture
+def jaffle():
+    return Manifest.from_dict(jaffle_dict())
+
+
+@pytest.fixture
+def jaffle_path(tmp_path):
+    path = tmp_path / "jaffle.json"
+    path.write_text(json.dumps(jaffle_dict()), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def manifest_dict():
+    return generate_manifest(DagSpec(nodes=600, locality=100, tags=10, directories=10, seed=7))
+
+
+@pytest.fixture(scope="session")
+def manifest(manifest_dict):
+    return Manifest.from_dict(manifest_dict)
+
+
+@pytest.fixture
+def manifest_path(tmp_path, manifest_dict):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest_dict), encoding="utf-8")
+    return str(path)
+
+
+def model_entry(name, **fields):
+    entry = {"resource_type": "model", "package_name": "proj", "name": name,
+             "original_file_path": f"models/{name}.sql", "fqn": ["proj", name], "tags": [], "config": {}}
+    entry.update(fields)
+    return entry
+
+
+def build_manifest(parent_map, tests=()):
+    """A manifest of models named in ``parent_map`` ({model: [parents]}), plus ``tests`` on them"""
+    nodes = {f"model.proj.{name}": model_entry(name) for name in parent_map}
+    parents = {f"model.proj.{name}": [f"model.proj.{p}" for p in ps] for name, ps in parent_map.items()}
+    for name, models in tests:
+        uid = f"test.proj.{name}"
+        nodes[uid] = {"resource_type": "test", "package_name": "proj", "name": name,
+                      "original_file_path": "models/schema.yml", "fqn": ["proj", name], "tags": [],
+                      "config": {}, "test_metadata": {"name": name.split("_", 1)[0]}}
+        parents[uid] = [f"model.proj.{m}" for m in models]
+    return Manifest.from_dict({"metadata": {}, "nodes": nodes, "parent_map": parents})
+
+
+@pytest.fixture
+def make_manifest():
+    return build_manifest
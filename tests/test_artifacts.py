@@ -0,0 +1,109 @@
+import io
+import json
+
+import pytest
+
+from dbt_selector.artifacts import RUN_RESULTS, SOURCES, RunHistory, stream_artifact
+from dbt_selector.batch import BatchEvaluator
+from dbt_selector.exceptions import SelectorError
+
+RAW_ORDERS = "source.jaffle.raw.raw_orders"
+
+
+def run_results(generated_at, statuses, times=None):
+    times = times or {}
+    return {
+        "metadata": {"dbt_schema_version": "https://schemas.getdbt.com/dbt/run-results/v5.json",
+                     "generated_at": generated_at},
+        "results": [{"unique_id": uid, "status": status, "execution_time": times.get(uid, 1.0),
+                     "adapter_response": {"rows_affected": 1.5e3}} for uid, status in statuses.items()],
+        "elapsed_time": 3.25,
+    }
+
+
+def sources(generated_at, max_loaded_at):
+    return {
+        "metadata": {"dbt_schema_version": "https://schemas.getdbt.com/dbt/sources/v3.json",
+                     "generated_at": generated_at},
+        "results": [{"unique_id": RAW_ORDERS, "status": "pass", "max_loaded_at": max_loaded_at,
+                     "criteria": {"warn_after": {"count": 12, "period": "hour"}}}],
+    }
+
+
+def write(tmp_path, name, artifact):
+    path = tmp_path / name
+    path.write_text(json.dumps(artifact), encoding="utf-8")
+    return str(path)
+
+
+def names(manifest, ids):
+    return sorted(manifest.nodes[i].unique_id.split(".", 2)[-1] for i in ids)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_stream_artifact(chunk_size):
+    text = json.dumps(run_results("2024-05-01T00:00:00Z", {"model.jaffle.orders": "error"}, {
+        "model.jaffle.orders": 4.5}))
+    snapshot = stream_artifact(io.StringIO(text), chunk_size=chunk_size)
+    assert (snapshot.kind, snapshot.generated_at) == (RUN_RESULTS, "2024-05-01T00:00:00Z")
+    assert snapshot.statuses == {"error": ["model.jaffle.orders"]}
+    assert snapshot.timings == {"model.jaffle.orders": 4.5}
+
+    freshness = stream_artifact(io.StringIO(json.dumps(sources("x", "2024-05-01T06:00:00+00:00"))),
+                                chunk_size=chunk_size)
+    assert freshness.kind == SOURCES and RAW_ORDERS in freshness.loaded_at
+
+
+def test_result_and_source_status_selection(tmp_path, jaffle):
+    history = RunHistory.from_paths([
+        write(tmp_path, "run_1.json", run_results("2024-05-01T00:00:00Z", {"model.jaffle.stg_orders": "error"})),
+        write(tmp_path, "run_2.json", run_results("2024-05-02T00:00:00Z", {
+            "model.jaffle.stg_orders": "success", "model.jaffle.stg_payments": "error",
+            "test.jaffle.unique_orders": "fail"})),
+        write(tmp_path, "sources_1.json", sources("2024-05-01T00:00:00Z", "2024-05-01T00:00:00Z")),
+        write(tmp_path, "sources_2.json", sources("2024-05-02T00:00:00Z", "2024-05-02T00:00:00Z")),
+    ])
+    selectors = [
+        {"name": "errors", "definition": "result:error"},
+        {"name": "errors_and_children", "definition": {"method": "result", "value": "error", "children": True,
+                                                       "indirect_selection": "empty"}},
+        {"name": "failed_tests", "definition": "result:fail"},
+        {"name": "fresher", "definition": {"method": "source_status", "value": "fresher", "children": True,
+                                           "indirect_selection": "empty"}},
+        {"name": "stale", "definition": "source_status:stale"},
+    ]
+    results = {r.name: r.node_ids for r in BatchEvaluator(jaffle, selectors, history=history).run()}
+    # Only the latest run counts
+    assert names(jaffle, results["errors"]) == ["relationships_orders_payments", "stg_payments"]
+    assert names(jaffle, results["errors_and_children"]) == [
+        "orders", "relationships_orders_payments", "stg_payments", "unique_orders"]
+    assert names(jaffle, results["failed_tests"]) == ["unique_orders"]
+    assert names(jaffle, results["fresher"]) == ["orders", "raw.raw_orders", "relationships_orders_payments",
+                                                 "stg_orders", "unique_orders"]
+    assert results["stale"] == set()
+
+
+def test_history_is_a_bounded_ring(tmp_path, jaffle):
+    history = RunHistory(max_runs=2)
+    for day, uid in ((3, "model.jaffle.orders"), (1, "model.jaffle.stg_orders"), (2, "model.jaffle.stg_payments")):
+        history.add(stream_artifact(io.StringIO(json.dumps(
+            run_results(f"2024-05-0{day}T00:00:00Z", {uid: "error"}, {uid: float(day)})))))
+    assert [run.generated_at[:10] for run in history.runs] == ["2024-05-02", "2024-05-03"]
+    assert names(jaffle, history.select_result(jaffle, "error")) == ["orders"]
+    times = history.execution_times(jaffle)
+    assert times[jaffle.ids["model.jaffle.orders"]] == 3.0
+    assert times[jaffle.ids["model.jaffle.stg_orders"]] == -1.0
+    with pytest.raises(ValueError):
+        RunHistory(max_runs=0)
+
+
+def test_missing_artifacts(jaffle):
+    history = RunHistory()
+    with pytest.raises(SelectorError, match="run_results.json"):
+        history.select_result(jaffle, "error")
+    history.add(stream_artifact(io.StringIO(json.dumps(sources("2024-05-01T00:00:00Z", "2024-05-01T00:00:00Z")))))
+    with pytest.raises(SelectorError, match="only one is loaded"):
+        history.select_source_status(jaffle, "fresher")
+    with pytest.raises(SelectorError, match="Invalid source_status"):
+        history.select_source_status(jaffle, "rotten")
+    assert names(jaffle, history.select_source_status(jaffle, "pass")) == ["raw.raw_orders"]
@@ -0,0 +1,63 @@
+from benchmarks.synthetic import DagSpec, generate_selectors
+from dbt_selector.batch import BatchEvaluator, ResultCache
+from dbt_selector.evaluate import Evaluator
+
+SPEC = DagSpec(nodes=600, locality=100, tags=10, directories=10, seed=7)
+
+
+def inline(definition, definitions):
+    """A definition with every selector: reference replaced by the referenced definition"""
+    if isinstance(definition, dict):
+        if definition.get("method") == "selector":
+            return inline(definitions[definition["value"]], definitions)
+        return {key: inline(value, definitions) for key, value in definition.items()}
+    if isinstance(definition, list):
+        return [inline(item, definitions) for item in definition]
+    return definition
+
+
+def test_batch_matches_evaluator(manifest):
+    selectors = generate_selectors(SPEC, 80, seed=5)
+    definitions = {selector["name"]: selector["definition"] for selector in selectors}
+    results = BatchEvaluator(manifest, selectors).run()
+    evaluator = Evaluator(manifest)
+    assert [result.name for result in results] == list(definitions)
+    for result in results:
+        assert result.error is None
+        assert result.node_ids == evaluator.evaluate(inline(definitions[result.name], definitions))
+
+
+def test_shared_subtrees_hit_the_cache(jaffle):
+    selectors = [
+        {"name": "nightly", "definition": "tag:nightly"},
+        {"name": "nightly_models", "definition": {"intersection": ["tag:nightly", "resource_type:model"]}},
+        {"name": "both", "definition": {"union": [{"method": "selector", "value": "nightly"}, "tag:finance"]}},
+    ]
+    batch = BatchEvaluator(jaffle, selectors)
+    results = {result.name: result.node_ids for result in batch.run()}
+    assert results["both"] == results["nightly"] | Evaluator(jaffle).evaluate("tag:finance")
+    assert batch.cache.hits >= 2
+
+
+def test_reference_errors(jaffle):
+    selectors = [
+        {"name": "a", "definition": {"method": "selector", "value": "b"}},
+        {"name": "b", "definition": {"union": ["tag:nightly", {"method": "selector", "value": "a"}]}},
+        {"name": "c", "definition": {"method": "selector", "value": "missing"}},
+        {"name": "d", "definition": "tag:finance"},
+    ]
+    results = {result.name: result for result in BatchEvaluator(jaffle, selectors).run()}
+    assert "Circular selector reference: a -> b -> a" in results["a"].error
+    assert "Unknown selector 'missing'" in results["c"].error
+    assert results["d"].error is None and results["d"].node_ids
+    assert results["a"].as_row()["nodes"] is None
+
+
+def test_result_cache_is_bounded():
+    cache = ResultCache(max_entries=2)
+    cache["a"], cache["b"] = {1}, {2}
+    assert cache.get("a") == {1}
+    cache["c"] = {3}
+    assert cache.get("b") is None
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.hit_rate == 0.5
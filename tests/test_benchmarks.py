@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from benchmarks import bench
+from benchmarks.synthetic import FAN_IN_DISTRIBUTIONS, DagSpec, generate_manifest, generate_selectors
+from dbt_selector.manifest import Manifest
+from dbt_selector.selectors import validate_selectors
+
+
+@pytest.mark.parametrize("fan_in", FAN_IN_DISTRIBUTIONS)
+def test_generated_manifest_is_a_dag(fan_in):
+    spec = DagSpec(nodes=2000, fan_in=fan_in, locality=200, tags=20, seed=1)
+    data = generate_manifest(spec)
+    assert len(data["nodes"]) + len(data["sources"]) == pytest.approx(spec.nodes, abs=2)
+    # Nodes are generated in topological order, so every parent comes first
+    order = {uid: i for i, uid in enumerate(list(data["sources"]) + list(data["nodes"]))}
+    for uid, parents in data["parent_map"].items():
+        assert all(order[parent] < order[uid] for parent in parents)
+        assert all(uid in data["child_map"][parent] for parent in parents)
+    manifest = Manifest.from_dict(data)
+    assert len(manifest) == len(order)
+    assert {node.tags for node in manifest.nodes if node.resource_type == "model"} > {()}
+
+
+def test_generation_is_deterministic():
+    spec = DagSpec(nodes=500, seed=3)
+    assert generate_manifest(spec) == generate_manifest(DagSpec(nodes=500, seed=3))
+    assert generate_selectors(spec, 50, seed=1) == generate_selectors(spec, 50, seed=1)
+
+
+def test_generated_selectors_are_valid():
+    selectors = generate_selectors(DagSpec(nodes=1000, tags=20), 200, seed=2)
+    assert validate_selectors(selectors) == []
+
+
+def test_unknown_fan_in():
+    with pytest.raises(ValueError):
+        DagSpec(fan_in="normal")
+
+
+def test_bench_writes_json_and_compares(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    assert bench.main(["--nodes", "300", "--repeat", "1", "--selectors", "20", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["schema_version"] == bench.SCHEMA_VERSION
+    names = {result["benchmark"] for result in report["results"]}
+    assert {"index_build.stream", "graph.expand", "parse_cli", "yaml.dump", "selectors.evaluate"} <= names
+    assert all(result["nodes"] == 300 and result["median_s"] >= 0 for result in report["results"])
+
+    assert bench.main(["--compare", str(output), str(output)]) == 0
+    slower = dict(report, results=[dict(r, median_s=r["median_s"] * 10 + 1) for r in report["results"]])
+    slower_path = tmp_path / "slower.json"
+    slower_path.write_text(json.dumps(slower))
+    assert bench.main(["--compare", str(output), str(slower_path)]) == 1
+    assert "REGRESSED" in capsys.readouterr().out
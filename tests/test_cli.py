@@ -0,0 +1,104 @@
+import json
+import subprocess
+import sys
+
+import pytest
+import yaml
+
+from dbt_selector.cli import main
+
+SELECTORS = """\
+selectors:
+  - name: nightly
+    definition: tag:nightly
+  - name: finance_models
+    definition:
+      intersection:
+        - tag:finance
+        - resource_type:model
+"""
+
+
+@pytest.fixture
+def selectors_path(tmp_path):
+    path = tmp_path / "selectors.yml"
+    path.write_text(SELECTORS, encoding="utf-8")
+    return str(path)
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_generate(tmp_path, capsys):
+    assert main(["generate", "marts", "tag:finance,path:models/marts"]) == 0
+    selector = yaml.safe_load(capsys.readouterr().out)["selectors"][0]
+    assert selector["name"] == "marts"
+    assert selector["definition"]["intersection"][0]["method"] == "tag"
+
+    output = str(tmp_path / "selectors.yml")
+    assert main(["generate", "a", "tag:x", "--output", output]) == 0
+    assert main(["generate", "b", "tag:y", "--append", output]) == 0
+    assert [s["name"] for s in yaml.safe_load(open(output))["selectors"]] == ["a", "b"]
+
+
+def test_generate_invalid_selection(capsys):
+    assert main(["generate", "broken", "tag:x --exclude"]) == 2
+    assert "dbt-selector: error" in capsys.readouterr().err
+
+
+def test_validate(tmp_path, selectors_path, jaffle_path, capsys):
+    assert main(["validate", selectors_path]) == 0
+    duplicate = write(tmp_path, "dupes.yml", SELECTORS + "  - name: nightly\n    definition: tag:x\n")
+    assert main(["validate", selectors_path, duplicate]) == 1
+    assert capsys.readouterr().err.startswith(duplicate)
+
+    empty = write(tmp_path, "empty.yml", "selectors:\n  - name: none\n    definition: tag:missing\n")
+    assert main(["validate", empty, "--manifest", jaffle_path, "--no-cache"]) == 0
+    assert main(["validate", empty, "--manifest", jaffle_path, "--no-cache", "--fail-on-empty"]) == 1
+    assert "selects no nodes" in capsys.readouterr().err
+
+
+def test_evaluate(tmp_path, selectors_path, jaffle_path, capsys):
+    assert main(["evaluate", selectors_path, "-m", jaffle_path, "--no-cache", "-f", "json"]) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert results["finance_models"]["unique_ids"] == [
+        "model.jaffle.orders", "model.jaffle.stg_payments",
+        "test.jaffle.relationships_orders_payments", "test.jaffle.unique_orders"]
+    assert results["nightly"]["nodes"] == 3
+
+    assert main(["evaluate", selectors_path, "-m", jaffle_path, "--no-cache", "-s", "nightly", "-f", "ids"]) == 0
+    assert capsys.readouterr().out.split() == [
+        "model.jaffle.stg_orders", "model.jaffle.stg_payments", "test.jaffle.relationships_orders_payments"]
+
+    missing = write(tmp_path, "missing.yml", "selectors:\n  - name: ref\n    definition:\n"
+                                             "      method: selector\n      value: nowhere\n")
+    assert main(["evaluate", missing, "-m", jaffle_path, "--no-cache"]) == 1
+    assert main(["evaluate", selectors_path, "-m", str(tmp_path / "absent.json"), "--no-cache"]) == 2
+
+
+def test_diff(tmp_path, selectors_path, jaffle_path, capsys):
+    new = write(tmp_path, "new.yml", SELECTORS.replace("tag:nightly", "tag:finance"))
+    base = ["-m", jaffle_path, "--no-cache"]
+    assert main(["diff", selectors_path, selectors_path, *base, "--exit-code"]) == 0
+    assert main(["diff", selectors_path, new, *base]) == 0
+    capsys.readouterr()
+    assert main(["diff", selectors_path, new, *base, "--exit-code", "-f", "json"]) == 1
+    changes = json.loads(capsys.readouterr().out)
+    assert set(changes) == {"nightly"}
+    assert changes["nightly"]["added"] == ["model.jaffle.orders", "test.jaffle.unique_orders"]
+
+
+def test_synthesize(tmp_path, jaffle_path, capsys):
+    nodes = write(tmp_path, "nodes.txt", "model.jaffle.stg_orders\nmodel.jaffle.stg_payments\n")
+    assert main(["synthesize", "staging", nodes, "-m", jaffle_path, "--no-cache",
+                 "--indirect-selection", "empty"]) == 0
+    assert yaml.safe_load(capsys.readouterr().out)["selectors"][0]["name"] == "staging"
+
+
+def test_cli_does_not_import_streamlit():
+    code = "import sys; from dbt_selector.cli import main; print('streamlit' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,78 @@
+import random
+from fnmatch import fnmatchcase
+
+import pytest
+
+from conftest import model_entry
+from dbt_selector import columns
+from dbt_selector.columns import build_column, config_value_keys
+from dbt_selector.evaluate import Evaluator
+from dbt_selector.manifest import Manifest
+
+OWNERS = ["ana", "bo", "cy", None]
+
+
+@pytest.fixture(scope="module")
+def configured():
+    rng = random.Random(5)
+    nodes, parent_map = {}, {}
+    for i in range(300):
+        config = {"materialized": rng.choice(["view", "table", "incremental"]),
+                  "enabled": rng.random() < 0.9,
+                  "tags": rng.sample(["daily", "hourly", "pii", "finance"], rng.randint(0, 3))}
+        if rng.random() < 0.7:
+            config["meta"] = {"owner": rng.choice(OWNERS), "tier": rng.randint(1, 3)}
+        if rng.random() < 0.1:
+            config["meta"] = "not a mapping"
+        nodes[f"model.proj.m{i}"] = model_entry(f"m{i}", config=config)
+        parent_map[f"model.proj.m{i}"] = []
+    return Manifest.from_dict({"metadata": {}, "nodes": nodes, "parent_map": parent_map})
+
+
+def naive_select(manifest, key, value):
+    """Nodes whose config ``key`` matches ``value``, walking every node's config"""
+    selected = set()
+    for i, node in enumerate(manifest.nodes):
+        found = node.config
+        for part in key.split("."):
+            if not isinstance(found, dict) or part not in found:
+                break
+            found = found[part]
+        else:
+            if any(fnmatchcase(k, value) for k in config_value_keys(found)):
+                selected.add(i)
+    return selected
+
+
+QUERIES = [
+    ("materialized", "table"), ("materialized", "*"), ("materialized", "in*"), ("materialized", "seed"),
+    ("enabled", "true"), ("enabled", "false"), ("tags", "pii"), ("tags", "*ly"), ("meta.owner", "ana"),
+    ("meta.owner", "none"), ("meta.tier", "2"), ("meta.tier", "[12]"), ("meta.missing", "x"), ("schema", "*"),
+]
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_columns_agree_with_config_lookup(configured, monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(columns, "np", None)
+    elif columns.np is None:
+        pytest.skip("NumPy is not installed")
+    for key, value in QUERIES:
+        column = build_column(configured.nodes, key)
+        expected = naive_select(configured, key, value)
+        assert column.select(value) == expected, (key, value)
+        if key != "tags":
+            assert column.count(value) == len(expected), (key, value)
+
+
+def test_evaluator_uses_columns(configured):
+    selected = Evaluator(configured).select_method("config.meta.owner", "bo")
+    assert selected == naive_select(configured, "meta.owner", "bo")
+    assert "meta.owner" in configured.indexes._config
+
+
+@pytest.mark.parametrize("value, keys", [
+    (True, ["true"]), (None, ["none"]), (3, ["3"]), (["a", ["b"]], ["a", "b"]), ({"nested": 1}, []),
+])
+def test_config_value_keys(value, keys):
+    assert config_value_keys(value) == keys
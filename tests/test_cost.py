@@ -0,0 +1,94 @@
+import random
+from array import array
+
+import pytest
+
+from dbt_selector.batch import BatchEvaluator
+from dbt_selector.cost import selection_cost, shard_names, shard_selection, shard_selectors
+from dbt_selector.graph import PARENTS
+from dbt_selector.parser import parse_cli
+
+
+def costs_by_name(manifest, seconds):
+    return array("d", (seconds.get(node.name, -1.0) for node in manifest.nodes))
+
+
+def random_costs(manifest, seed=0):
+    rng = random.Random(seed)
+    return array("d", (rng.random() * 10 if rng.random() < 0.9 else -1.0 for _ in manifest.nodes))
+
+
+def assert_valid_plan(manifest, selected, plan):
+    where = {}
+    for k, shard in enumerate(plan):
+        for i in shard.node_ids:
+            assert i not in where, "a node is in two shards"
+            where[i] = (shard.stage, k)
+    assert set(where) == selected
+    parents = manifest.graph.adjacency[PARENTS]
+    for i in selected:
+        for p in parents[i]:
+            if p in where:
+                # Built earlier, or in order by the same job
+                assert where[p][0] < where[i][0] or where[p] == where[i]
+
+
+def test_critical_path(make_manifest):
+    manifest = make_manifest({"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"]})
+    costs = costs_by_name(manifest, {"a": 1.0, "b": 5.0, "c": 2.0, "d": 1.0})
+    cost = selection_cost(manifest, range(len(manifest)), costs)
+    assert cost.total == 9.0
+    assert cost.critical_path == 7.0
+    assert [manifest.nodes[i].name for i in cost.path] == ["a", "b", "d"]
+
+
+def test_lpt_balances_independent_groups(make_manifest):
+    seconds = {"a": 7.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 3.0, "f": 2.0}
+    manifest = make_manifest({name: [] for name in seconds})
+    plan = shard_selection(manifest, range(len(manifest)), costs_by_name(manifest, seconds), 2)
+    assert [shard.stage for shard in plan] == [1, 1]
+    assert sorted(shard.cost.total for shard in plan) == [12.0, 12.0]
+    assert shard_names("x", plan) == ["x_shard_1", "x_shard_2"]
+
+
+def test_connected_selection_is_staged(make_manifest):
+    # One root feeding four leaves: no split into independent groups exists
+    manifest = make_manifest({"root": [], "a": ["root"], "b": ["root"], "c": ["root"], "d": ["root"]})
+    seconds = {name: 10.0 for name in ("root", "a", "b", "c", "d")}
+    selected = set(range(len(manifest)))
+    plan = shard_selection(manifest, selected, costs_by_name(manifest, seconds), 4)
+    assert_valid_plan(manifest, selected, plan)
+    assert [(shard.stage, shard.cost.total) for shard in plan] == [(1, 10.0)] + [(2, 10.0)] * 4
+    assert shard_names("x", plan)[:2] == ["x_stage_1_shard_1", "x_stage_2_shard_1"]
+
+
+def test_few_groups_give_fewer_shards(make_manifest):
+    manifest = make_manifest({"a": [], "b": ["a"]})
+    plan = shard_selection(manifest, range(len(manifest)), costs_by_name(manifest, {"a": 1.0, "b": 1.0}), 1)
+    assert len(plan) == 1
+    with pytest.raises(ValueError):
+        shard_selection(manifest, range(len(manifest)), costs_by_name(manifest, {}), 0)
+    assert shard_selection(manifest, [], costs_by_name(manifest, {}), 4) == []
+
+
+@pytest.mark.parametrize("shards", [2, 4, 8])
+@pytest.mark.parametrize("cli", ["+tag:tag_1+", "resource_type:model", "path:models/staging+"])
+def test_shard_plans_respect_dependencies(manifest, cli, shards):
+    selected = BatchEvaluator(manifest, [{"name": "x", "definition": parse_cli(cli)}]).evaluate("x")
+    plan = shard_selection(manifest, selected, random_costs(manifest), shards)
+    assert_valid_plan(manifest, selected, plan)
+    assert all(sum(1 for shard in plan if shard.stage == stage) <= shards
+               for stage in {shard.stage for shard in plan})
+
+
+@pytest.mark.parametrize("cli", ["+tag:tag_1+", "tag:tag_2+", "path:models/marts"])
+def test_shard_selectors_partition_the_selection(manifest, cli):
+    original = {"name": "x", "definition": parse_cli(cli)}
+    selected = BatchEvaluator(manifest, [original]).evaluate("x")
+    plan = shard_selection(manifest, selected, random_costs(manifest), 4)
+    selectors = shard_selectors(manifest, "x", plan)
+    batch = BatchEvaluator(manifest, [original] + selectors)
+    results = [batch.evaluate(selector["name"]) for selector in selectors]
+    assert sum(len(ids) for ids in results) == len(selected)
+    assert set().union(*results) == selected
+    assert results == [shard.node_ids for shard in plan]
@@ -0,0 +1,76 @@
+import pytest
+
+from dbt_selector.editor import INTERSECTION, MIN_ITEMS, UNION, CriterionTree
+from dbt_selector.exceptions import SelectorError
+
+
+def set_method(tree, node_id, method, value, **fields):
+    tree[node_id].update(method=method, value=value, **fields)
+
+
+def test_single_method():
+    tree = CriterionTree()
+    set_method(tree, tree.root, "tag", "nightly", children=True, children_depth=2)
+    assert tree.to_criterion() == {"method": "tag", "value": "nightly", "children": True, "children_depth": 2,
+                                   "indirect_selection": "eager"}
+
+
+def test_nested_tree_with_exclusions():
+    tree = CriterionTree()
+    tree.set_kind(tree.root, UNION)
+    first, second = tree[tree.root]["items"]
+    set_method(tree, first, "tag", "nightly")
+    tree.set_kind(second, INTERSECTION)
+    left, right = tree[second]["items"]
+    set_method(tree, left, "path", "models/marts")
+    set_method(tree, right, "config.materialized", "table", parents=True)
+    tree.set_exclusions(tree.root, True)
+    set_method(tree, tree[tree.root]["exclude"][0], "fqn", "orders")
+
+    assert tree.to_criterion() == {
+        "union": [
+            {"method": "tag", "value": "nightly", "indirect_selection": "eager"},
+            {"intersection": [
+                {"method": "path", "value": "models/marts", "indirect_selection": "eager"},
+                {"method": "config.materialized", "value": "table", "parents": True, "parents_depth": 1,
+                 "indirect_selection": "eager"},
+            ]},
+        ],
+        "exclude": [{"method": "fqn", "value": "orders", "indirect_selection": "eager"}],
+    }
+    # Each subtree builds on its own, for fragment-scoped rendering
+    assert tree.to_criterion(second)["intersection"][0]["value"] == "models/marts"
+
+
+def test_exclusions_do_not_nest():
+    tree = CriterionTree()
+    tree.set_exclusions(tree.root, True)
+    excluded = tree[tree.root]["exclude"][0]
+    tree.set_exclusions(excluded, True)
+    assert "exclude" not in tree.to_criterion()["exclude"][0]
+
+    tree.set_exclusions(tree.root, False)
+    assert "exclude" not in tree.to_criterion()
+
+
+def test_resize_drops_removed_subtrees():
+    tree = CriterionTree()
+    tree.set_kind(tree.root, UNION)
+    assert len(tree[tree.root]["items"]) == MIN_ITEMS
+    tree.resize(tree.root, "items", 5)
+    tree.set_kind(tree[tree.root]["items"][-1], INTERSECTION)
+    assert len(tree) == 1 + 5 + MIN_ITEMS
+    tree.resize(tree.root, "items", 3)
+    assert len(tree) == 1 + 3
+    assert len(tree.to_criterion()["union"]) == 3
+
+
+def test_node_ids_are_unique_across_trees():
+    first, second = CriterionTree(), CriterionTree()
+    assert first.root != second.root
+
+
+def test_unknown_kind():
+    tree = CriterionTree()
+    with pytest.raises(SelectorError):
+        tree.set_kind(tree.root, "difference")
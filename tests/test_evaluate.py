@@ -0,0 +1,81 @@
+import pytest
+
+from dbt_selector.evaluate import Evaluator, evaluate
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.parser import parse_cli
+
+
+def names(manifest, ids):
+    return sorted(manifest.nodes[i].unique_id.split(".", 2)[-1] for i in ids)
+
+
+@pytest.mark.parametrize("definition, expected", [
+    # Tests on a selected node come along (eager indirect selection)
+    ("tag:nightly", ["relationships_orders_payments", "stg_orders", "stg_payments"]),
+    ("tag:finance,tag:nightly", ["relationships_orders_payments", "stg_payments"]),
+    ("path:models/staging", ["raw.raw_orders", "relationships_orders_payments", "stg_orders", "stg_payments"]),
+    ("path:models/marts/orders.sql", ["orders", "relationships_orders_payments", "unique_orders"]),
+    ("fqn:jaffle.staging", ["raw.raw_orders", "relationships_orders_payments", "stg_orders", "stg_payments"]),
+    ("fqn:orders", ["orders", "relationships_orders_payments", "unique_orders"]),
+    ("package:utils", ["calendar"]),
+    ("resource_type:source", ["raw.raw_orders"]),
+    ("config.materialized:table", ["calendar", "relationships_orders_payments", "stg_payments"]),
+    ("source:raw.raw_orders", ["raw.raw_orders"]),
+    ("test_name:unique", ["unique_orders"]),
+    ("+orders", ["orders", "raw.raw_orders", "relationships_orders_payments", "stg_orders", "stg_payments",
+                 "unique_orders"]),
+    ("1+orders", ["orders", "relationships_orders_payments", "stg_orders", "stg_payments", "unique_orders"]),
+    ("stg_orders+", ["orders", "relationships_orders_payments", "stg_orders", "unique_orders"]),
+    ("@stg_orders", ["orders", "raw.raw_orders", "relationships_orders_payments", "stg_orders", "stg_payments",
+                     "unique_orders"]),
+    ("tag:nightly --exclude stg_payments", ["stg_orders"]),
+    ("package:utils tag:finance --exclude resource_type:test", ["calendar", "orders", "stg_payments"]),
+])
+def test_cli_selections(jaffle, definition, expected):
+    assert names(jaffle, Evaluator(jaffle).evaluate(definition)) == expected
+
+
+def test_yaml_definitions(jaffle):
+    evaluator = Evaluator(jaffle)
+    definition = {"union": [
+        {"method": "tag", "value": "nightly"},
+        {"intersection": [{"method": "package", "value": "utils"}, {"method": "resource_type", "value": "model"}]},
+        {"exclude": [{"method": "fqn", "value": "stg_orders"}]},
+    ]}
+    assert names(jaffle, evaluator.evaluate(definition)) == ["calendar", "relationships_orders_payments",
+                                                             "stg_payments"]
+    assert evaluator.evaluate({"tag": "finance"}) == evaluator.evaluate("tag:finance")
+    assert evaluator.evaluate(parse_cli("+tag:finance")) == evaluator.evaluate("+tag:finance")
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("eager", ["orders", "relationships_orders_payments", "unique_orders"]),
+    # The relationships test also depends on stg_payments, which is not selected
+    ("cautious", ["orders", "unique_orders"]),
+    ("buildable", ["orders", "relationships_orders_payments", "unique_orders"]),
+    ("empty", ["orders"]),
+])
+def test_indirect_selection(jaffle, mode, expected):
+    criterion = {"method": "fqn", "value": "orders", "indirect_selection": mode}
+    assert names(jaffle, Evaluator(jaffle).evaluate(criterion)) == expected
+
+
+def test_depth_limits(jaffle):
+    evaluator = Evaluator(jaffle)
+    criterion = {"method": "fqn", "value": "orders", "parents": True, "parents_depth": 1,
+                 "indirect_selection": "empty"}
+    assert names(jaffle, evaluator.evaluate(criterion)) == ["orders", "stg_orders", "stg_payments"]
+
+
+@pytest.mark.parametrize("definition", [
+    {}, [], {"method": "no_such_method", "value": "x"}, {"method": "config", "value": "table"},
+    {"union": "tag:nightly"}, {"method": "tag", "value": "nightly", "indirect_selection": "lazy"},
+])
+def test_invalid_definitions(jaffle, definition):
+    with pytest.raises(SelectorError):
+        Evaluator(jaffle).evaluate(definition)
+
+
+def test_evaluate_returns_sorted_unique_ids(jaffle):
+    assert evaluate(jaffle, "tag:nightly --exclude resource_type:test") == [
+        "model.jaffle.stg_orders", "model.jaffle.stg_payments"]
@@ -0,0 +1,69 @@
+import random
+from fnmatch import fnmatchcase
+
+import pytest
+
+from benchmarks.synthetic import DagSpec, random_glob_criterion
+from dbt_selector.globs import GlobSet, has_glob, literal_prefix
+from dbt_selector.indexes import flat_fqn, split_path
+from dbt_selector.manifest import Manifest
+
+SPEC = DagSpec(nodes=600, locality=100, tags=10, directories=10, seed=7)
+
+
+def prefix_match(segments, patterns, star_selects_rest=False):
+    if star_selects_rest and "*" in patterns:
+        # dbt's fqn method selects everything beneath a * segment
+        patterns = patterns[:patterns.index("*") + 1]
+    return len(segments) >= len(patterns) and all(fnmatchcase(s, p) for s, p in zip(segments, patterns))
+
+
+def naive_select(manifest, method, value):
+    """The nodes a glob value selects, by fnmatch against every node"""
+    selected = set()
+    for i, node in enumerate(manifest.nodes):
+        if method == "tag":
+            matched = any(fnmatchcase(tag, value) for tag in node.tags)
+        elif method == "test_name":
+            matched = node.test_name is not None and fnmatchcase(node.test_name, value)
+        elif method == "file":
+            matched = fnmatchcase(split_path(node.path)[-1], value)
+        elif method == "path":
+            matched = prefix_match(split_path(node.path), split_path(value))
+        else:
+            matched = (prefix_match(flat_fqn(node.fqn), flat_fqn([value]), star_selects_rest=True)
+                       or fnmatchcase(node.name, value))
+        if matched:
+            selected.add(i)
+    return selected
+
+
+def test_globset_agrees_with_fnmatch():
+    rng = random.Random(1)
+    alphabet = "ab_."
+    keys = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(500)]
+    patterns = ["*", "a*", "ab?", "a[b_]*", "[!a]*", "_a*b", "b.*", "", "ab", "*_", "?"]
+    matched = GlobSet(patterns).match(keys)
+    for pattern in patterns:
+        assert matched[pattern] == [key for key in keys if fnmatchcase(key, pattern)]
+
+
+@pytest.mark.parametrize("pattern, prefix", [("tag_*", "tag_"), ("a?b", "a"), ("[ab]c", ""), ("plain", "plain")])
+def test_literal_prefix(pattern, prefix):
+    assert literal_prefix(pattern) == prefix
+    assert has_glob(pattern) == (prefix != pattern)
+
+
+def test_match_patterns_agrees_with_fnmatch(manifest_dict):
+    rng = random.Random(2)
+    criteria = sorted({random_glob_criterion(rng, SPEC) for _ in range(150)})
+    criteria += [("path", "models/staging"), ("path", "models/*/dir_1"), ("path", "*/marts/*"),
+                 ("fqn", "package_0.marts"), ("fqn", "package_0.*.dir_1"), ("fqn", "model_12")]
+    batched = Manifest.from_dict(manifest_dict)
+    batched.indexes.match_patterns(criteria)
+    single = Manifest.from_dict(manifest_dict)
+    for method, value in criteria:
+        expected = naive_select(single, method, value)
+        assert batched.indexes.select(method, value) == expected, (method, value)
+        assert single.indexes.select(method, value) == expected, (method, value)
+    assert any(naive_select(single, method, value) for method, value in criteria)
@@ -0,0 +1,67 @@
+import random
+from array import array
+
+import pytest
+
+from dbt_selector.graph import CHILDREN, CLOSURE_SEED_LIMIT, PARENTS, Adjacency, Graph
+
+
+def random_dag(num_nodes, seed):
+    rng = random.Random(seed)
+    return {i: sorted(rng.sample(range(i), min(i, rng.randint(0, 3)))) for i in range(num_nodes)}
+
+
+def reference_expand(neighbours, seeds, depth):
+    """Plain set-based BFS over {node: [neighbours]}"""
+    reached, frontier, level = set(seeds), set(seeds), 0
+    while frontier and (depth is None or level < depth):
+        frontier = {j for i in frontier for j in neighbours[i]} - reached
+        reached |= frontier
+        level += 1
+    return reached
+
+
+@pytest.fixture(scope="module")
+def dag():
+    parents = random_dag(500, seed=1)
+    children = {i: [] for i in parents}
+    for child, ps in parents.items():
+        for parent in ps:
+            children[parent].append(child)
+    ids = {f"model.p.m{i}": i for i in parents}
+    parent_map = {f"model.p.m{i}": [f"model.p.m{p}" for p in ps] for i, ps in parents.items()}
+    return Graph.from_maps(ids, parent_map), parents, children
+
+
+@pytest.mark.parametrize("depth", [None, 0, 1, 2, 5])
+@pytest.mark.parametrize("num_seeds", [1, 10, CLOSURE_SEED_LIMIT + 50])
+def test_expand_matches_reference_bfs(dag, depth, num_seeds):
+    graph, parents, children = dag
+    seeds = random.Random(num_seeds).sample(range(graph.num_nodes), num_seeds)
+    assert graph.expand(seeds, PARENTS, depth) == reference_expand(parents, seeds, depth)
+    assert graph.expand(seeds, CHILDREN, depth) == reference_expand(children, seeds, depth)
+
+
+def test_childrens_parents(dag):
+    graph, parents, children = dag
+    descendants = reference_expand(children, [3], None)
+    assert graph.childrens_parents([3]) == reference_expand(parents, descendants, None)
+
+
+def test_adjacency_layouts_agree(dag):
+    graph, parents, _ = dag
+    sources = array("i", (child for child, ps in parents.items() for _ in ps))
+    targets = array("i", (p for ps in parents.values() for p in ps))
+    from_edges = Adjacency.from_edges(len(parents), sources, targets)
+    from_lists = Adjacency.from_lists([parents[i] for i in range(len(parents))])
+    for i in range(len(parents)):
+        assert list(from_edges[i]) == list(from_lists[i]) == list(graph.adjacency[PARENTS][i]) == parents[i]
+        assert from_edges.degree(i) == len(parents[i])
+
+
+def test_from_maps_drops_unknown_ids_and_uses_child_map():
+    ids = {"a": 0, "b": 1}
+    graph = Graph.from_maps(ids, {"a": [], "b": ["a", "external"]}, {"a": ["b", "unknown"], "b": []})
+    assert list(graph.adjacency[PARENTS][1]) == [0]
+    assert list(graph.adjacency[CHILDREN][0]) == [1]
+    assert graph.expand([0], CHILDREN) == {0, 1}
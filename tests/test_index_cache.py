@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from dbt_selector.index_cache import IndexCache, read_entry, write_entry
+from dbt_selector.indexes import KEYED_INDEXES
+from dbt_selector.ingest import load_manifest
+from dbt_selector.graph import CHILDREN, PARENTS
+
+
+def assert_same_manifest(a, b):
+    assert [tuple(getattr(node, f) for f in node.__slots__) for node in a.nodes] == \
+        [tuple(getattr(node, f) for f in node.__slots__) for node in b.nodes]
+    for direction in (PARENTS, CHILDREN):
+        assert list(a.graph.adjacency[direction].offsets) == list(b.graph.adjacency[direction].offsets)
+        assert list(a.graph.adjacency[direction].targets) == list(b.graph.adjacency[direction].targets)
+    for name in KEYED_INDEXES:
+        assert {k: list(v) for k, v in a.indexes.tables[name].items()} == \
+            {k: list(v) for k, v in b.indexes.tables[name].items()}
+    assert a.metadata == b.metadata
+    assert a.external_edges == b.external_edges
+
+
+def test_entry_round_trip(tmp_path, manifest):
+    path = str(tmp_path / "entry.idx")
+    write_entry(path, manifest)
+    restored = read_entry(path)
+    assert_same_manifest(manifest, restored)
+    # Selections over the mapped postings match the built indexes
+    for method, value in (("tag", "tag_1"), ("path", "models/staging"), ("fqn", "package_0.marts.*")):
+        assert restored.indexes.select(method, value) == manifest.indexes.select(method, value)
+
+
+def test_cache_hits_after_first_load(tmp_path, manifest_path):
+    cache = IndexCache(str(tmp_path / "cache"))
+    key = cache.manifest_key(manifest_path)
+    assert cache.get(key) is None
+    built = cache.load_manifest(manifest_path)
+    cached = cache.get(key)
+    assert cached is not None
+    assert_same_manifest(built, cached)
+    assert_same_manifest(load_manifest(manifest_path), cache.load_manifest(manifest_path))
+
+
+def test_key_follows_content(tmp_path, manifest_path):
+    cache = IndexCache(str(tmp_path / "cache"))
+    key = cache.manifest_key(manifest_path)
+    assert key.endswith("-1.8.0")
+    with open(manifest_path, "a", encoding="utf-8") as f:
+        f.write(" ")
+    assert cache.manifest_key(manifest_path) != key
+
+
+def test_corrupt_entries_are_dropped(tmp_path, manifest):
+    cache = IndexCache(str(tmp_path / "cache"))
+    cache.put("broken", manifest)
+    with open(cache.entry_path("broken"), "r+b") as f:
+        f.write(b"NOTMAGIC")
+    assert cache.get("broken") is None
+    assert not os.path.exists(cache.entry_path("broken"))
+
+
+@pytest.mark.parametrize("max_entries", [1, 2])
+def test_eviction_keeps_most_recent_entries(tmp_path, manifest, max_entries):
+    cache = IndexCache(str(tmp_path / "cache"), max_entries=max_entries)
+    for k in range(3):
+        cache.put(f"entry{k}", manifest)
+        os.utime(cache.entry_path(f"entry{k}"), (k, k))
+    cache.evict()
+    kept = sorted(name for name in os.listdir(cache.directory) if name.endswith(".idx"))
+    assert kept == [f"entry{k}.idx" for k in range(3 - max_entries, 3)]
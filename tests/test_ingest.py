@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from dbt_selector.graph import CHILDREN, PARENTS
+from dbt_selector.ingest import stream_manifest
+from dbt_selector.manifest import Manifest
+
+
+def model(name, **config):
+    return {
+        "resource_type": "model", "package_name": "jaffle", "name": name,
+        "path": f"staging/{name}.sql", "original_file_path": f"models/staging/{name}.sql",
+        "fqn": ["jaffle", "staging", name], "tags": ["nightly"],
+        "config": {"materialized": "view", **config},
+        "checksum": {"name": "sha256", "checksum": name * 2},
+        # Floats of every shape, in fields the reader drops
+        "created_at": 1712345678.901234, "build_after": -2.5e-3, "weight": 6.02E+23,
+    }
+
+
+MANIFEST = {
+    "metadata": {"dbt_version": "1.8.0", "generated_at": "2024-04-05T12:00:00Z", "elapsed": 12.375},
+    "nodes": {
+        "model.jaffle.stg_orders": model("stg_orders", threshold=0.25, limit=1e3),
+        "model.jaffle.stg_payments": model("stg_payments", threshold=-17.125, limit=10),
+        "model.jaffle.orders": model("orders", threshold=3.0e-7, enabled=True, alias=None),
+    },
+    "sources": {
+        "source.jaffle.raw.orders": {
+            "resource_type": "source", "package_name": "jaffle", "name": "orders",
+            "source_name": "raw", "path": "models/sources.yml", "fqn": ["jaffle", "raw", "orders"],
+            "tags": [], "config": {"enabled": True}, "loaded_at_field": None,
+            "freshness": {"warn_after": {"count": 12.5, "period": "hour"}},
+            "created_at": 1712345678.5,
+        },
+    },
+    "macros": {
+        "macro.jaffle.cents": {"name": "cents", "created_at": 1712345679.0625, "arguments": [1.5, -0.0, 2E-2]},
+    },
+    "docs": {"doc.jaffle.overview": {"name": "overview", "created_at": 1.0e+9}},
+    "parent_map": {
+        "model.jaffle.stg_orders": ["source.jaffle.raw.orders"],
+        "model.jaffle.stg_payments": ["source.jaffle.external.payments"],
+        "model.jaffle.orders": ["model.jaffle.stg_orders", "model.jaffle.stg_payments"],
+        "source.jaffle.raw.orders": [],
+    },
+    "child_map": {
+        "source.jaffle.raw.orders": ["model.jaffle.stg_orders"],
+        "model.jaffle.stg_orders": ["model.jaffle.orders"],
+        "model.jaffle.stg_payments": ["model.jaffle.orders"],
+        "model.jaffle.orders": [],
+    },
+}
+
+
+def summary(manifest):
+    """Nodes and edges by unique_id, independent of the order nodes were read in"""
+    nodes = {node.unique_id: tuple(getattr(node, field) for field in node.__slots__)
+             for node in manifest.nodes}
+    edges = {}
+    for direction in (PARENTS, CHILDREN):
+        adjacency = manifest.graph.adjacency[direction]
+        edges[direction] = {
+            manifest.nodes[i].unique_id: sorted(manifest.nodes[j].unique_id for j in adjacency[i])
+            for i in range(len(manifest.nodes))
+        }
+    return nodes, edges, manifest.metadata, sorted(manifest.external_edges)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 73, 1 << 20])
+def test_stream_matches_from_dict(chunk_size, indent):
+    text = json.dumps(MANIFEST, indent=indent)
+    streamed = stream_manifest(io.StringIO(text), chunk_size=chunk_size)
+    assert summary(streamed) == summary(Manifest.from_dict(json.loads(text)))
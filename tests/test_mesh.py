@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+from dbt_selector import mesh as mesh_module
+from dbt_selector.exceptions import ManifestError
+from dbt_selector.graph import PARENTS
+from dbt_selector.mesh import load_mesh
+from dbt_selector.parser import parse_cli
+
+from conftest import model_entry
+
+
+def write_project(directory, name, models, parent_map, extra_nodes=None):
+    nodes = {f"model.{name}.{model}": model_entry(model, package_name=name, fqn=[name, model])
+             for model in models}
+    nodes.update(extra_nodes or {})
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps({"metadata": {"project_name": name}, "nodes": nodes,
+                                "parent_map": parent_map}), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def project_paths(tmp_path):
+    core = write_project(tmp_path, "core", ["a", "b"], {"model.core.a": [], "model.core.b": ["model.core.a"]})
+    # The downstream project sees core's public model b, and depends on it
+    public_b = {"model.core.b": model_entry("b", package_name="core", fqn=["core", "b"])}
+    mart = write_project(tmp_path, "mart", ["c"], {"model.mart.c": ["model.core.b"], "model.core.b": []},
+                         public_b)
+    return [core, mart]
+
+
+def edges(manifest):
+    parents = manifest.graph.adjacency[PARENTS]
+    return {manifest.nodes[i].unique_id: sorted(manifest.nodes[p].unique_id for p in parents[i])
+            for i in range(len(manifest))}
+
+
+def test_mesh_follows_cross_project_edges(project_paths):
+    serial = load_mesh(project_paths, workers=1, use_cache=False)
+    parallel = load_mesh(project_paths, workers=2, use_cache=False)
+    assert serial.projects == parallel.projects == ["core", "mart"]
+    assert edges(serial.manifest) == edges(parallel.manifest) == {
+        "model.core.a": [], "model.core.b": ["model.core.a"], "model.mart.c": ["model.core.b"]}
+    [(result, split)] = parallel.evaluate([{"name": "c", "definition": parse_cli("+fqn:mart.c")}])
+    assert len(result.node_ids) == 3
+    assert split == {"core": 2, "mart": 1}
+
+
+def test_duplicate_projects_are_rejected(project_paths):
+    with pytest.raises(ManifestError):
+        load_mesh([project_paths[0], project_paths[0]], workers=1, use_cache=False)
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="shared memory blocks are not listed in /dev/shm")
+def test_failed_reads_free_shared_memory(project_paths, monkeypatch):
+    def undecodable(view):
+        raise RuntimeError("undecodable block")
+
+    before = set(os.listdir("/dev/shm"))
+    # The first block fails to decode, so the others are never read
+    monkeypatch.setattr(mesh_module, "entry_from_buffer", undecodable)
+    with pytest.raises(RuntimeError):
+        load_mesh(project_paths, workers=2, use_cache=False)
+    assert set(os.listdir("/dev/shm")) - before == set()
@@ -0,0 +1,60 @@
+import pytest
+
+from dbt_selector.evaluate import Evaluator
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.parser import CLI_STYLE, FULL_YAML, KEY_VALUE, convert, parse_cli, to_cli, to_key_value
+
+
+def criterion(method, value, **extra):
+    return {"method": method, "value": value, **extra, "indirect_selection": "eager"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tag:nightly", criterion("tag", "nightly")),
+    ("2+fqn:orders+1", criterion("fqn", "orders", children=True, children_depth=1,
+                                 parents=True, parents_depth=2)),
+    ("@path:models/staging", criterion("path", "models/staging", childrens_parents=True)),
+    ("config.materialized:table", criterion("config.materialized", "table")),
+    # Bare values get dbt's default method
+    ("models/staging", criterion("path", "models/staging")),
+    ("orders.sql", criterion("file", "orders.sql")),
+    ("orders", criterion("fqn", "orders")),
+    ("a b,c --exclude d", {
+        "union": [criterion("fqn", "a"), {"intersection": [criterion("fqn", "b"), criterion("fqn", "c")]}],
+        "exclude": [criterion("fqn", "d")],
+    }),
+])
+def test_parse_cli(text, expected):
+    assert parse_cli(text) == expected
+
+
+def test_parse_results_are_not_shared():
+    first = parse_cli("tag:nightly")
+    first["value"] = "changed"
+    assert parse_cli("tag:nightly")["value"] == "nightly"
+
+
+@pytest.mark.parametrize("text", ["", "tag:", "@2+tag:a", "--exclude tag:a"])
+def test_invalid_cli(text):
+    with pytest.raises(SelectorError):
+        parse_cli(text)
+
+
+@pytest.mark.parametrize("text", [
+    "tag:nightly", "+fqn:orders+2", "@stg_orders", "orders.sql", "tag:a,tag:b package:utils --exclude resource_type:test",
+])
+def test_cli_round_trip(jaffle, text):
+    # Methods are written out, so compare what the strings parse to
+    assert parse_cli(to_cli(parse_cli(text))) == parse_cli(text)
+    evaluator = Evaluator(jaffle)
+    assert evaluator.evaluate(convert(text, FULL_YAML)) == evaluator.evaluate(text)
+
+
+def test_convert_between_forms():
+    assert convert("tag:nightly", KEY_VALUE) == {"tag": "nightly"}
+    assert convert({"tag": "nightly"}, CLI_STYLE) == "tag:nightly"
+    assert convert({"tag": "nightly"}, FULL_YAML) == {"method": "tag", "value": "nightly"}
+    with pytest.raises(SelectorError):
+        to_key_value("+tag:nightly")
+    with pytest.raises(SelectorError):
+        to_cli({"method": "tag", "value": "a", "indirect_selection": "empty"})
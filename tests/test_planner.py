@@ -0,0 +1,64 @@
+import pytest
+
+from benchmarks.synthetic import DagSpec, generate_selectors
+from dbt_selector.evaluate import Evaluator
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.parser import parse_cli
+from dbt_selector.planner import EXCLUDE, INTERSECTION, UNION, Planner, normalize
+
+SPEC = DagSpec(nodes=600, locality=100, tags=10, directories=10, seed=7)
+
+
+@pytest.mark.parametrize("selector", generate_selectors(SPEC, 60, seed=3), ids=lambda s: s["name"])
+def test_planner_matches_evaluator(manifest, selector):
+    definition = selector["definition"]
+    if "selector" in str(definition):
+        pytest.skip("selector: references need the batch evaluator")
+    evaluator = Evaluator(manifest)
+    assert Planner(evaluator).evaluate(definition) == evaluator.evaluate(definition)
+
+
+def test_nested_definition(jaffle):
+    evaluator = Evaluator(jaffle)
+    definition = {"union": [
+        {"intersection": ["tag:nightly", {"union": ["tag:finance", "package:utils"]}]},
+        {"union": ["fqn:orders", "fqn:orders"]},
+        {"intersection": ["resource_type:model", {"exclude": ["tag:nightly"]}]},
+    ]}
+    assert Planner(evaluator).evaluate(definition) == evaluator.evaluate(definition)
+
+
+def test_normalize_flattens_and_dedupes():
+    root = normalize({"union": ["tag:a", {"union": ["tag:b", "tag:a"]}, {"union": [{"union": ["tag:c"]}]}]})
+    assert root.op == UNION
+    assert sorted(child.criterion["value"] for child in root.children) == ["a", "b", "c"]
+
+
+def test_intersection_orders_operands_by_estimate(manifest):
+    planner = Planner(Evaluator(manifest))
+    root = planner.plan(parse_cli("resource_type:model,tag:tag_3 --exclude tag:tag_4"))
+    assert root.op == INTERSECTION
+    positives = [child for child in root.children if child.op != EXCLUDE]
+    assert [child.estimate for child in positives] == sorted(child.estimate for child in positives)
+    assert root.children[-1].op == EXCLUDE
+
+
+def test_short_circuit_skips_remaining_operands(jaffle):
+    planner = Planner(Evaluator(jaffle))
+    root = planner.plan({"intersection": ["package:utils", "tag:nightly", "+orders"]})
+    assert planner.execute(root) == set()
+    assert any(child.actual is None for child in root.children)
+    assert "skipped" in planner.explain({"intersection": ["package:utils", "tag:nightly", "+orders"]},
+                                        analyze=True)
+
+
+def test_estimates_are_capped_at_node_count(manifest):
+    planner = Planner(Evaluator(manifest))
+    root = planner.plan({"method": "tag", "value": "tag_1", "parents": True, "parents_depth": 10 ** 6})
+    assert root.estimate <= len(manifest)
+
+
+def test_invalid_depth(jaffle):
+    planner = Planner(Evaluator(jaffle))
+    with pytest.raises(SelectorError):
+        planner.plan({"method": "fqn", "value": "orders", "parents": True, "parents_depth": "deep"})
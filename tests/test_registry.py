@@ -0,0 +1,69 @@
+import json
+import threading
+
+from benchmarks.synthetic import DagSpec, generate_manifest
+from dbt_selector.index_cache import IndexCache
+from dbt_selector.registry import ManifestRegistry
+
+
+def run_threads(count, target):
+    errors = []
+
+    def run(k):
+        try:
+            target(k)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_manifest_keys(tmp_path, manifest_path):
+    cache = IndexCache(str(tmp_path / "cache"))
+    keys = []
+
+    def hash_repeatedly(_):
+        for _ in range(50):
+            # A fresh memo each time, so every call writes it
+            keys.append(cache.manifest_key(manifest_path))
+            try:
+                (tmp_path / "cache" / "hashes.json").unlink()
+            except FileNotFoundError:
+                pass
+
+    assert run_threads(8, hash_repeatedly) == []
+    assert len(set(keys)) == 1
+    assert not [name for name in (tmp_path / "cache").iterdir() if name.suffix == ".tmp"]
+
+
+def test_concurrent_loads_share_builds(tmp_path, manifest_path, manifest):
+    state_path = tmp_path / "state_manifest.json"
+    state = generate_manifest(DagSpec(nodes=300, seed=3))
+    state_path.write_text(json.dumps(state), encoding="utf-8")
+    registry = ManifestRegistry(IndexCache(str(tmp_path / "cache")), workers=2)
+    builds = {}
+
+    def attach(k):
+        # Sessions loading a manifest and a state manifest at the same time
+        session = f"session{k}"
+        builds[session] = (registry.attach(manifest_path, f"{session}:manifest"),
+                           registry.attach(str(state_path), f"{session}:state"))
+
+    try:
+        assert run_threads(8, attach) == []
+        loaded = {(build.path, id(build.result(60))) for pair in builds.values() for build in pair}
+    finally:
+        registry.shutdown()
+    # One build per manifest version, shared by every session
+    assert len(loaded) == 2
+    assert registry.misses == 2 and registry.hits == 14
+    first, second = next(iter(builds.values()))
+    assert [node.unique_id for node in first.result().nodes] == [node.unique_id for node in manifest.nodes]
+    assert len(second.result()) == len(state["nodes"]) + len(state["sources"])
+    assert {row["stage"] for row in registry.stats()} == {"Ready"}
+    assert {row["sessions"] for row in registry.stats()} == {8}
@@ -0,0 +1,96 @@
+import pytest
+import yaml
+
+from benchmarks.synthetic import DagSpec, generate_selectors
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.selectors import (FragmentCache, dump_selectors, import_selectors_yaml, load_selectors_yaml,
+                                    make_selector, validate_selectors)
+
+SELECTORS = generate_selectors(DagSpec(nodes=1000, tags=20), 100, seed=4)
+
+
+def test_dump_matches_a_whole_document_dump():
+    expected = yaml.dump({"selectors": SELECTORS}, Dumper=yaml.SafeDumper, sort_keys=False,
+                         default_flow_style=False)
+    assert dump_selectors(SELECTORS, FragmentCache()) == expected
+    assert dump_selectors([]) == yaml.dump({"selectors": []}, default_flow_style=False)
+
+
+def test_dump_round_trips():
+    assert load_selectors_yaml(dump_selectors(SELECTORS, FragmentCache())) == SELECTORS
+
+
+def test_only_changed_selectors_are_rendered():
+    cache = FragmentCache()
+    dump_selectors(SELECTORS, cache)
+    assert (cache.hits, cache.misses) == (0, len(SELECTORS))
+    edited = list(SELECTORS)
+    edited[3] = dict(edited[3], description="edited")
+    text = dump_selectors(edited, cache)
+    assert (cache.hits, cache.misses) == (len(SELECTORS) - 1, len(SELECTORS) + 1)
+    assert load_selectors_yaml(text)[3]["description"] == "edited"
+
+
+def test_fragment_cache_is_bounded():
+    cache = FragmentCache(max_entries=10)
+    dump_selectors(SELECTORS, cache)
+    assert len(cache) == 10
+
+
+def test_import_reports_problems():
+    text = """\
+selectors:
+  - name: nightly
+    default: true
+    definition: tag:nightly
+  - name: broken
+    default: true
+    definition:
+      method: colour
+      value: red
+  - name: deep
+    definition:
+      method: tag
+      value: nightly
+      parents: true
+      parents_depth: lots
+  - name: loop_a
+    definition:
+      union:
+        - method: selector
+          value: loop_b
+  - name: loop_b
+    definition:
+      method: selector
+      value: loop_a
+  - name: dangling
+    definition:
+      method: selector
+      value: nowhere
+  - name: nightly
+    definition: tag:x
+"""
+    selectors, errors = import_selectors_yaml(text)
+    assert len(selectors) == 7
+    messages = "\n".join(errors)
+    assert messages.count("broken:") == 1 and "colour" in messages
+    assert "deep:" in messages
+    assert "nightly: duplicate selector name" in errors
+    assert "Only one selector can set 'default: true'" in errors
+    assert "dangling: references unknown selector 'nowhere'" in errors
+    assert any(error.startswith("Circular selector reference: loop_a -> loop_b -> loop_a") for error in errors)
+
+
+def test_valid_selectors():
+    selectors = [
+        make_selector("a", "tag:nightly"),
+        make_selector("b", {"union": [{"method": "selector", "value": "a"},
+                                      {"intersection": ["path:models", {"exclude": ["tag:x"]}]}]}),
+    ]
+    assert validate_selectors(selectors) == []
+
+
+@pytest.mark.parametrize("text", ["selectors: [", "selectors: {}", "- a\n", "selectors:\n  - name: x\n"])
+def test_invalid_documents(text):
+    with pytest.raises(SelectorError):
+        load_selectors_yaml(text)
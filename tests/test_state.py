@@ -0,0 +1,109 @@
+import copy
+import random
+
+import pytest
+
+from conftest import jaffle_dict, model_entry
+from dbt_selector.batch import BatchEvaluator
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.manifest import Manifest
+from dbt_selector.state import ManifestDiff
+
+
+def mutate(manifest_dict, rng):
+    """A copy of ``manifest_dict`` with a few models retagged, reconfigured, rewired, removed and added"""
+    data = copy.deepcopy(manifest_dict)
+    nodes, parent_map = data["nodes"], data["parent_map"]
+    models = sorted(uid for uid, node in nodes.items() if node["resource_type"] == "model")
+    for uid in rng.sample(models, 3):
+        nodes[uid]["tags"] = [f"tag_{rng.randrange(10)}"]
+    for uid in rng.sample(models, 3):
+        nodes[uid]["config"] = {**nodes[uid]["config"], "materialized": "incremental"}
+    for uid in rng.sample(models, 3):
+        nodes[uid]["checksum"] = {"name": "sha256", "checksum": "changed"}
+    for uid in rng.sample(models, 2):
+        parent_map[uid] = parent_map[uid][1:]
+    for uid in rng.sample(models, 2):
+        del nodes[uid]
+        parent_map.pop(uid, None)
+        for key in parent_map:
+            parent_map[key] = [p for p in parent_map[key] if p != uid]
+        models.remove(uid)
+    for i in range(2):
+        name = f"added_{i}"
+        nodes[f"model.synthetic.{name}"] = model_entry(name, package_name="synthetic", tags=["tag_1"])
+        parent_map[f"model.synthetic.{name}"] = [rng.choice(models)]
+    data.pop("child_map", None)
+    return data
+
+
+def random_criterion(rng):
+    method, value = rng.choice([("tag", f"tag_{rng.randrange(10)}"), ("resource_type", "model"),
+                                ("config.materialized", "table"), ("state", "modified"), ("state", "new")])
+    criterion = {"method": method, "value": value,
+                 "indirect_selection": rng.choice(["eager", "cautious", "buildable", "empty"])}
+    for key in ("parents", "children"):
+        if rng.random() < 0.3:
+            criterion[key] = True
+    return criterion
+
+
+def random_definition(rng, depth=0):
+    if depth > 1 or rng.random() < 0.4:
+        return random_criterion(rng)
+    op = rng.choice(["union", "intersection"])
+    definition = {op: [random_definition(rng, depth + 1) for _ in range(rng.randint(2, 3))]}
+    if rng.random() < 0.3:
+        definition[op].append({"exclude": [random_criterion(rng)]})
+    return definition
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rerun_matches_fresh_evaluation(manifest_dict, seed):
+    rng = random.Random(seed)
+    v1 = Manifest.from_dict(manifest_dict)
+    d2 = mutate(manifest_dict, rng)
+    v2, v3 = Manifest.from_dict(d2), Manifest.from_dict(mutate(d2, rng))
+    selectors = [{"name": f"s{i}", "definition": random_definition(rng)} for i in range(12)]
+    selectors.append({"name": "ref", "definition": {"union": [{"method": "selector", "value": "s0"}, "tag:tag_2"]}})
+    batch = BatchEvaluator(v1, selectors, state=v1)
+    batch.run()
+    for manifest in (v2, v3):
+        batch = batch.rerun(manifest)
+        fresh = {result.name: result.node_ids for result in BatchEvaluator(manifest, selectors, state=v1).run()}
+        assert {name: result.node_ids for name, result in batch.results.items()} == fresh
+
+
+def test_unchanged_manifest_reuses_every_selector(manifest, manifest_dict):
+    selectors = [{"name": f"s{i}", "definition": f"tag:tag_{i}+"} for i in range(5)]
+    batch = BatchEvaluator(manifest, selectors)
+    batch.run()
+    again = batch.rerun(Manifest.from_dict(manifest_dict))
+    assert again.reused == [s["name"] for s in selectors]
+
+
+def test_manifest_diff():
+    old = jaffle_dict()
+    new = copy.deepcopy(old)
+    new["nodes"]["model.jaffle.orders"]["checksum"] = {"name": "sha256", "checksum": "orders-v2"}
+    new["nodes"]["model.jaffle.stg_orders"]["config"]["schema"] = "staging"
+    new["nodes"]["model.jaffle.customers"] = model_entry("customers", package_name="jaffle")
+    new["parent_map"]["model.jaffle.customers"] = ["model.jaffle.stg_orders"]
+    del new["nodes"]["model.utils.calendar"], new["parent_map"]["model.utils.calendar"]
+    before, after = Manifest.from_dict(old), Manifest.from_dict(new)
+    diff = ManifestDiff(before, after)
+
+    def uids(ids):
+        return sorted(after.nodes[i].unique_id for i in ids)
+
+    assert uids(diff.select("new")) == ["model.jaffle.customers"]
+    assert uids(diff.select("modified.body")) == ["model.jaffle.orders"]
+    assert uids(diff.select("modified.relation")) == ["model.jaffle.stg_orders"]
+    assert uids(diff.select("modified")) == ["model.jaffle.customers", "model.jaffle.orders",
+                                             "model.jaffle.stg_orders"]
+    assert [before.nodes[i].unique_id for i in diff.removed] == ["model.utils.calendar"]
+    assert "model.jaffle.stg_orders" in uids(diff.edges_changed)
+    assert diff.summary()["removed"] == 1
+    assert ManifestDiff(before, Manifest.from_dict(old)).is_empty()
+    with pytest.raises(SelectorError):
+        diff.select("modified.everything")
@@ -0,0 +1,39 @@
+from dbt_selector.suggest import SUGGEST_METHODS, Suggester, suggester_for
+
+
+def test_prefix_suggestions_rank_by_node_count(manifest):
+    suggester = Suggester(manifest)
+    found = suggester.suggest("tag", "tag_", k=3)
+    counts = {tag: len(ids) for tag, ids in manifest.indexes.tables["tag"].items()}
+    assert len(found) == 3 and all(value.startswith("tag_") for value in found)
+    assert [counts[value] for value in found] == sorted((counts[value] for value in found), reverse=True)
+    assert suggester.suggest("path", "models/mar", k=1) == ["models/marts"]
+
+
+def test_fuzzy_suggestions_catch_typos(manifest):
+    suggester = Suggester(manifest)
+    assert "models/staging" in suggester.suggest("path", "models/stgaing")
+    assert "package_0" in suggester.suggest("package", "pakage_0")
+
+
+def test_matches(manifest):
+    suggester = Suggester(manifest)
+    assert suggester.matches("tag", "tag_1")
+    assert not suggester.matches("tag", "no_such_tag")
+    assert suggester.matches("state", "modified") and not suggester.matches("state", "changed")
+    # Methods without suggestions are never flagged
+    assert suggester.matches("config.materialized", "anything")
+
+
+def test_warming_builds_every_index_off_thread(manifest):
+    suggester = Suggester(manifest)
+    assert not suggester.ready("fqn")
+    suggester.start_warming().join(60)
+    assert all(suggester.ready(method) for method in SUGGEST_METHODS)
+    # Started once per suggester
+    assert suggester.start_warming() is suggester.start_warming()
+    assert suggester.suggest("fqn", "package_0.marts") == Suggester(manifest).suggest("fqn", "package_0.marts")
+
+
+def test_suggester_is_shared_per_manifest(manifest):
+    assert suggester_for(manifest) is suggester_for(manifest)
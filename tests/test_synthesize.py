@@ -0,0 +1,56 @@
+import itertools
+
+import pytest
+
+from dbt_selector.evaluate import Evaluator
+from dbt_selector.exceptions import SelectorError
+from dbt_selector.selectors import validate_selectors
+from dbt_selector.synthesize import from_bitmap, resolve_nodes, synthesize, to_bitmap
+
+
+@pytest.mark.parametrize("indirect_selection", ["eager", "cautious", "buildable", "empty"])
+def test_exact_on_every_subset(jaffle, indirect_selection):
+    evaluator = Evaluator(jaffle)
+    for size in range(1, len(jaffle) + 1):
+        for target in itertools.combinations(range(len(jaffle)), size):
+            synthesis = synthesize(jaffle, target, 1.0, indirect_selection)
+            assert synthesis.exact, (target, synthesis.definition)
+            assert evaluator.evaluate(synthesis.definition) == set(target)
+
+
+@pytest.mark.parametrize("definition", [
+    "tag:tag_3", "package:package_2,resource_type:model", "tag:tag_1 --exclude resource_type:test",
+    {"method": "path", "value": "models/marts", "indirect_selection": "empty"},
+])
+def test_shorter_than_listing_nodes(manifest, definition):
+    evaluator = Evaluator(manifest)
+    target = evaluator.evaluate(definition)
+    synthesis = synthesize(manifest, target, budget=5.0)
+    assert synthesis.exact
+    assert evaluator.evaluate(synthesis.definition) == target
+    assert synthesis.criteria + synthesis.exclusions < len(target) / 2
+    assert validate_selectors([{"name": "synthesized", "definition": synthesis.definition}]) == []
+
+
+def test_single_matching_criterion(jaffle):
+    target = Evaluator(jaffle).evaluate({"method": "package", "value": "utils", "indirect_selection": "empty"})
+    synthesis = synthesize(jaffle, target, indirect_selection="empty")
+    assert synthesis.definition == {"method": "package", "value": "utils", "indirect_selection": "empty"}
+    assert synthesis.summary()["criteria"] == 1
+
+
+def test_empty_target(jaffle):
+    with pytest.raises(SelectorError):
+        synthesize(jaffle, [])
+
+
+def test_resolve_nodes(jaffle):
+    ids, unknown = resolve_nodes(jaffle, ["model.jaffle.orders", "stg_payments", " ", "nowhere"])
+    assert sorted(jaffle.nodes[i].name for i in ids) == ["orders", "stg_payments"]
+    assert unknown == ["nowhere"]
+
+
+def test_bitmaps_round_trip():
+    ids = {0, 3, 64, 1000}
+    assert from_bitmap(to_bitmap(ids, 1001)) == ids
+    assert from_bitmap(0) == set()
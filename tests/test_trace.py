@@ -0,0 +1,67 @@
+import json
+import tracemalloc
+
+import pytest
+
+from dbt_selector.trace import TRACE_MEMORY_ENV, Tracer, start_memory_tracing
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    assert tracer.begin("rerun") is None
+    with tracer.span("evaluate"):
+        pass
+    assert tracer.end() is None and not tracer.runs
+
+
+def test_spans_nest_per_rerun():
+    tracer = Tracer(max_runs=2, enabled=True)
+    for run in range(3):
+        tracer.begin(f"rerun {run}")
+        with tracer.span("main"):
+            with tracer.span("evaluate", selectors=run):
+                pass
+        tracer.end()
+    assert [trace.label for trace in tracer.runs] == ["rerun 1", "rerun 2"]
+    last = tracer.runs[-1]
+    assert [(span.name, span.depth) for span in last.spans] == [("evaluate", 1), ("main", 0)]
+    assert [row["span"] for row in last.rows()] == ["main", "  evaluate"]
+    assert set(last.totals()) == {"main", "evaluate"}
+
+
+def test_run_traces_fragments_on_their_own():
+    tracer = Tracer(enabled=True)
+    with tracer.run("fragment"):
+        pass
+    assert [trace.label for trace in tracer.runs] == ["fragment"]
+    tracer.begin("main")
+    with tracer.run("fragment"):
+        pass
+    tracer.end()
+    assert [span.name for span in tracer.runs[-1].spans] == ["fragment"]
+
+
+def test_exports():
+    tracer = Tracer(enabled=True)
+    with tracer.run("main", rows=3):
+        pass
+    events = json.loads(tracer.chrome_trace())["traceEvents"]
+    assert [event["ph"] for event in events] == ["i", "X"]
+    assert events[1]["name"] == "main" and events[1]["args"] == {"rows": 3}
+    runs = json.loads(tracer.as_json())["runs"]
+    assert runs[0]["spans"][0]["name"] == "main"
+
+
+@pytest.mark.skipif(tracemalloc.is_tracing(), reason="allocations are already traced")
+def test_memory_tracing_is_switched_on_by_the_environment(monkeypatch):
+    monkeypatch.delenv(TRACE_MEMORY_ENV, raising=False)
+    assert not start_memory_tracing()
+    monkeypatch.setenv(TRACE_MEMORY_ENV, "1")
+    try:
+        assert start_memory_tracing()
+        tracer = Tracer(enabled=True)
+        with tracer.run("main"):
+            data = [0] * 10000
+        assert tracer.runs[-1].traced_peak_mb > 0 and data
+    finally:
+        tracemalloc.stop()